@@ -0,0 +1,102 @@
+import time
+
+
+class FFmpegProgress:
+    """解析 FFmpeg -progress 输出的机器可读进度
+
+    FFmpeg 以 key=value 的形式逐行输出进度，每个进度块以
+    progress=continue 或 progress=end 结束。
+    """
+
+    def __init__(self, duration):
+        """
+        Args:
+            duration: 输出视频的目标时长（秒），用于计算百分比和剩余时间
+        """
+        self.duration = duration
+        self.start_time = time.time()
+        self.out_time = 0.0  # 已编码的媒体时长（秒）
+        self.speed = None  # 编码速度倍率，例如 2.5 表示 2.5 倍实时速度
+        self.fps = None
+        self.frame = 0
+        self.finished = False
+
+    def feed_line(self, line):
+        """处理一行进度输出
+        Args:
+            line: FFmpeg 输出的一行（bytes 或 str）
+        Returns:
+            bool: 是否读完一个完整的进度块
+        """
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='ignore')
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            return False
+        value = value.strip()
+
+        if key == 'out_time_us' or key == 'out_time_ms':
+            # 两者单位实际都是微秒（out_time_ms 是 FFmpeg 的历史命名）
+            if value.lstrip('-').isdigit():
+                self.out_time = max(0.0, int(value) / 1000000.0)
+        elif key == 'speed':
+            try:
+                self.speed = float(value.rstrip('x'))
+            except ValueError:
+                self.speed = None
+        elif key == 'fps':
+            try:
+                self.fps = float(value)
+            except ValueError:
+                self.fps = None
+        elif key == 'frame':
+            if value.isdigit():
+                self.frame = int(value)
+        elif key == 'progress':
+            if value == 'end':
+                self.finished = True
+            return True
+        return False
+
+    @property
+    def percent(self):
+        """当前进度百分比（0-100）"""
+        if self.finished:
+            return 100
+        if not self.duration:
+            return 0
+        return min(99, int(self.out_time / self.duration * 100))
+
+    @property
+    def eta(self):
+        """预计剩余时间（秒），无法估算时为 None"""
+        if self.finished:
+            return 0.0
+        remaining = max(0.0, (self.duration or 0) - self.out_time)
+        if self.speed:
+            return remaining / self.speed
+        # 速度未知时按已用时间的平均速度估算
+        elapsed = time.time() - self.start_time
+        if self.out_time > 0 and elapsed > 0:
+            return remaining / (self.out_time / elapsed)
+        return None
+
+    def to_dict(self):
+        """返回可传给进度回调的进度信息"""
+        return {
+            'out_time': self.out_time,
+            'duration': self.duration,
+            'speed': self.speed,
+            'fps': self.fps,
+            'frame': self.frame,
+            'eta': self.eta,
+            'elapsed': time.time() - self.start_time
+        }
+
+
+def format_eta(seconds):
+    """将秒数格式化为 HH:MM:SS，未知时返回 --:--:--"""
+    if seconds is None:
+        return '--:--:--'
+    seconds = int(seconds)
+    return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
@@ -0,0 +1,444 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+from contextlib import closing
+from .project_manager import ProjectManager
+from .video_core import VideoCore
+from .run_manifest import RunManifest
+from .probe_cache import get_probe_cache
+from .scheduling import order_items
+
+# 队列数据库默认位置
+DEFAULT_DB_PATH = os.path.join('cache', 'jobs.db')
+
+# 任务状态
+JOB_STATUSES = ('pending', 'running', 'done', 'failed', 'cancelled')
+
+# 运行中的任务超过该时长（秒）没有心跳时，认为处理它的进程已退出，重新放回队列
+STALE_SECONDS = 120
+
+# 处理任务时更新心跳的间隔（秒）
+HEARTBEAT_SECONDS = 15
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id TEXT,
+    project_name TEXT,
+    audio_paths TEXT NOT NULL,
+    image_paths TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    priority INTEGER NOT NULL DEFAULT 0,
+    estimate REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 1,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    output_path TEXT,
+    error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority, id);
+"""
+
+
+
+class JobQueue:
+    """基于 SQLite 的持久化生成任务队列
+
+    队列保存在本地数据库文件中，多个项目、界面、命令行和多个工作进程共用同一个队列：
+    界面或命令行把项目加入队列后即可关闭，工作进程按优先级和加入顺序逐个领取并处理。
+    每个任务记录状态、尝试次数、各阶段时间和输出目录。
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            # WAL 模式下读取不会阻塞其他进程写入
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        """每次操作使用独立连接，可在多个线程和进程中同时使用"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _to_dict(self, row):
+        job = dict(row)
+        for field in ('audio_paths', 'image_paths', 'options', 'result'):
+            if job.get(field) is not None:
+                job[field] = json.loads(job[field])
+        return job
+
+    def enqueue(self, audio_paths, image_paths, output_dir, options=None, project_id=None, project_name=None,
+                priority=0, max_attempts=1, estimate=None):
+        """加入一个生成任务
+        Args:
+            audio_paths: 音频文件路径列表
+            image_paths: 图片文件路径列表
+            output_dir: 输出目录
+            options: 传给 generate_video_from_images 的其他参数（需可 JSON 序列化）
+            project_id: 所属项目 ID
+            project_name: 所属项目名称
+            priority: 优先级，数值大的先处理
+            max_attempts: 失败时最多尝试的次数
+            estimate: 耗时估计（生成的视频总时长，秒），为 None 时按音频时长探测
+        Returns:
+            int: 任务 ID
+        """
+        audio_paths = [audio_paths] if isinstance(audio_paths, str) else list(audio_paths)
+        if estimate is None:
+            estimate = estimate_seconds(audio_paths, image_paths)
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                'INSERT INTO jobs (project_id, project_name, audio_paths, image_paths, output_dir, options, '
+                'priority, max_attempts, estimate, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (project_id, project_name, json.dumps(audio_paths, ensure_ascii=False),
+                 json.dumps(list(image_paths), ensure_ascii=False), output_dir,
+                 json.dumps(options or {}, ensure_ascii=False), int(priority), max(1, int(max_attempts)),
+                 estimate, time.time()))
+            return cursor.lastrowid
+
+    def enqueue_project(self, project, output_dir, priority=0, max_attempts=1):
+        """将 ProjectManager 项目的文件和生成设置加入队列
+        Returns:
+            int: 任务 ID
+        """
+        files = project.get('files', {})
+        return self.enqueue(files.get('audio', []), files.get('images', []), output_dir,
+                            ProjectManager.render_options(project), project.get('id'), project.get('name'),
+                            priority, max_attempts)
+
+    def claim(self, worker=None, schedule='fifo'):
+        """领取下一个待处理的任务并标记为运行中（多个进程同时领取时不会重复）
+        Args:
+            worker: 工作进程名称
+            schedule: 调度策略，优先级相同时 fifo 按加入顺序，lpt 先领取耗时最长的，
+                spt 先领取耗时最短的（无法估计耗时的任务最后领取），fair 先领取最久没有处理过的项目的任务，
+                排序规则与 scheduling.order_items 相同
+        Returns:
+            dict: 任务，队列为空时返回 None
+        """
+        worker = worker or default_worker_name()
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                pending = [dict(row) for row in conn.execute(
+                    "SELECT id, project_id, priority, estimate FROM jobs WHERE status = 'pending' ORDER BY id")]
+                if not pending:
+                    conn.execute('COMMIT')
+                    return None
+                row = claim_order(pending, schedule, self._last_served(conn))[0]
+                now = time.time()
+                conn.execute("UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                             "started_at = ?, heartbeat_at = ?, finished_at = NULL, error = NULL WHERE id = ?",
+                             (worker, now, now, row['id']))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            return self._to_dict(conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone())
+
+    def _last_served(self, conn):
+        """各项目最近一次领取任务的时间，fair 调度使用"""
+        return {row['project_id']: row['served'] for row in conn.execute(
+            'SELECT project_id, MAX(started_at) AS served FROM jobs '
+            'WHERE project_id IS NOT NULL AND started_at IS NOT NULL GROUP BY project_id')}
+
+    def last_served(self):
+        """各项目最近一次领取任务的时间
+        Returns:
+            dict: 项目 ID -> 时间
+        """
+        with closing(self._connect()) as conn:
+            return self._last_served(conn)
+
+    def heartbeat(self, job_id, output_path=None):
+        """更新运行中任务的心跳时间
+        Args:
+            output_path: 已创建的输出目录，处理进程退出后重新领取任务时在该目录继续生成
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE jobs SET heartbeat_at = ?, output_path = COALESCE(?, output_path) "
+                         "WHERE id = ? AND status = 'running'", (time.time(), output_path, job_id))
+
+    def complete(self, job_id, output_path=None, result=None):
+        """标记任务完成
+        Args:
+            output_path: 输出目录
+            result: 统计结果（VideoCore.last_result）
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE jobs SET status = 'done', finished_at = ?, output_path = ?, result = ? "
+                         "WHERE id = ? AND status = 'running'",
+                         (time.time(), output_path, json.dumps(result, ensure_ascii=False) if result else None,
+                          job_id))
+
+    def fail(self, job_id, error, output_path=None, result=None):
+        """标记任务失败，未达到最大尝试次数时放回队列
+        Returns:
+            str: 任务的新状态
+        """
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT status, attempts, max_attempts FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None or row['status'] != 'running':
+                conn.execute('COMMIT')
+                return row['status'] if row else None
+            status = 'pending' if row['attempts'] < row['max_attempts'] else 'failed'
+            conn.execute('UPDATE jobs SET status = ?, finished_at = ?, error = ?, output_path = ?, result = ? '
+                         'WHERE id = ?',
+                         (status, time.time(), str(error), output_path,
+                          json.dumps(result, ensure_ascii=False) if result else None, job_id))
+            conn.execute('COMMIT')
+            return status
+
+    def release(self, job_id, output_path=None):
+        """将运行中的任务放回队列（处理被中止），不计入尝试次数
+        Returns:
+            bool: 是否已放回队列
+        """
+        with closing(self._connect()) as conn:
+            cursor = conn.execute("UPDATE jobs SET status = 'pending', worker = NULL, attempts = MAX(attempts - 1, 0), "
+                                  "output_path = COALESCE(?, output_path), error = '处理已中止，重新排队' "
+                                  "WHERE id = ? AND status = 'running'", (output_path, job_id))
+            return cursor.rowcount > 0
+
+    def cancel(self, job_id):
+        """取消尚未开始的任务
+        Returns:
+            bool: 是否已取消
+        """
+        with closing(self._connect()) as conn:
+            cursor = conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? "
+                                  "WHERE id = ? AND status = 'pending'", (time.time(), job_id))
+            return cursor.rowcount > 0
+
+    def retry(self, job_id):
+        """将失败或已取消的任务重新放回队列
+        Returns:
+            bool: 是否已放回队列
+        """
+        with closing(self._connect()) as conn:
+            cursor = conn.execute("UPDATE jobs SET status = 'pending', attempts = 0, error = NULL, "
+                                  "finished_at = NULL WHERE id = ? AND status IN ('failed', 'cancelled')",
+                                  (job_id,))
+            return cursor.rowcount > 0
+
+    def requeue_stale(self, stale_seconds=STALE_SECONDS):
+        """将长时间没有心跳的运行中任务（处理进程已退出）放回队列
+        Returns:
+            int: 放回队列的任务数
+        """
+        with closing(self._connect()) as conn:
+            cursor = conn.execute("UPDATE jobs SET status = 'pending', worker = NULL, "
+                                  "error = '处理进程已退出，重新排队' "
+                                  "WHERE status = 'running' AND heartbeat_at < ?", (time.time() - stale_seconds,))
+            return cursor.rowcount
+
+    def get(self, job_id):
+        """获取任务，不存在时返回 None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            return self._to_dict(row) if row else None
+
+    def list_jobs(self, status=None, project_id=None, limit=None):
+        """按加入顺序列出任务
+        Args:
+            status: 只列出指定状态的任务
+            project_id: 只列出指定项目的任务
+            limit: 最多返回的任务数
+        Returns:
+            list: 任务列表
+        """
+        query = 'SELECT * FROM jobs'
+        conditions, params = [], []
+        if status:
+            conditions.append('status = ?')
+            params.append(status)
+        if project_id:
+            conditions.append('project_id = ?')
+            params.append(project_id)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY id'
+        if limit:
+            query += f' LIMIT {int(limit)}'
+        with closing(self._connect()) as conn:
+            return [self._to_dict(row) for row in conn.execute(query, params).fetchall()]
+
+    def counts(self):
+        """各状态的任务数
+        Returns:
+            dict: 状态 -> 任务数
+        """
+        with closing(self._connect()) as conn:
+            counts = dict.fromkeys(JOB_STATUSES, 0)
+            for row in conn.execute('SELECT status, COUNT(*) AS count FROM jobs GROUP BY status'):
+                counts[row['status']] = row['count']
+            return counts
+
+
+def job_group(job):
+    """fair 调度中任务所属的组：项目 ID，不属于项目的任务各自一组"""
+    return job['project_id'] if job['project_id'] is not None else f"job-{job['id']}"
+
+
+def claim_order(jobs, schedule='fifo', served=None):
+    """按调度策略排列待领取的任务：优先级高的在前，同一优先级内按 scheduling.order_items 排列，
+    lpt/spt 时无法估计耗时的任务排在最后
+    Args:
+        jobs: 待领取的任务（按 ID 排列，需包含 id、project_id、priority 和 estimate）
+        schedule: 调度策略
+        served: 项目 ID -> 最近一次领取任务的时间，fair 使用
+    Returns:
+        list: 排列后的任务
+    """
+    if schedule in ('lpt', 'spt'):
+        known = [job for job in jobs if job['estimate'] is not None]
+        unknown = [job for job in jobs if job['estimate'] is None]
+        ordered = order_items(known, schedule, cost=lambda job: job['estimate']) + unknown
+    else:
+        ordered = order_items(jobs, schedule, group=job_group, served=served)
+    return sorted(ordered, key=lambda job: -job['priority'])
+
+
+def estimate_seconds(audio_paths, image_paths):
+    """估计任务的耗时：要生成的视频总时长（秒），无法探测时返回 None
+
+    一个音频多张图片时每张图片生成一个同样时长的视频，否则每个音频生成一个视频。
+    """
+    try:
+        durations = get_probe_cache().durations(list(audio_paths))
+    except Exception as e:
+        print(f"探测音频时长失败，无法估计任务耗时: {str(e)}")
+        return None
+    if len(durations) == 1:
+        return durations[0] * max(1, len(image_paths))
+    return sum(durations)
+
+
+def default_worker_name():
+    """工作进程名称：主机名和进程号"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class RenderWorker:
+    """从任务队列中领取并处理生成任务，直到队列为空或被停止"""
+
+    def __init__(self, queue, video_core=None, worker=None, progress_callback=None, schedule='fifo'):
+        """
+        Args:
+            queue: JobQueue
+            video_core: 生成视频使用的 VideoCore，默认新建
+            worker: 工作进程名称，默认为主机名和进程号
+            progress_callback: 进度回调函数，参数为 (任务, 当前视频索引, 总视频数, 当前视频进度, 进度信息)
+            schedule: 领取任务的调度策略，见 JobQueue.claim
+        """
+        self.queue = queue
+        self.video_core = video_core or VideoCore()
+        self.worker = worker or default_worker_name()
+        self.progress_callback = progress_callback
+        self.schedule = schedule
+        self._stop = threading.Event()
+
+    def stop(self):
+        """处理完当前任务后停止"""
+        self._stop.set()
+
+    def cancel(self):
+        """立即停止：中止当前任务并放回队列，之后在原输出目录继续生成"""
+        self._stop.set()
+        self.video_core.cancel()
+
+    def pause(self):
+        """暂停当前任务"""
+        return self.video_core.pause()
+
+    def resume(self):
+        """继续当前任务"""
+        return self.video_core.resume()
+
+    def run(self, wait=False, poll_interval=5):
+        """处理队列中的任务
+        Args:
+            wait: 队列为空时是否继续等待新任务（直到 stop 被调用）
+            poll_interval: 等待新任务时查询队列的间隔（秒）
+        Returns:
+            int: 处理的任务数
+        """
+        processed = 0
+        while not self._stop.is_set():
+            self.queue.requeue_stale()
+            job = self.queue.claim(self.worker, self.schedule)
+            if job is None:
+                if not wait:
+                    break
+                self._stop.wait(poll_interval)
+                continue
+            self.process(job)
+            processed += 1
+        return processed
+
+    def process(self, job):
+        """处理一个已领取的任务
+        Returns:
+            bool: 是否全部成功
+        """
+        label = f"队列任务 {job['id']}" + (f"（{job['project_name']}）" if job.get('project_name') else '')
+        print(f"开始处理{label}，第 {job['attempts']} 次尝试")
+        stop_heartbeat = threading.Event()
+
+        def heartbeat():
+            while not stop_heartbeat.wait(HEARTBEAT_SECONDS):
+                self.queue.heartbeat(job['id'], self.video_core.output_folder)
+
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+
+        callback = None
+        if self.progress_callback:
+            callback = lambda *args: self.progress_callback(job, *args)
+        options = dict(job['options'])
+        if job['output_path'] and RunManifest.exists(job['output_path']):
+            # 之前的尝试已生成部分视频，在原输出目录继续，跳过已完成的视频
+            options['resume_folder'] = job['output_path']
+        try:
+            self.video_core.last_result = None
+            self.video_core.output_folder = None
+            success = self.video_core.generate_video_from_images(job['audio_paths'], job['image_paths'],
+                                                                 job['output_dir'], progress_callback=callback,
+                                                                 **options)
+            result = self.video_core.last_result
+            output_path = result['output_folder'] if result else self.video_core.output_folder
+            if self.video_core.control.cancelled:
+                self.queue.release(job['id'], output_path)
+                print(f"{label}已中止，重新排队")
+                return False
+            if success:
+                self.queue.complete(job['id'], output_path, result)
+                print(f"{label}完成，输出目录: {output_path}")
+            else:
+                failed = ', '.join(result['failed']) if result else '生成失败'
+                status = self.queue.fail(job['id'], f"失败的视频: {failed}", output_path, result)
+                print(f"{label}失败，{'重新排队' if status == 'pending' else '不再重试'}")
+            return success
+        except Exception as e:
+            self.queue.fail(job['id'], str(e), self.video_core.output_folder)
+            print(f"处理{label}时发生错误: {str(e)}")
+            return False
+        finally:
+            stop_heartbeat.set()
+            self.video_core.cleanup_temp()
@@ -0,0 +1,251 @@
+import os
+import sys
+import signal
+import subprocess
+import threading
+import time
+
+# Windows 下挂起/继续进程需要的访问权限
+PROCESS_SUSPEND_RESUME = 0x0800
+
+# 取消时等待子进程退出的时间（秒），超时后强制结束
+TERMINATE_TIMEOUT = 5
+
+# 看门狗检查进度的间隔（秒）
+WATCHDOG_INTERVAL = 1.0
+
+
+class RenderCancelled(Exception):
+    """生成已被取消"""
+
+
+def suspend_process(process):
+    """挂起子进程（macOS/Linux 发送 SIGSTOP，Windows 调用 NtSuspendProcess）"""
+    _signal_process(process, 'NtSuspendProcess', getattr(signal, 'SIGSTOP', None))
+
+
+def resume_process(process):
+    """继续已挂起的子进程"""
+    _signal_process(process, 'NtResumeProcess', getattr(signal, 'SIGCONT', None))
+
+
+def _signal_process(process, nt_function, posix_signal):
+    if process.poll() is not None:
+        return
+    if sys.platform == 'win32':
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(PROCESS_SUSPEND_RESUME, False, process.pid)
+        if not handle:
+            raise OSError(f"无法打开进程 {process.pid}")
+        try:
+            getattr(ctypes.windll.ntdll, nt_function)(handle)
+        finally:
+            ctypes.windll.kernel32.CloseHandle(handle)
+    else:
+        os.kill(process.pid, posix_signal)
+
+
+class WatchedProcess:
+    """看门狗监视的子进程，编码进度前进时调用 advance"""
+
+    def __init__(self, process, name, stall_timeout=0, timeout=0):
+        """
+        Args:
+            process: 子进程
+            name: 任务名称，用于日志
+            stall_timeout: 超过该秒数进度没有前进时结束进程，0 为不检查
+            timeout: 超过该秒数仍未完成时结束进程，0 为不限制
+        """
+        self.process = process
+        self.name = name
+        self.stall_timeout = stall_timeout
+        self.timeout = timeout
+        self.started = time.monotonic()
+        self.last_advance = self.started
+        self.position = None
+        self.reason = None  # 被看门狗结束的原因，未结束时为 None
+
+    def advance(self, position):
+        """报告当前进度（例如已编码的媒体时长），比上次大时才算前进"""
+        if self.position is None or position > self.position:
+            self.position = position
+            self.last_advance = time.monotonic()
+
+    def extend(self, seconds):
+        """暂停的时间不计入卡住和超时"""
+        self.started += seconds
+        self.last_advance += seconds
+
+    def expired(self, now):
+        """返回应结束进程的原因，未超时返回 None"""
+        if self.stall_timeout and now - self.last_advance > self.stall_timeout:
+            return f"超过 {self.stall_timeout:.0f} 秒没有进度"
+        if self.timeout and now - self.started > self.timeout:
+            return f"超过时限 {self.timeout:.0f} 秒仍未完成"
+        return None
+
+
+class ProcessControl:
+    """一批生成任务的取消、暂停和继续
+
+    生成过程中启动的 FFmpeg 子进程都通过 popen 登记：暂停时挂起全部子进程，
+    取消时结束全部子进程。各任务在开始前调用 checkpoint，暂停期间在此等待，
+    取消后抛出 RenderCancelled，尚未开始的任务不再执行。登记的子进程还可以交给看门狗（watch）监视，
+    编码进度长时间不前进或超过时限时只结束该进程，批次中的其他任务继续。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes = set()
+        self._cancelled = threading.Event()
+        self._running = threading.Event()  # 未暂停时为已设置
+        self._running.set()
+        self._paused_at = None
+        # 看门狗：监视中的子进程 -> WatchedProcess，有监视的进程时检查线程才运行
+        self._watched = {}
+        self._watchdog = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def reset(self):
+        """开始新的一批任务前清除取消和暂停状态"""
+        with self._lock:
+            self._cancelled.clear()
+            self._running.set()
+
+    def popen(self, args, **kwargs):
+        """启动并登记子进程，已取消时立即结束，暂停中时立即挂起"""
+        self.checkpoint()
+        return self.register(subprocess.Popen(args, **kwargs))
+
+    def register(self, process):
+        """登记已启动的子进程（需提供 pid、poll、terminate、kill 和 wait(timeout)，与 Popen 相同）"""
+        with self._lock:
+            self._processes.add(process)
+            if self._cancelled.is_set():
+                self._terminate(process)
+            elif not self._running.is_set():
+                suspend_process(process)
+        return process
+
+    def release(self, process):
+        """子进程结束后取消登记"""
+        with self._lock:
+            self._processes.discard(process)
+            self._watched.pop(process, None)
+
+    def watch(self, process, name, stall_timeout=0, timeout=0):
+        """用看门狗监视已登记的子进程，进度停止前进或超过时限时结束进程
+        Returns:
+            WatchedProcess: 读取进度时调用其 advance，进程被结束后其 reason 为原因
+        """
+        watched = WatchedProcess(process, name, stall_timeout, timeout)
+        if not stall_timeout and not timeout:
+            return watched
+        with self._lock:
+            self._watched[process] = watched
+            if self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watch_loop, daemon=True)
+                self._watchdog.start()
+        return watched
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(WATCHDOG_INTERVAL)
+            with self._lock:
+                if not self._watched:
+                    self._watchdog = None
+                    return
+                if not self._running.is_set():
+                    continue
+                now = time.monotonic()
+                for process, watched in list(self._watched.items()):
+                    reason = watched.expired(now)
+                    if reason:
+                        watched.reason = reason
+                        del self._watched[process]
+                        print(f"看门狗: {watched.name} {reason}，结束该任务")
+                        self._terminate(process)
+
+    def checkpoint(self):
+        """暂停期间等待继续，已取消时抛出 RenderCancelled"""
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise RenderCancelled('生成已取消')
+
+    def sleep(self, seconds):
+        """等待指定的秒数（例如重试前的退避），取消时立即返回
+        Returns:
+            bool: 是否等待完成（未被取消）
+        """
+        return not self._cancelled.wait(seconds)
+
+    def pause(self):
+        """暂停：挂起全部子进程，新的任务在 checkpoint 处等待"""
+        with self._lock:
+            if self._cancelled.is_set() or not self._running.is_set():
+                return False
+            self._running.clear()
+            self._paused_at = time.monotonic()
+            for process in list(self._processes):
+                try:
+                    suspend_process(process)
+                except Exception as e:
+                    print(f"挂起进程 {process.pid} 失败: {str(e)}")
+        print(f"已暂停，挂起 {len(self._processes)} 个 FFmpeg 进程")
+        return True
+
+    def resume(self):
+        """继续：恢复全部子进程和等待中的任务"""
+        with self._lock:
+            if self._running.is_set():
+                return False
+            for process in list(self._processes):
+                try:
+                    resume_process(process)
+                except Exception as e:
+                    print(f"继续进程 {process.pid} 失败: {str(e)}")
+            paused = time.monotonic() - self._paused_at
+            for watched in self._watched.values():
+                watched.extend(paused)
+            self._running.set()
+        print("已继续生成")
+        return True
+
+    def cancel(self):
+        """取消：结束全部子进程，等待中和尚未开始的任务不再执行"""
+        with self._lock:
+            if self._cancelled.is_set():
+                return False
+            self._cancelled.set()
+            processes = list(self._processes)
+            for process in processes:
+                self._terminate(process)
+            # 唤醒暂停中等待的任务，使其在 checkpoint 处退出
+            self._running.set()
+        print(f"已取消生成，结束 {len(processes)} 个 FFmpeg 进程")
+        return True
+
+    def _terminate(self, process):
+        """结束子进程（挂起的进程先恢复，才能处理结束信号）"""
+        if process.poll() is not None:
+            return
+        try:
+            resume_process(process)
+            process.terminate()
+        except Exception as e:
+            print(f"结束进程 {process.pid} 失败: {str(e)}")
+            return
+        threading.Thread(target=self._reap, args=(process,), daemon=True).start()
+
+    def _reap(self, process):
+        try:
+            process.wait(TERMINATE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
@@ -0,0 +1,61 @@
+# 每个视频默认最多生成的次数（含第一次），1 为失败后不重试
+DEFAULT_MAX_ATTEMPTS = 2
+
+# 第一次重试前等待的秒数，之后每次重试翻倍
+DEFAULT_RETRY_BACKOFF = 5.0
+
+# 重试前最长等待的秒数
+MAX_RETRY_DELAY = 120.0
+
+# 输入文件本身有问题（不存在、损坏、格式不支持）时 FFmpeg 输出的错误，重试也不会成功
+PERMANENT_ERRORS = (
+    'no such file or directory',
+    'permission denied',
+    'invalid data found when processing input',
+    'could not find codec parameters',
+    'no jpeg data found',
+    'moov atom not found',
+    'does not contain any stream',
+    'decoder not found',
+    'unknown decoder',
+    'unsupported codec',
+    'cannot identify image file',
+)
+
+
+class RetryPolicy:
+    """单个视频生成失败后的重试策略
+
+    失败的视频在等待一段时间后重新生成（等待时间按次数指数增长），应对临时的磁盘或进程错误；
+    启用 fallback 时重试改用更稳妥的设置：先调整图片尺寸，不使用流复制的缓存/共用轨道和分段编码，
+    改用 FFmpeg 后端从源文件完整编码。取消生成后不再重试，输入文件不存在或无法解码时立即失败。
+    """
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, backoff=DEFAULT_RETRY_BACKOFF, fallback=True):
+        """
+        Args:
+            max_attempts: 每个视频最多生成的次数（含第一次）
+            backoff: 第一次重试前等待的秒数，0 为立即重试
+            fallback: 重试时是否改用更稳妥的设置
+        """
+        self.max_attempts = max(1, int(max_attempts or 1))
+        self.backoff = max(0.0, float(backoff or 0))
+        self.fallback = fallback
+
+    def should_retry(self, attempt, error=None):
+        """第 attempt 次生成失败后是否还可以重试
+        Args:
+            attempt: 已生成的次数
+            error: 本次失败的错误信息
+        """
+        return attempt < self.max_attempts and not self.is_permanent(error)
+
+    @staticmethod
+    def is_permanent(error):
+        """错误是否由输入文件本身引起（不存在、损坏或格式不支持），重试不会成功"""
+        error = (error or '').lower()
+        return any(pattern in error for pattern in PERMANENT_ERRORS)
+
+    def delay(self, attempt):
+        """第 attempt 次生成失败后等待的秒数"""
+        return min(MAX_RETRY_DELAY, self.backoff * 2 ** (attempt - 1))
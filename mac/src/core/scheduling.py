@@ -0,0 +1,94 @@
+import heapq
+from collections import OrderedDict
+
+# 调度策略：fifo 按加入顺序，lpt 最长任务优先（缩短总用时），spt 最短任务优先（尽早完成更多视频），
+# fair 在各项目之间轮流调度（最久没有处理过的项目优先）
+SCHEDULE_POLICIES = ('fifo', 'lpt', 'spt', 'fair')
+
+
+def order_items(items, policy='fifo', cost=None, group=None, served=None):
+    """按调度策略排列任务
+    Args:
+        items: 任务列表
+        policy: 调度策略，见 SCHEDULE_POLICIES，未知策略按 fifo 处理
+        cost: 返回任务耗时估计（例如音频时长）的函数，lpt/spt 使用
+        group: 返回任务所属项目的函数，fair 使用
+        served: 项目 -> 最近一次开始处理该项目任务的时间，fair 使用（例如队列中已领取过的任务），
+            没有记录的项目视为从未处理
+    Returns:
+        list: 排列后的任务（排序稳定，耗时相同的任务保持原有顺序）
+    """
+    items = list(items)
+    if policy == 'lpt' and cost:
+        return sorted(items, key=cost, reverse=True)
+    if policy == 'spt' and cost:
+        return sorted(items, key=cost)
+    if policy == 'fair' and group:
+        return _fair_order(items, group, served or {})
+    return items
+
+
+def _fair_order(items, group, served):
+    """每次取出最久没有处理过的项目的下一个任务（从未处理的项目最先），相同时按任务原有顺序
+
+    队列领取任务（JobQueue.claim）和模拟（simulate）都使用这一规则，单个工作进程也会在项目之间轮流。
+    """
+    queues = OrderedDict()
+    for position, item in enumerate(items):
+        queues.setdefault(group(item), []).append((position, item))
+    # 未处理过的项目 (0, 0)，已处理过的 (1, 时间)，本次排列中取出的 (2, 序号)
+    last = {key: (1, served[key]) if served.get(key) is not None else (0, 0) for key in queues}
+    ordered = []
+    while queues:
+        key = min(queues, key=lambda key: (last[key], queues[key][0][0]))
+        ordered.append(queues[key].pop(0)[1])
+        last[key] = (2, len(ordered))
+        if not queues[key]:
+            del queues[key]
+    return ordered
+
+
+def simulate(costs, workers=1, policy='fifo', groups=None, served=None):
+    """模拟按调度策略在多个并行任务上执行一批任务
+
+    每个任务按排列顺序交给最先空闲的并行任务（与 ThreadPoolExecutor 的行为相同），
+    不考虑并行时的相互影响，结果用于比较不同策略和并行数的预计用时。
+    Args:
+        costs: 各任务的耗时估计（秒）
+        workers: 同时运行的任务数
+        policy: 调度策略
+        groups: 各任务所属的项目，fair 使用
+        served: 项目 -> 最近一次开始处理的时间，fair 使用，见 order_items
+    Returns:
+        dict: makespan（全部完成的用时）、mean_completion（平均完成时间）、
+            utilization（并行任务的平均利用率）和 order（执行顺序，为 costs 的下标）
+    """
+    indexes = order_items(range(len(costs)), policy, cost=lambda i: costs[i],
+                          group=(lambda i: groups[i]) if groups else None, served=served)
+    workers = max(1, int(workers or 1))
+    free_at = [0.0] * min(workers, len(costs) or 1)
+    heapq.heapify(free_at)
+    completions = []
+    for index in indexes:
+        start = heapq.heappop(free_at)
+        end = start + costs[index]
+        completions.append(end)
+        heapq.heappush(free_at, end)
+    makespan = max(completions, default=0.0)
+    return {
+        'policy': policy,
+        'workers': workers,
+        'makespan': makespan,
+        'mean_completion': sum(completions) / len(completions) if completions else 0.0,
+        'utilization': sum(costs) / (makespan * workers) if makespan else 0.0,
+        'order': indexes
+    }
+
+
+def compare_policies(costs, workers=1, groups=None, policies=SCHEDULE_POLICIES, served=None):
+    """对每种调度策略模拟执行
+    Returns:
+        list: 各策略的 simulate 结果
+    """
+    return [simulate(costs, workers, policy, groups, served) for policy in policies
+            if policy != 'fair' or groups]
@@ -1,58 +1,403 @@
 import os
+import re
 import ffmpeg
-from PIL import Image
+from PIL import Image, ImageOps
 import time
 from datetime import datetime
 import shutil
+import uuid
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .ffmpeg_progress import FFmpegProgress
+from .media_cache import MediaCache, file_hash, make_key
+from .probe_cache import get_probe_cache
+from . import av_backend
+from .av_backend import AVStillRenderer
+from .render_spec import RenderSpec, RenderTemplate, video_frames
+from .stage_dag import StageDAG
+from .scheduling import order_items
+from .run_manifest import RunManifest, file_fingerprint, partial_path, quick_hash
+from .process_control import ProcessControl, RenderCancelled
+from .pipe_reader import PipeReader
+from .async_runner import AsyncBatchRunner
+from .retry_policy import RetryPolicy, DEFAULT_MAX_ATTEMPTS, DEFAULT_RETRY_BACKOFF
+
+# 静态画面视频轨道的编码参数
+VIDEO_ENCODE_ARGS = {
+    'vcodec': 'libx264',
+    'video_bitrate': '2000k',
+    'r': 30,
+    'pix_fmt': 'yuv420p',
+    'preset': 'ultrafast'
+}
+
+# 静态编码模式：画面不变，以很低的内部帧率、长 GOP 和静态图片调优编码，
+# 按质量（CRF）而不是固定码率控制，输出仍为恒定帧率的标准 H.264/MP4
+STATIC_VIDEO_ENCODE_ARGS = {
+    'vcodec': 'libx264',
+    'crf': 23,
+    'r': 1,
+    'g': 30,
+    'bf': 0,  # 不使用 B 帧，流复制截取时画面不会超出音频时长
+    'pix_fmt': 'yuv420p',
+    'preset': 'veryfast',
+    'tune': 'stillimage'
+}
+
+# 画面编码模式：standard 为原有的 30fps 固定码率，static 为静态编码
+VIDEO_MODES = {
+    'standard': VIDEO_ENCODE_ARGS,
+    'static': STATIC_VIDEO_ENCODE_ARGS
+}
+
+# 音频编码码率（混合背景音乐时使用较高码率）
+AUDIO_BITRATE = '128k'
+MIXED_AUDIO_BITRATE = '192k'
+
+# 图片统一调整到的画面尺寸
+IMAGE_TARGET_SIZE = (1920, 1080)
+
+# 图片填充方式：letterbox 保持完整画面并补黑边，cover 等比放大铺满并居中裁剪
+IMAGE_FILL_MODES = ('letterbox', 'cover')
+
+# 合并生成时一个 FFmpeg 进程最多输出的视频数
+MAX_GROUP_SIZE = 8
+
+# 短视频小批量合并时一个 FFmpeg 进程最多输出的视频数
+MICRO_BATCH_SIZE = 16
+
+# FFmpeg -benchmark 在结束时输出的 CPU 时间
+BENCH_PATTERN = re.compile(r'bench: utime=([\d.]+)s stime=([\d.]+)s rtime=([\d.]+)s')
+
+# 缓存画面轨道的时长档位（秒），超过最大档位时按整小时取整
+TRACK_BUCKETS = [15, 30, 60, 120, 300, 600, 1200, 1800, 3600]
+
+# 流水线生成的缩略图最大尺寸
+THUMBNAIL_SIZE = (320, 180)
+
+# 校验输出时允许的时长误差（秒）
+VERIFY_TOLERANCE = 1.0
+
+# 看门狗默认值：编码进度超过该秒数不前进时结束任务
+DEFAULT_STALL_TIMEOUT = 120
+# 看门狗默认值：任务用时超过音频时长的该倍数时结束任务
+DEFAULT_TIMEOUT_FACTOR = 10
+# 按音频时长计算的任务时限不少于该秒数（短视频的进程启动和探测开销占比大）
+MIN_JOB_TIMEOUT = 600
+
+# 临时文件的根目录，每个 VideoCore 在其中使用自己的子目录，多个进程同时生成时互不删除对方的文件
+TEMP_ROOT = 'temp'
+
+# 提取错误信息时跳过的 FFmpeg 输出行
+ERROR_SKIP_PREFIXES = ('ffmpeg version', 'Input #', 'Output #', 'Stream mapping', 'Press [q]', 'bench:')
+
+def resize_image(image_path, output_path, fill_mode='letterbox'):
+    """将图片调整为 IMAGE_TARGET_SIZE 并保存为 JPEG，失败时抛出异常
+    Args:
+        image_path: 图片文件路径
+        output_path: 输出路径
+        fill_mode: 'letterbox' 保持完整画面并补黑边，'cover' 铺满画面并居中裁剪
+    Returns:
+        str: output_path
+    """
+    # 打开图片，按 EXIF 方向信息旋转（手机照片）
+    img = ImageOps.exif_transpose(Image.open(image_path))
+    
+    # 计算新的尺寸，保持宽高比
+    target_width, target_height = IMAGE_TARGET_SIZE
+    
+    # 计算缩放比例
+    width_ratio = target_width / img.width
+    height_ratio = target_height / img.height
+    if fill_mode == 'cover':
+        ratio = max(width_ratio, height_ratio)
+    else:
+        ratio = min(width_ratio, height_ratio)
+    
+    new_width = max(1, round(img.width * ratio))
+    new_height = max(1, round(img.height * ratio))
+    
+    # 带透明通道的图片按透明度贴到黑色背景上
+    img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    
+    # 调整大小
+    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    
+    # 创建新的背景图片
+    background = Image.new('RGB', (target_width, target_height), (0, 0, 0))
+    
+    # 计算居中位置（cover 模式下为负数，超出画面的部分被裁掉）
+    x = (target_width - new_width) // 2
+    y = (target_height - new_height) // 2
+    
+    # 将调整后的图片粘贴到背景上
+    background.paste(img, (x, y), img if img.mode == 'RGBA' else None)
+    
+    # 保存调整后的图片
+    background.save(output_path, 'JPEG', quality=95)
+    return output_path
+
+
+def normalize_image_file(image_path, fill_mode='letterbox', cache=os.path.join('cache', 'images')):
+    """将图片调整为统一尺寸，结果按 (图片哈希, 目标尺寸, 填充方式) 缓存
+    
+    只使用可 pickle 的参数时可以在子进程中执行（流水线的图片处理阶段）。
+    Args:
+        image_path: 图片文件路径
+        fill_mode: 图片填充方式
+        cache: 图片缓存（MediaCache）或缓存目录
+    Returns:
+        str: 调整后的图片路径，失败时返回原图片路径
+    """
+    try:
+        owned = isinstance(cache, str)
+        if owned:
+            cache = MediaCache(cache)
+        key = make_key('image', file_hash(image_path), IMAGE_TARGET_SIZE, fill_mode)
+        cached = cache.get(key)
+        if cached:
+            if owned:
+                # 子进程中临时创建的缓存对象，命中后立即写入最后使用时间
+                cache.flush()
+            return cached
+        
+        temp_file = cache.temp_path('.jpg')
+        try:
+            resize_image(image_path, temp_file, fill_mode)
+        except Exception as e:
+            print(f"调整图片大小时发生错误: {str(e)}")
+            if os.path.exists(temp_file):
+                os.unlink(temp_file)
+            return image_path
+        return cache.put(key, temp_file, {'image': image_path, 'fill_mode': fill_mode})
+    except Exception as e:
+        print(f"调整图片失败，使用原图片: {str(e)}")
+        return image_path
+
+
+def write_thumbnail(output_path, image_path, video_path=None):
+    """根据视频使用的图片生成缩略图（画面是静态图片，不需要从视频中解码）
+    Args:
+        output_path: 缩略图路径
+        image_path: 视频使用的图片
+        video_path: 对应的视频，只用于在流水线中等待视频生成完成
+    Returns:
+        str: 缩略图路径
+    """
+    with Image.open(image_path) as img:
+        img = ImageOps.exif_transpose(img).convert('RGB')
+        img.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+        img.save(output_path, 'JPEG', quality=85)
+    return output_path
+
 
 class VideoCore:
     def __init__(self):
-        self.temp_dir = 'temp'
-        if not os.path.exists(self.temp_dir):
-            os.makedirs(self.temp_dir)
+        # 本实例的临时目录，首次使用时创建，cleanup_temp 时整个删除
+        self._temp_dir = None
+        # 最近一次批量生成的统计结果
+        self.last_result = None
+        # 本次批量生成的开始时间，用于计算吞吐量（包含探测和轨道准备）
+        self.batch_start_time = None
+        # 跨次运行复用的已编码画面/音频轨道缓存
+        self.cache_dir = 'cache'
+        self.media_cache = MediaCache(os.path.join(self.cache_dir, 'tracks'))
+        # 处理好的背景音乐（循环并调整音量）缓存
+        self.bgm_cache = MediaCache(os.path.join(self.cache_dir, 'bgm'))
+        self._bgm_lock = threading.Lock()
+        # 调整到统一尺寸的图片缓存
+        self.image_cache = MediaCache(os.path.join(self.cache_dir, 'images'))
+        # 跨次运行复用的 ffprobe 探测结果
+        self.probe_cache = get_probe_cache()
+        # 按生成规格缓存的 FFmpeg 命令行模板
+        self._templates = {}
+        self._templates_lock = threading.Lock()
+        # 流水线各阶段按 (阶段, 文件, 修改时间, 参数) 缓存的结果
+        self._stage_memo = {}
+        # 当前批量生成的输出目录
+        self.output_folder = None
+        # 取消、暂停和继续生成，登记生成过程中启动的 FFmpeg 子进程
+        self.control = ProcessControl()
+        # 本次批量生成的看门狗设置，见 generate_video_from_images 的 stall_timeout 和 timeout_factor
+        self._stall_timeout = DEFAULT_STALL_TIMEOUT
+        self._timeout_factor = DEFAULT_TIMEOUT_FACTOR
+        # 本次批量生成的清单和影响输出内容的设置哈希
+        self._manifest = None
+        self._batch_spec = None
+        # 本次批量生成的重试策略和图片填充方式（重试改用稳妥设置时调整图片尺寸）
+        self._retry = RetryPolicy()
+        self._image_fill_mode = 'letterbox'
 
     def generate_video_from_images(self, audio_path, image_paths, output_dir, 
                                   progress_callback=None, bg_music_path=None, 
-                                  bg_music_volume=0.3):
+                                  bg_music_volume=0.3, max_workers=1, share_tracks=False,
+                                  use_cache=False, inline_bg_music=False, normalize_images=True,
+                                  image_fill_mode='letterbox', still_source=True,
+                                  video_mode='standard', group_size=1,
+                                  chunk_seconds=0, micro_batch_seconds=0, backend='ffmpeg',
+                                  schedule='fifo', pipeline=False, thumbnails=False, resume_folder=None,
+                                  manifest_path=None, stall_timeout=DEFAULT_STALL_TIMEOUT,
+                                  timeout_factor=DEFAULT_TIMEOUT_FACTOR, use_asyncio=False,
+                                  max_attempts=DEFAULT_MAX_ATTEMPTS, retry_backoff=DEFAULT_RETRY_BACKOFF,
+                                  retry_fallback=True):
         """从图片和音频生成视频
         Args:
             audio_path: 音频文件路径
             image_paths: 图片文件路径列表
             output_dir: 输出目录
-            progress_callback: 进度回调函数，参数为(当前处理的图片索引, 总图片数, 当前图片的处理进度)
+            progress_callback: 进度回调函数，参数为(当前处理的视频索引, 总视频数, 当前视频的处理进度, 进度信息)，
+                进度信息为字典，包含 out_time、speed（编码速度倍率）、fps、eta（预计剩余秒数）等，
+                并行模式下会在多个工作线程中被调用
             bg_music_path: 背景音乐文件路径
             bg_music_volume: 背景音乐音量（0.0-1.0）
+            max_workers: 同时运行的 FFmpeg 任务数，1 为逐个处理
+            share_tracks: 是否对共用的轨道只编码一次（一个音频多张图片时共用音频，
+                一张图片多个音频时共用画面），各输出通过流复制封装
+            use_cache: 是否使用跨次运行的轨道缓存，已编码过的图片画面和音频直接流复制截取
+            inline_bg_music: 是否在主编码的滤镜图中直接循环、调整音量并混合背景音乐，
+                不生成中间文件
+            normalize_images: 是否先将图片调整为 1920x1080（结果按内容缓存），避免超大图片和奇数尺寸
+            image_fill_mode: 图片填充方式，'letterbox' 补黑边，'cover' 铺满并裁剪
+            still_source: 是否只解码一次图片并在滤镜图中重复该帧，而不是每一帧都重新读取和解码图片
+            video_mode: 画面编码模式，'standard' 为 30fps 固定码率，'static' 以 1fps、长 GOP 和
+                静态图片调优编码，CPU 时间和文件大小都小得多
+            group_size: 一个音频多张图片时，每个 FFmpeg 进程同时输出的视频数（最多 8 个），
+                同组视频共用一次音频解码和编码，1 为每个视频单独一个进程
+            chunk_seconds: 大于 0 时，长于该时长的视频将画面按该时长分段并行编码，
+                再用 concat 流复制拼接，最后封装一次音频；0 为不分段
+            micro_batch_seconds: 大于 0 时，短于该时长的视频最多每 16 个合并为一个 FFmpeg 进程生成，
+                共用的音频或画面只编码一次，减少进程启动、探测和封装初始化的开销；0 为不合并
+            backend: 编码后端，'ffmpeg' 调用 FFmpeg 进程，'pyav' 使用 PyAV 在进程内编码
+                （画面只编码一个 GOP 并重复复用，需安装 PyAV，未安装时使用 FFmpeg）
+            schedule: 并行生成时的调度策略（按探测到的音频时长），'fifo' 按列表顺序，'lpt' 最长的视频优先，
+                缩短整批的总用时；'spt' 最短的视频优先，尽早完成更多视频
+            pipeline: 是否按阶段流水线生成（探测、背景音乐、图片处理、编码、校验、缩略图），
+                各阶段就绪后立即执行，后一个视频的探测和图片处理与前一个视频的编码同时进行；
+                不使用 share_tracks、group_size 和 micro_batch_seconds
+            thumbnails: 流水线生成时是否为每个视频在输出目录生成同名的 JPEG 缩略图
+            resume_folder: 继续之前中断或部分失败的生成：使用该输出目录（之前的 output_时间 目录），
+                按其中的生成清单跳过输入和设置未变、输出文件完好的视频，只重新生成缺失或失败的视频
+            manifest_path: 生成清单文件路径，默认为输出目录中的 manifest.json；项目的“更新输出”
+                将清单保存在项目目录中，素材或设置变化后只重新生成新增或过期的视频
+            stall_timeout: 看门狗：FFmpeg 编码进度超过该秒数不前进时结束该视频的进程并记为失败，
+                批次中的其他视频继续生成；0 为不检查
+            timeout_factor: 看门狗：单个视频的生成用时超过音频时长的该倍数（不少于 600 秒）时结束进程；
+                0 为不限制。暂停的时间不计入
+            use_asyncio: 是否用 asyncio 事件循环调度生成（探测、图片处理、编码、校验），
+                FFmpeg 子进程的输出在事件循环中读取，不需要每个进程两个读取线程；
+                优先于 pipeline，不使用 share_tracks、group_size、micro_batch_seconds、chunk_seconds、
+                PyAV 后端和缩略图
+            max_attempts: 每个视频最多生成的次数（含第一次），失败后按 retry_backoff 等待再重试；1 为不重试
+            retry_backoff: 第一次重试前等待的秒数，之后每次翻倍
+            retry_fallback: 重试时是否改用更稳妥的设置（调整图片尺寸、不使用流复制的缓存/共用轨道和分段编码、
+                改用 FFmpeg 后端从源文件完整编码）
         Returns:
-            bool: 是否成功
+            bool: 是否全部成功，详细统计见 self.last_result（其中 jobs 为每个视频的状态、尝试次数和错误信息，
+                retried 为重试后成功的视频）
         """
         try:
-            # 创建输出目录
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_folder = os.path.join(output_dir, f'output_{timestamp}')
-            os.makedirs(output_folder, exist_ok=True)
+            self.batch_start_time = time.time()
+            self.control.reset()
+            self._stall_timeout = stall_timeout or 0
+            self._timeout_factor = timeout_factor or 0
+            self._retry = RetryPolicy(max_attempts, retry_backoff, retry_fallback)
+            self._image_fill_mode = image_fill_mode
+            if resume_folder:
+                # 继续之前的生成，输出到原来的目录
+                if not os.path.isdir(resume_folder):
+                    print(f"要继续生成的输出目录不存在: {resume_folder}")
+                    return False
+                output_folder = resume_folder
+                print(f"继续生成，输出目录: {output_folder}")
+            else:
+                # 创建输出目录
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                output_folder = self._create_output_folder(output_dir, f'output_{timestamp}')
+            self.output_folder = output_folder
             
             # 判断是一对多（一个音频多张图片）还是多对一（多个音频一张图片）
             audio_paths = [audio_path] if isinstance(audio_path, str) else audio_path
+            options = {
+                'progress_callback': progress_callback,
+                'bg_music_path': bg_music_path,
+                'bg_music_volume': bg_music_volume,
+                'max_workers': max_workers,
+                'share_tracks': share_tracks,
+                'use_cache': use_cache,
+                'inline_bg_music': inline_bg_music,
+                'normalize_images': normalize_images,
+                'image_fill_mode': image_fill_mode,
+                'still_source': still_source,
+                'video_mode': video_mode,
+                'group_size': group_size,
+                'chunk_seconds': chunk_seconds,
+                'micro_batch_seconds': micro_batch_seconds,
+                'backend': backend,
+                'schedule': schedule
+            }
+            if backend == 'pyav' and not av_backend.is_available():
+                print("未安装 PyAV，改用 FFmpeg 后端")
+                options['backend'] = 'ffmpeg'
+            self.media_cache.reset_stats()
+            self.bgm_cache.reset_stats()
+            self.image_cache.reset_stats()
+            
+            # 影响输出内容的设置，与各视频的输入文件指纹一起作为清单中的规格哈希
+            output_settings = {
+                'bg_music': file_fingerprint(bg_music_path),
+                'bg_music_volume': bg_music_volume if bg_music_path else None,
+                'inline_bg_music': inline_bg_music if bg_music_path else None,
+                'image_fill_mode': image_fill_mode if normalize_images else None,
+                'video_encode_args': self._video_encode_args(video_mode),
+                'still_source': still_source,
+                'backend': options['backend']
+            }
+            self._batch_spec = make_key('batch', output_settings)
+            self._manifest = RunManifest(output_folder, manifest_path)
+            self._manifest.set_inputs({'audio_paths': audio_paths, 'image_paths': list(image_paths),
+                                       'settings': output_settings})
             
+            if use_asyncio:
+                return self._process_async(audio_paths, image_paths, output_folder, **options)
+            if pipeline:
+                return self._process_pipeline(audio_paths, image_paths, output_folder, thumbnails=thumbnails,
+                                              **options)
             # 如果是一个音频多张图片的情况
             if len(audio_paths) == 1 and len(image_paths) > 1:
-                return self._process_one_audio_multiple_images(audio_paths[0], image_paths, output_folder, 
-                                                              progress_callback, bg_music_path, bg_music_volume)
+                return self._process_one_audio_multiple_images(audio_paths[0], image_paths, output_folder, **options)
             # 如果是多个音频一张图片的情况
             elif len(audio_paths) > 1 and len(image_paths) == 1:
-                return self._process_multiple_audios_one_image(audio_paths, image_paths[0], output_folder, 
-                                                              progress_callback, bg_music_path, bg_music_volume)
+                return self._process_multiple_audios_one_image(audio_paths, image_paths[0], output_folder, **options)
             # 正常的一对一情况
             else:
-                return self._process_one_audio_multiple_images(audio_paths[0], image_paths, output_folder, 
-                                                              progress_callback, bg_music_path, bg_music_volume)
+                return self._process_one_audio_multiple_images(audio_paths[0], image_paths, output_folder, **options)
                 
         except Exception as e:
             print(f"生成视频时发生错误: {str(e)}")
             return False
             
+    def _create_output_folder(self, output_dir, name):
+        """创建输出目录，同名目录已存在时（例如多个进程在同一秒开始生成）加上序号
+        Returns:
+            str: 新建的输出目录
+        """
+        output_folder = os.path.join(output_dir, name)
+        suffix = 1
+        while True:
+            try:
+                os.makedirs(output_folder)
+                return output_folder
+            except FileExistsError:
+                suffix += 1
+                output_folder = os.path.join(output_dir, f'{name}_{suffix}')
+
     def _prepare_background_music(self, bg_music_path, target_duration, volume=0.3):
-        """准备背景音乐（循环播放至指定长度）
+        """准备背景音乐（循环播放至指定长度并调整音量）
+
+        处理结果按 (文件哈希, 音量, 时长档位) 缓存，时长不小于目标时长，
+        混音时以主音频长度为准截取，同一批次和之后的运行都不再重复处理。
         Args:
             bg_music_path: 背景音乐文件路径
             target_duration: 目标时长（秒）
@@ -64,161 +409,136 @@ class VideoCore:
             print("背景音乐文件不存在，跳过背景音乐处理")
             return None
             
+        temp_file = None
         try:
-            # 获取背景音乐时长
-            probe = ffmpeg.probe(bg_music_path)
-            bg_duration = float(probe['format']['duration'])
-            print(f"背景音乐时长: {bg_duration}秒")
-            print(f"目标时长: {target_duration}秒")
-            
-            # 如果背景音乐时长不足，需要循环
-            if bg_duration < target_duration:
-                print("背景音乐时长不足，进行循环处理")
-                # 计算需要循环的次数
-                loops = int(target_duration / bg_duration) + 1
-                print(f"需要循环 {loops} 次")
-                
-                # 创建临时文件路径
-                temp_file = os.path.join(self.temp_dir, f"looped_bg_{int(time.time())}.mp3")
+            bucket = self._track_bucket(target_duration)
+            bg_hash = file_hash(bg_music_path)
+            # 已缓存的更长档位同样可以使用
+            buckets = [b for b in TRACK_BUCKETS if b >= bucket] or [bucket]
+            keys = [make_key('bgm', bg_hash, volume, b) for b in buckets]
+            
+            # 并行任务同时请求时只处理一次
+            with self._bgm_lock:
+                cached = self.bgm_cache.find(keys)
+                if cached:
+                    print(f"背景音乐命中缓存: {cached}")
+                    return cached
                 
-                # 创建循环背景音乐的滤镜
-                filter_complex = f"[0:a]aloop=loop={loops-1}:size=2e+09[out]"
+                # 获取背景音乐时长
+                bg_duration = self.probe_cache.duration(bg_music_path)
+                print(f"背景音乐时长: {bg_duration}秒")
+                print(f"目标时长: {target_duration}秒，处理时长档位: {bucket}秒")
                 
-                # 执行循环处理
                 stream = ffmpeg.input(bg_music_path)
-                stream = ffmpeg.filter_(stream, "aloop", loop=loops-1, size="2e+09")
-                stream = ffmpeg.output(stream, temp_file, t=target_duration, acodec='libmp3lame')
-                
-                ffmpeg.run(stream, overwrite_output=True, quiet=True)
-                
-                # 调整音量
-                volume_file = os.path.join(self.temp_dir, f"volume_bg_{int(time.time())}.mp3")
-                stream = ffmpeg.input(temp_file)
-                stream = ffmpeg.filter_(stream, "volume", volume=volume)
-                stream = ffmpeg.output(stream, volume_file, acodec='libmp3lame')
-                
-                ffmpeg.run(stream, overwrite_output=True, quiet=True)
-                
-                print(f"背景音乐循环处理完成: {volume_file}")
-                return volume_file
-            else:
-                # 只需要截取并调整音量
-                print("背景音乐时长足够，只需截取并调整音量")
-                temp_file = os.path.join(self.temp_dir, f"volume_bg_{int(time.time())}.mp3")
+                # 如果背景音乐时长不足，需要循环
+                if bg_duration < bucket:
+                    # 计算需要循环的次数
+                    loops = int(bucket / bg_duration) + 1
+                    print(f"背景音乐时长不足，需要循环 {loops} 次")
+                    stream = ffmpeg.filter_(stream, "aloop", loop=loops-1, size="2e+09")
+                else:
+                    print("背景音乐时长足够，只需截取并调整音量")
                 
-                stream = ffmpeg.input(bg_music_path)
+                # 循环、调整音量和截取在同一次编码中完成
+                temp_file = self.bgm_cache.temp_path('.mp3')
                 stream = ffmpeg.filter_(stream, "volume", volume=volume)
-                stream = ffmpeg.output(stream, temp_file, t=target_duration, acodec='libmp3lame')
-                
-                ffmpeg.run(stream, overwrite_output=True, quiet=True)
+                stream = ffmpeg.output(stream, temp_file, t=bucket, acodec='libmp3lame', audio_bitrate='192k')
+                self._run_ffmpeg(stream, bucket)
                 
-                print(f"背景音乐处理完成: {temp_file}")
-                return temp_file
+                bg_file = self.bgm_cache.put(keys[0], temp_file, {'bg_music': bg_music_path, 'duration': bucket})
+                print(f"背景音乐处理完成: {bg_file}")
+                return bg_file
                 
         except Exception as e:
             print(f"处理背景音乐时发生错误: {str(e)}")
+            self._remove_temp_file(temp_file)
             return None
             
+    def _background_music_source(self, bg_music_path, target_duration, volume=0.3, inline=False):
+        """返回混音使用的背景音乐
+        Args:
+            inline: 为 True 时直接返回原始文件，由主编码的滤镜图循环并调整音量；
+                否则返回预先处理好的背景音乐文件
+        Returns:
+            str: 背景音乐文件路径，不可用时返回 None
+        """
+        if inline:
+            if not bg_music_path or not os.path.exists(bg_music_path):
+                print("背景音乐文件不存在，跳过背景音乐处理")
+                return None
+            print("背景音乐将在主编码中循环、调整音量并混合")
+            return bg_music_path
+        return self._prepare_background_music(bg_music_path, target_duration, volume)
+
     def _process_one_audio_multiple_images(self, audio_path, image_paths, output_folder, 
                                           progress_callback=None, bg_music_path=None, 
-                                          bg_music_volume=0.3):
+                                          bg_music_volume=0.3, max_workers=1, share_tracks=False,
+                                          use_cache=False, inline_bg_music=False, normalize_images=True,
+                                          image_fill_mode='letterbox', still_source=True,
+                                          video_mode='standard', group_size=1,
+                                          chunk_seconds=0, micro_batch_seconds=0, backend='ffmpeg',
+                                          schedule='fifo'):
         """处理一个音频多张图片的情况"""
         try:
             # 获取音频时长
-            probe = ffmpeg.probe(audio_path)
-            duration = float(probe['format']['duration'])
+            duration = self.probe_cache.duration(audio_path)
             print(f"音频时长: {duration}秒")
             
-            # 准备背景音乐（如果有）
+            # 预先编码好、各视频直接流复制的音频轨道
+            audio_track = None
+            temp_tracks = []
+            if use_cache:
+                audio_track = self._cached_audio_track(audio_path, duration, bg_music_path, bg_music_volume,
+                                                       inline_bg_music)
+            
+            # 准备背景音乐（如果有，命中缓存时已包含在音频轨道中）
             bg_music_temp = None
-            if bg_music_path:
+            if bg_music_path and not audio_track:
                 print(f"检测到背景音乐: {bg_music_path}")
-                bg_music_temp = self._prepare_background_music(bg_music_path, duration, bg_music_volume)
+                bg_music_temp = self._background_music_source(bg_music_path, duration, bg_music_volume,
+                                                              inline_bg_music)
+            
+            # 所有视频使用同一条音频，只编码一次（合并生成时各视频直接复制这条音频）
+            if (share_tracks or group_size > 1 or micro_batch_seconds) and not audio_track and len(image_paths) > 1:
+                audio_track = self._encode_shared_audio(audio_path, bg_music_temp, duration,
+                                                        bg_music_volume if inline_bg_music else None)
+                temp_tracks.append(audio_track)
             
-            total_images = len(image_paths)
+            # 并行调整所有图片的尺寸
+            frames = {}
+            if normalize_images:
+                frames = self._normalize_images(image_paths, image_fill_mode, max_workers)
             
-            # 处理每张图片
+            # 为每张图片创建任务，图片文件名（不含扩展名）作为输出视频名
+            jobs = []
             for index, image_path in enumerate(image_paths):
-                # 获取图片文件名（不含扩展名）作为输出视频名
                 image_name = os.path.splitext(os.path.basename(image_path))[0]
-                output_path = os.path.join(output_folder, f'{image_name}.mp4')
-                
-                print(f"正在处理第 {index + 1}/{total_images} 个视频: {image_name}")
-                print(f"使用图片: {image_path}")
-                
-                # 生成视频
-                stream = ffmpeg.input(image_path, loop=1, t=duration)
-                
-                # 如果有背景音乐，则混合音频
-                if bg_music_temp:
-                    print(f"混合背景音乐: {bg_music_temp}")
-                    
-                    main_audio = ffmpeg.input(audio_path).audio
-                    bg_audio = ffmpeg.input(bg_music_temp).audio
-                    
-                    # 混合背景音乐和主音频
-                    mixed_audio = ffmpeg.filter([main_audio, bg_audio], 'amix', 
-                                             inputs=2, dropout_transition=0, normalize=0)
-                    
-                    # 输出到文件
-                    stream = ffmpeg.output(
-                        stream.video,
-                        mixed_audio,
-                        output_path,
-                        vcodec='libx264',
-                        acodec='aac',
-                        video_bitrate='2000k',
-                        audio_bitrate='192k',
-                        r=30,
-                        pix_fmt='yuv420p',
-                        preset='ultrafast',
-                        threads='auto',
-                        shortest=None,
-                        movflags='+faststart'
-                    )
-                else:
-                    # 没有背景音乐，只使用原始音频
-                    audio = ffmpeg.input(audio_path)
-                    
-                    stream = ffmpeg.output(
-                        stream,
-                        audio,
-                        output_path,
-                        vcodec='libx264',
-                        acodec='aac',
-                        video_bitrate='2000k',
-                        audio_bitrate='128k',
-                        r=30,
-                        pix_fmt='yuv420p',
-                        preset='ultrafast',
-                        threads='auto',
-                        shortest=None,
-                        movflags='+faststart'
-                    )
-                
-                print(f"开始生成视频: {image_name}.mp4")
-                process = ffmpeg.run_async(stream, pipe_stdout=True, pipe_stderr=True)
-                
-                # 监控进度
-                start_time = time.time()
-                while process.poll() is None:
-                    elapsed = time.time() - start_time
-                    progress = min(100, int((elapsed / duration) * 100))
-                    if progress_callback:
-                        # 回调参数：当前图片索引，总图片数，当前图片处理进度
-                        progress_callback(index, total_images, progress)
-                    time.sleep(0.1)
-                
-                # 获取输出
-                stdout, stderr = process.communicate()
-                if process.returncode != 0:
-                    print(f"处理 {image_name} 时发生错误: {stderr.decode() if stderr else '未知错误'}")
-                    continue
-                    
-                print(f"视频 {image_name}.mp4 生成完成")
+                jobs.append({
+                    'index': index,
+                    'name': image_name,
+                    'image_path': frames.get(image_path, image_path),
+                    'audio_path': audio_path,
+                    'bg_music': bg_music_temp,
+                    'bg_music_path': bg_music_path,
+                    'bg_music_volume': bg_music_volume,
+                    'inline_bg_music': inline_bg_music,
+                    'audio_track': audio_track,
+                    'cache_video': use_cache,
+                    'still_source': still_source,
+                    'video_mode': video_mode,
+                    'chunk_seconds': chunk_seconds,
+                    'backend': backend,
+                    'duration': duration,
+                    'source_image': image_path,
+                    **self._output_paths(output_folder, image_name)
+                })
             
-            print(f"所有视频生成完成，输出目录: {output_folder}")
-            return True
+            try:
+                return self._run_jobs(jobs, output_folder, progress_callback, max_workers, group_size,
+                                      micro_batch_seconds, schedule)
+            finally:
+                for temp_track in temp_tracks:
+                    self._remove_temp_file(temp_track)
             
         except ffmpeg.Error as e:
             print(f"FFmpeg错误: {e.stderr.decode() if e.stderr else str(e)}")
@@ -229,167 +549,1254 @@ class VideoCore:
             
     def _process_multiple_audios_one_image(self, audio_paths, image_path, output_folder, 
                                           progress_callback=None, bg_music_path=None, 
-                                          bg_music_volume=0.3):
-        """处理多个音频一张图片的情况"""
+                                          bg_music_volume=0.3, max_workers=1, share_tracks=False,
+                                          use_cache=False, inline_bg_music=False, normalize_images=True,
+                                          image_fill_mode='letterbox', still_source=True,
+                                          video_mode='standard', group_size=1,
+                                          chunk_seconds=0, micro_batch_seconds=0, backend='ffmpeg',
+                                          schedule='fifo'):
+        """处理多个音频一张图片的情况（各视频音频不同，不合并生成，忽略 group_size）"""
         try:
-            total_audios = len(audio_paths)
+            # 调整图片尺寸
+            source_image = image_path
+            if normalize_images:
+                image_path = self._normalize_image(image_path, image_fill_mode)
+            
+            # 获取所有音频时长（未缓存的文件并行探测，缓存文件只写一次）
+            durations = self.probe_cache.durations(audio_paths)
+            
+            # 按最长的音频只准备一次背景音乐（如果有，使用缓存时在任务中按需准备）
+            bg_music_temp = None
+            if bg_music_path and not use_cache and durations:
+                print(f"检测到背景音乐: {bg_music_path}")
+                bg_music_temp = self._background_music_source(bg_music_path, max(durations), bg_music_volume,
+                                                              inline_bg_music)
             
-            # 处理每个音频
+            # 为每个音频创建任务，音频文件名（不含扩展名）作为输出视频名
+            jobs = []
             for index, audio_path in enumerate(audio_paths):
-                # 获取音频时长
-                probe = ffmpeg.probe(audio_path)
-                duration = float(probe['format']['duration'])
-                
-                # 准备背景音乐（如果有）
-                bg_music_temp = None
-                if bg_music_path:
-                    print(f"检测到背景音乐: {bg_music_path}")
-                    bg_music_temp = self._prepare_background_music(bg_music_path, duration, bg_music_volume)
-                
-                # 获取音频文件名（不含扩展名）作为输出视频名
+                duration = durations[index]
                 audio_name = os.path.splitext(os.path.basename(audio_path))[0]
-                output_path = os.path.join(output_folder, f'{audio_name}.mp4')
+                jobs.append({
+                    'index': index,
+                    'name': audio_name,
+                    'image_path': image_path,
+                    'audio_path': audio_path,
+                    'bg_music': bg_music_temp,
+                    'bg_music_path': bg_music_path,
+                    'bg_music_volume': bg_music_volume,
+                    'inline_bg_music': inline_bg_music,
+                    'cache_audio': use_cache,
+                    'still_source': still_source,
+                    'video_mode': video_mode,
+                    'chunk_seconds': chunk_seconds,
+                    'backend': backend,
+                    'duration': duration,
+                    'source_image': source_image,
+                    **self._output_paths(output_folder, audio_name)
+                })
+            
+            # 所有视频使用同一张图片，按最长的音频时长只编码一次画面（PyAV 后端本身只编码一个 GOP，不需要）
+            video_track = None
+            temp_tracks = []
+            if jobs and backend == 'ffmpeg':
+                max_duration = max(job['duration'] for job in jobs)
+                if use_cache:
+                    video_track = self._cached_video_track(image_path, max_duration, still_source=still_source,
+                                                           video_mode=video_mode)
+                if (share_tracks or micro_batch_seconds) and not video_track and len(jobs) > 1:
+                    video_track = self._encode_shared_video(image_path, max_duration, still_source, video_mode)
+                    temp_tracks.append(video_track)
+                for job in jobs:
+                    job['video_track'] = video_track
+            
+            try:
+                return self._run_jobs(jobs, output_folder, progress_callback, max_workers,
+                                      micro_batch_seconds=micro_batch_seconds, schedule=schedule)
+            finally:
+                for temp_track in temp_tracks:
+                    self._remove_temp_file(temp_track)
+            
+        except ffmpeg.Error as e:
+            print(f"FFmpeg错误: {e.stderr.decode() if e.stderr else str(e)}")
+            return False
+        except Exception as e:
+            print(f"生成视频时发生错误: {str(e)}")
+            return False
+
+    def _process_pipeline(self, audio_paths, image_paths, output_folder, progress_callback=None,
+                          bg_music_path=None, bg_music_volume=0.3, max_workers=1, share_tracks=False,
+                          use_cache=False, inline_bg_music=False, normalize_images=True,
+                          image_fill_mode='letterbox', still_source=True, video_mode='standard',
+                          group_size=1, chunk_seconds=0, micro_batch_seconds=0, backend='ffmpeg',
+                          schedule='fifo', thumbnails=False):
+        """按阶段流水线生成视频（share_tracks、group_size 和 micro_batch_seconds 不适用，忽略）
+
+        每个视频拆分为 探测 → 图片处理 → 编码 → 校验 → 缩略图 几个阶段，背景音乐在所有音频探测完成后
+        准备一次。探测和校验（ffprobe 进程）在线程池中执行，图片处理和缩略图（PIL）在进程池中执行，
+        编码在单独的线程池中最多同时运行 max_workers 个。探测和图片处理的结果按文件和参数缓存。
+        """
+        try:
+            jobs = self._stage_jobs(audio_paths, image_paths, output_folder, bg_music_path, bg_music_volume,
+                                    use_cache, inline_bg_music, still_source, video_mode, chunk_seconds, backend,
+                                    schedule)
+            total = len(jobs)
+            max_workers = max(1, min(int(max_workers or 1), total or 1))
+            threads = 'auto' if max_workers == 1 else str(max(1, (os.cpu_count() or 1) // max_workers))
+            
+            results = {}
+            pending = self._pending_jobs(jobs, results, progress_callback)
+            print(f"按阶段流水线生成 {len(pending)} 个视频，同时编码 {max_workers} 个")
+            
+            with StageDAG(io_workers=min(16, (os.cpu_count() or 1) * 2), memo=self._stage_memo) as dag:
+                dag.add_pool('encode', max_workers)
+                
+                # 探测阶段：每个音频只探测一次
+                probes = {}
+                for audio in dict.fromkeys(job['audio_path'] for job in pending):
+                    probes[audio] = dag.add(f'probe:{audio}', self.probe_cache.duration, audio,
+                                            key=self._stage_key('probe', audio))
                 
-                print(f"正在处理第 {index + 1}/{total_audios} 个视频: {audio_name}")
-                print(f"使用图片: {image_path}")
-                print(f"使用音频: {audio_path}")
-                print(f"音频时长: {duration}秒")
+                # 背景音乐阶段：按最长的音频准备一次（使用缓存时在编码阶段按需准备）
+                bgm = None
+                if bg_music_path and not use_cache:
+                    print(f"检测到背景音乐: {bg_music_path}")
+                    bgm = dag.add('bgm', lambda *durations: self._background_music_source(
+                        bg_music_path, max(durations), bg_music_volume, inline_bg_music), deps=tuple(probes.values()))
                 
-                # 生成视频
-                stream = ffmpeg.input(image_path, loop=1, t=duration)
+                # 图片处理阶段：每张图片只处理一次，在子进程中缩放
+                frames = {}
+                if normalize_images:
+                    for image in dict.fromkeys(job['image_path'] for job in pending):
+                        frames[image] = dag.add(f'image:{image}', normalize_image_file, image, image_fill_mode,
+                                                self.image_cache.cache_dir, pool='cpu',
+                                                key=self._stage_key('image', image, image_fill_mode))
                 
-                # 如果有背景音乐，则混合音频
-                if bg_music_temp:
-                    print(f"混合背景音乐: {bg_music_temp}")
-                    
-                    main_audio = ffmpeg.input(audio_path).audio
-                    bg_audio = ffmpeg.input(bg_music_temp).audio
+                verify_nodes = {}
+                for job in pending:
+                    index = job['index']
+                    audio, image = job['audio_path'], job['image_path']
                     
-                    # 混合背景音乐和主音频
-                    mixed_audio = ffmpeg.filter([main_audio, bg_audio], 'amix', 
-                                             inputs=2, dropout_transition=0, normalize=0)
+                    # 编码阶段：依赖的阶段完成后立即开始，结果按字段名填入任务
+                    inputs = {'duration': probes[audio]}
+                    if image in frames:
+                        inputs['image_path'] = frames[image]
+                    if bgm:
+                        inputs['bg_music'] = bgm
+                    encode = dag.add(f'encode:{index}', self._encode_stage, job, tuple(inputs), total,
+                                     progress_callback, threads, deps=tuple(inputs.values()), pool='encode')
+                    verify = dag.add(f'verify:{index}', self._verify_output, job, deps=(encode,))
+                    # 校验通过后才将临时文件重命名为正式文件并记入清单
+                    verify_nodes[index] = dag.add(f'commit:{index}', self._commit_stage, job, deps=(verify,))
                     
-                    # 输出到文件
-                    stream = ffmpeg.output(
-                        stream.video,
-                        mixed_audio,
-                        output_path,
-                        vcodec='libx264',
-                        acodec='aac',
-                        video_bitrate='2000k',
-                        audio_bitrate='192k',
-                        r=30,
-                        pix_fmt='yuv420p',
-                        preset='ultrafast',
-                        threads='auto',
-                        shortest=None,
-                        movflags='+faststart'
-                    )
-                else:
-                    # 没有背景音乐，只使用原始音频
-                    audio = ffmpeg.input(audio_path)
-                    
-                    stream = ffmpeg.output(
-                        stream,
-                        audio,
-                        output_path,
-                        vcodec='libx264',
-                        acodec='aac',
-                        video_bitrate='2000k',
-                        audio_bitrate='128k',
-                        r=30,
-                        pix_fmt='yuv420p',
-                        preset='ultrafast',
-                        threads='auto',
-                        shortest=None,
-                        movflags='+faststart'
-                    )
-                
-                print(f"开始生成视频: {audio_name}.mp4")
-                process = ffmpeg.run_async(stream, pipe_stdout=True, pipe_stderr=True)
+                    if thumbnails:
+                        thumbnail = os.path.join(output_folder, f"{job['name']}.jpg")
+                        if image in frames:
+                            dag.add(f'thumbnail:{index}', write_thumbnail, thumbnail,
+                                    deps=(frames[image], encode), pool='cpu')
+                        else:
+                            dag.add(f'thumbnail:{index}', write_thumbnail, thumbnail, image,
+                                    deps=(encode,), pool='cpu')
                 
-                # 监控进度
-                start_time = time.time()
-                while process.poll() is None:
-                    elapsed = time.time() - start_time
-                    progress = min(100, int((elapsed / duration) * 100))
-                    if progress_callback:
-                        # 回调参数：当前音频索引，总音频数，当前音频处理进度
-                        progress_callback(index, total_audios, progress)
-                    time.sleep(0.1)
-                
-                # 获取输出
-                stdout, stderr = process.communicate()
-                if process.returncode != 0:
-                    print(f"处理 {audio_name} 时发生错误: {stderr.decode() if stderr else '未知错误'}")
-                    continue
-                    
-                print(f"视频 {audio_name}.mp4 生成完成")
+                dag.run()
             
-            print(f"所有视频生成完成，输出目录: {output_folder}")
-            return True
+            for node in dag.nodes.values():
+                if node.error is not None and node.name.startswith(('probe:', 'verify:', 'commit:', 'thumbnail:')):
+                    print(f"阶段 {node.name} 失败: {str(node.error)}")
+            for job in pending:
+                node = dag.nodes[verify_nodes[job['index']]]
+                results[job['index']] = node.error is None
+                if node.error is not None:
+                    job.setdefault('error', str(node.error))
+            return self._finish_batch(jobs, results, output_folder)
             
-        except ffmpeg.Error as e:
-            print(f"FFmpeg错误: {e.stderr.decode() if e.stderr else str(e)}")
+        except Exception as e:
+            print(f"生成视频时发生错误: {str(e)}")
             return False
+
+    def _process_async(self, audio_paths, image_paths, output_folder, progress_callback=None,
+                       bg_music_path=None, bg_music_volume=0.3, max_workers=1, share_tracks=False,
+                       use_cache=False, inline_bg_music=False, normalize_images=True,
+                       image_fill_mode='letterbox', still_source=True, video_mode='standard',
+                       group_size=1, chunk_seconds=0, micro_batch_seconds=0, backend='ffmpeg',
+                       schedule='fifo'):
+        """用 asyncio 事件循环调度生成视频，见 AsyncBatchRunner
+
+        事件循环运行在调用线程中（GUI 的生成线程或队列工作进程），取消和暂停仍通过 self.control。
+        share_tracks、group_size、micro_batch_seconds、chunk_seconds 和 PyAV 后端不适用，忽略。
+        """
+        try:
+            if chunk_seconds or backend != 'ffmpeg':
+                print("asyncio 调度不支持分段编码和 PyAV 后端，改为整段用 FFmpeg 编码")
+            jobs = self._stage_jobs(audio_paths, image_paths, output_folder, bg_music_path, bg_music_volume,
+                                    use_cache, inline_bg_music, still_source, video_mode, 0, 'ffmpeg', schedule)
+            results = {}
+            pending = self._pending_jobs(jobs, results, progress_callback)
+            runner = AsyncBatchRunner(self, min(int(max_workers or 1), len(pending) or 1), progress_callback,
+                                      bg_music_path, bg_music_volume, inline_bg_music, use_cache,
+                                      normalize_images, image_fill_mode)
+            results.update(runner.run(pending, len(jobs)))
+            return self._finish_batch(jobs, results, output_folder)
+            
         except Exception as e:
             print(f"生成视频时发生错误: {str(e)}")
             return False
 
-    def _resize_image(self, image_path):
-        """调整图片大小"""
+    def _stage_jobs(self, audio_paths, image_paths, output_folder, bg_music_path=None, bg_music_volume=0.3,
+                    use_cache=False, inline_bg_music=False, still_source=True, video_mode='standard',
+                    chunk_seconds=0, backend='ffmpeg', schedule='fifo'):
+        """按阶段生成（流水线和 asyncio 调度）的任务列表，音频时长、调整后的图片和背景音乐在各阶段中填入"""
+        # 多个音频一张图片时每个音频一个视频，否则每张图片一个视频
+        if len(audio_paths) > 1 and len(image_paths) == 1:
+            pairs = [(audio, image_paths[0], audio) for audio in audio_paths]
+        else:
+            pairs = [(audio_paths[0], image, image) for image in image_paths]
+        if schedule in ('lpt', 'spt') and len(audio_paths) > 1:
+            # 按音频时长调度需要先探测全部音频（结果会缓存，之后的探测阶段直接命中）
+            durations = dict(zip(audio_paths, self.probe_cache.durations(audio_paths)))
+            pairs = order_items(pairs, schedule, cost=lambda pair: durations[pair[0]])
+        jobs = []
+        for index, (audio, image, source) in enumerate(pairs):
+            name = os.path.splitext(os.path.basename(source))[0]
+            jobs.append({
+                'index': index,
+                'name': name,
+                'image_path': image,
+                'audio_path': audio,
+                'bg_music': None,
+                'bg_music_path': bg_music_path if use_cache else None,
+                'bg_music_volume': bg_music_volume,
+                'inline_bg_music': inline_bg_music,
+                'cache_video': use_cache,
+                'cache_audio': use_cache,
+                'still_source': still_source,
+                'video_mode': video_mode,
+                'chunk_seconds': chunk_seconds,
+                'backend': backend,
+                'duration': 0,
+                'source_image': image,
+                **self._output_paths(output_folder, name)
+            })
+        return jobs
+
+    def _stage_key(self, stage, file_path, *params):
+        """流水线阶段的缓存键，文件修改后失效"""
+        stat = os.stat(file_path)
+        return make_key(stage, os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, *params)
+
+    def _encode_stage(self, job, fields, total, progress_callback, threads, *values):
+        """流水线的编码阶段：填入前序阶段的结果（音频时长、调整后的图片、背景音乐）后生成视频
+        Returns:
+            str: 输出视频路径，失败时抛出异常，后续阶段不再执行
+        """
+        job.update(zip(fields, values))
+        if not self._render_job(job, total, progress_callback, threads):
+            raise RuntimeError(f"生成 {job['name']} 失败")
+        return job['output_path']
+
+    def _verify_output(self, job, output_path):
+        """校验输出视频包含画面和音频，且时长与音频一致
+        Returns:
+            str: 输出视频路径，校验失败时抛出异常
+        """
+        return self._check_output(job, ffmpeg.probe(output_path), output_path)
+
+    def _check_output(self, job, probe, output_path):
+        """按探测结果校验输出视频，校验失败时抛出异常"""
+        codec_types = {stream.get('codec_type') for stream in probe.get('streams', [])}
+        if not {'video', 'audio'} <= codec_types:
+            raise RuntimeError(f"{job['name']}.mp4 缺少画面或音频")
+        duration = float(probe['format']['duration'])
+        if abs(duration - job['duration']) > VERIFY_TOLERANCE:
+            raise RuntimeError(f"{job['name']}.mp4 时长 {duration:.2f}秒，与音频时长 {job['duration']:.2f}秒不一致")
+        return output_path
+
+    def _commit_stage(self, job, output_path):
+        """流水线的提交阶段：校验通过的视频重命名为正式文件并记入清单，失败时抛出异常"""
+        if not self._commit_output(job):
+            raise RuntimeError(f"保存 {job['name']}.mp4 失败")
+        return job['final_path']
+
+    def _output_paths(self, output_folder, name):
+        """任务的输出路径：生成时写入临时文件（output_path），成功后重命名为正式文件（final_path）"""
+        final_path = os.path.join(output_folder, f'{name}.mp4')
+        return {'final_path': final_path, 'output_path': partial_path(final_path)}
+
+    def _job_spec_hash(self, job):
+        """视频的规格哈希：本批的输出设置、源图片和音频的文件指纹，任一变化都需要重新生成"""
+        return make_key('output', self._batch_spec, file_fingerprint(job['source_image']),
+                        file_fingerprint(job['audio_path']), job['name'])
+
+    def _pending_jobs(self, jobs, results, progress_callback=None):
+        """按生成清单筛选需要生成的任务
+        Args:
+            jobs: 任务列表
+            results: 任务序号 -> 是否成功，已完成而跳过的任务记为成功
+            progress_callback: 进度回调函数，已完成而跳过的任务报告为 100%
+        Returns:
+            list: 需要生成的任务
+        """
+        pending = []
+        for job in jobs:
+            job['spec_hash'] = self._job_spec_hash(job)
+            if self._manifest.is_complete(job['name'], job['spec_hash'], job['final_path']):
+                job['skipped'] = True
+                results[job['index']] = True
+                if progress_callback:
+                    progress_callback(job['index'], len(jobs), 100, {'skipped': True})
+                continue
+            # 删除上次中断留下的临时文件，否则 FFmpeg 会询问是否覆盖
+            self._remove_temp_file(job['output_path'])
+            self._manifest.update(job['name'], state='running', spec_hash=job['spec_hash'],
+                                  file=os.path.basename(job['final_path']))
+            pending.append(job)
+        skipped = len(jobs) - len(pending)
+        if skipped:
+            print(f"跳过 {skipped} 个已生成完成的视频，需要生成 {len(pending)} 个")
+        # 素材已从项目中移除的视频保留在输出目录中，不删除
+        names = {job['name'] for job in jobs}
+        removed = [name for name in self._manifest.names() if name not in names]
+        if removed:
+            print(f"以下视频的素材已不在本次生成中，保留原文件: {', '.join(removed)}")
+        return pending
+
+    def _commit_output(self, job):
+        """将生成完成的临时文件重命名为正式文件，并在清单中记录大小和校验和
+        Returns:
+            bool: 是否成功
+        """
+        try:
+            os.replace(job['output_path'], job['final_path'])
+            self._manifest.update(job['name'], state='done', spec_hash=job['spec_hash'],
+                                  size=os.path.getsize(job['final_path']),
+                                  checksum=file_hash(job['final_path']),
+                                  quick_hash=quick_hash(job['final_path']), error=None)
+            job['committed'] = True
+            return True
+        except Exception as e:
+            job['error'] = f"保存失败: {str(e)}"
+            print(f"保存 {job['name']}.mp4 失败: {str(e)}")
+            return False
+
+    def _discard_output(self, job):
+        """删除失败或已取消任务的临时文件，在清单中标记状态、尝试次数和失败原因"""
+        self._remove_temp_file(job['output_path'])
+        self._manifest.update(job['name'], state='cancelled' if self.control.cancelled else 'failed',
+                              spec_hash=job['spec_hash'], attempts=job.get('attempts', 1), error=job.get('error'))
+
+    def _job_report(self, job, succeeded):
+        """单个视频的生成结果，保存在 self.last_result['jobs'] 中"""
+        if job.get('skipped'):
+            state = 'skipped'
+        elif succeeded:
+            state = 'done'
+        else:
+            state = 'cancelled' if self.control.cancelled else 'failed'
+        return {
+            'name': job['name'],
+            'state': state,
+            'attempts': 0 if job.get('skipped') else job.get('attempts', 1),
+            'fallback': bool(job.get('fallback')),
+            'error': None if succeeded else job.get('error') or '未知错误',
+            'errors': list(job.get('errors', [])),
+            'output_path': job['final_path'] if succeeded else None
+        }
+
+    def _commit_results(self, group, results):
+        """一组任务生成完成后立即提交成功的视频，中断时已完成的视频不需要重新生成"""
+        for job in group:
+            if results.get(job['index']) and not self._commit_output(job):
+                results[job['index']] = False
+
+    def _run_jobs(self, jobs, output_folder, progress_callback=None, max_workers=1, group_size=1,
+                  micro_batch_seconds=0, schedule='fifo'):
+        """执行一批视频任务
+        Args:
+            jobs: 任务列表
+            output_folder: 输出目录
+            progress_callback: 进度回调函数
+            max_workers: 同时运行的任务数，1 为逐个处理
+            group_size: 每个 FFmpeg 进程同时输出的视频数，1 为每个视频单独一个进程
+            micro_batch_seconds: 短于该时长的视频按小批量合并生成，0 为不合并
+            schedule: 调度策略，见 SCHEDULE_POLICIES
+        Returns:
+            bool: 是否全部成功
+        """
+        results = {}  # 任务序号 -> 是否成功
+        pending = self._pending_jobs(jobs, results, progress_callback)
+        total = len(jobs)
+        group_size = max(1, min(int(group_size or 1), MAX_GROUP_SIZE))
+        short_jobs, long_jobs = [], []
+        for job in pending:
+            (short_jobs if micro_batch_seconds and job['duration'] < micro_batch_seconds else long_jobs).append(job)
+        groups = [long_jobs[i:i + group_size] for i in range(0, len(long_jobs), group_size)]
+        # 批次数不少于并行任务数，避免合并后并行度下降
+        batch_size = max(1, min(MICRO_BATCH_SIZE, -(-len(short_jobs) // max(1, int(max_workers or 1)))))
+        groups += [short_jobs[i:i + batch_size] for i in range(0, len(short_jobs), batch_size)]
+        if group_size > 1:
+            print(f"合并生成视频，每个 FFmpeg 进程最多输出 {group_size} 个视频")
+        if short_jobs:
+            print(f"{len(short_jobs)} 个短于 {micro_batch_seconds} 秒的视频按每批 {batch_size} 个合并生成")
+        max_workers = max(1, min(int(max_workers or 1), len(groups) or 1))
+        if schedule in ('lpt', 'spt') and max_workers > 1:
+            # 同组视频在一个进程中生成，按组内视频时长之和估计耗时
+            groups = order_items(groups, schedule, cost=lambda group: sum(job['duration'] for job in group))
+            print(f"调度策略: {'最长的视频优先' if schedule == 'lpt' else '最短的视频优先'}")
+        # 并行时平分 CPU 核心，避免每个 x264 进程都占满全部核心
+        threads = 'auto' if max_workers == 1 else str(max(1, (os.cpu_count() or 1) // max_workers))
+        
+        if max_workers == 1:
+            for group in groups:
+                results.update(self._render_group(group, total, progress_callback, threads))
+                self._commit_results(group, results)
+        else:
+            print(f"并行生成视频，同时运行 {max_workers} 个任务")
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(self._render_group, group, total, progress_callback, threads): group
+                           for group in groups}
+                for future in as_completed(futures):
+                    group = futures[future]
+                    try:
+                        results.update(future.result())
+                    except Exception as e:
+                        print(f"处理 {', '.join(job['name'] for job in group)} 时发生错误: {str(e)}")
+                        for job in group:
+                            results[job['index']] = False
+                            job.setdefault('error', str(e))
+                    self._commit_results(group, results)
+        return self._finish_batch(jobs, results, output_folder)
+
+    def _finish_batch(self, jobs, results, output_folder):
+        """汇总一批任务的结果，保存到 self.last_result 并输出统计
+        Args:
+            jobs: 任务列表
+            results: 任务序号 -> 是否成功
+            output_folder: 输出目录
+        Returns:
+            bool: 是否全部成功
+        """
+        total = len(jobs)
+        start_time = self.batch_start_time or time.time()
+        for job in jobs:
+            if job.get('skipped') or job.get('committed'):
+                continue
+            if results.get(job['index']):
+                results[job['index']] = self._commit_output(job)
+            if not results.get(job['index']):
+                self._discard_output(job)
+        succeeded = [job['name'] for job in jobs if results.get(job['index'])]
+        failed = [job['name'] for job in jobs if not results.get(job['index'])]
+        skipped = [job['name'] for job in jobs if job.get('skipped')]
+        reports = [self._job_report(job, results.get(job['index'])) for job in jobs]
+        retried = [report['name'] for report in reports if report['state'] == 'done' and report['attempts'] > 1]
+        
+        self.last_result = {
+            'total': total,
+            'succeeded': succeeded,
+            'failed': failed,
+            'skipped': skipped,
+            'retried': retried,
+            'jobs': reports,
+            'cancelled': self.control.cancelled,
+            'output_folder': output_folder,
+            'cpu_time': sum(job.get('cpu_time', 0.0) for job in jobs),
+            'output_size': sum(job.get('output_size', 0) for job in jobs),
+            'jobs_per_second': total / max(time.time() - start_time, 1e-6)
+        }
+        for cache in (self.media_cache, self.bgm_cache, self.image_cache):
+            try:
+                cache.flush()
+            except Exception as e:
+                print(f"保存缓存索引失败: {str(e)}")
+        if self._manifest:
+            try:
+                self._manifest.compact()
+            except Exception as e:
+                print(f"保存生成清单失败: {str(e)}")
+        if self.media_cache.hits or self.media_cache.misses:
+            self.media_cache.report('轨道缓存')
+        if self.bgm_cache.hits or self.bgm_cache.misses:
+            self.bgm_cache.report('背景音乐缓存')
+        if self.image_cache.hits or self.image_cache.misses:
+            self.image_cache.report('图片缓存')
+        print(f"{'生成已取消' if self.control.cancelled else '所有视频生成完成'}，成功 {len(succeeded)} 个（其中跳过已完成的 {len(skipped)} 个），失败 {len(failed)} 个，"
+              f"CPU 时间共 {self.last_result['cpu_time']:.1f}秒，"
+              f"输出共 {self.last_result['output_size'] / (1024 * 1024):.1f}MB，"
+              f"吞吐量 {self.last_result['jobs_per_second']:.2f} 个/秒，输出目录: {output_folder}")
+        if retried:
+            print(f"重试后成功的视频: {', '.join(retried)}")
+        if self.control.cancelled:
+            print(f"未完成的 {len(failed)} 个视频可在输出目录中继续生成")
+        elif failed:
+            print(f"失败的视频: {', '.join(failed)}")
+            for report in reports:
+                if report['state'] == 'failed':
+                    print(f"  {report['name']}（尝试 {report['attempts']} 次）: {report['error'].strip()[-500:]}")
+        return not failed
+
+    def _mix_audio(self, audio_path, bg_music, inline_volume=None):
+        """构建主音频（可选混合背景音乐）的音频流
+        Args:
+            audio_path: 主音频文件路径
+            bg_music: 背景音乐文件路径
+            inline_volume: 为 None 时 bg_music 是已处理好的背景音乐；否则 bg_music 是原始文件，
+                在滤镜图中循环并按该音量调整，不生成中间文件
+        Returns:
+            tuple: (音频流, 音频码率)
+        """
+        # 如果有背景音乐，则混合音频
+        if bg_music:
+            main_audio = ffmpeg.input(audio_path).audio
+            if inline_volume is None:
+                bg_audio = ffmpeg.input(bg_music).audio
+            else:
+                # 在滤镜图中循环（不使用 -stream_loop -1，部分 FFmpeg 版本编码结束后进程不会退出）
+                bg_audio = (ffmpeg.input(bg_music).audio
+                            .filter('aloop', loop=-1, size='2e+09')
+                            .filter('volume', volume=inline_volume))
+            
+            # 混合背景音乐和主音频
+            # 背景音乐可能长于主音频，混音长度以主音频为准
+            audio = ffmpeg.filter([main_audio, bg_audio], 'amix', 
+                                  inputs=2, duration='first', dropout_transition=0, normalize=0)
+            return audio, MIXED_AUDIO_BITRATE
+        # 没有背景音乐，只使用原始音频
+        return ffmpeg.input(audio_path).audio, AUDIO_BITRATE
+
+    def _encode_audio_track(self, audio_path, bg_music, duration, output_file, inline_volume=None):
+        """将音频（可选混合背景音乐）编码为 AAC 轨道文件"""
+        audio, audio_bitrate = self._mix_audio(audio_path, bg_music, inline_volume)
+        stream = ffmpeg.output(audio, output_file, acodec='aac', audio_bitrate=audio_bitrate, t=duration)
+        self._run_ffmpeg(stream, duration)
+
+    def _video_encode_args(self, video_mode='standard'):
+        """返回画面编码模式对应的编码参数，未知模式使用 standard"""
+        return VIDEO_MODES.get(video_mode, VIDEO_ENCODE_ARGS)
+
+    def _video_length(self, job):
+        """任务画面的 (时长, 帧数)：音频时长按帧率向下取整到整帧，见 video_frames
+        （编译命令行模板的占位任务直接提供这两个字段）
+        """
+        if 'video_frames' in job:
+            return job['video_duration'], job['video_frames']
+        frame_rate = self._video_encode_args(job.get('video_mode', 'standard'))['r']
+        frames = video_frames(job['duration'], frame_rate)
+        return frames / frame_rate, frames
+
+    def _image_source(self, image_path, duration, frames, still_source=False, video_mode='standard'):
+        """构建静态画面的视频流
+        Args:
+            image_path: 图片文件路径
+            duration: 画面时长（秒，应为整帧）
+            frames: 画面帧数（duration 对应的帧数）
+            still_source: 为 True 时只解码一次图片并转换为 yuv420p，在滤镜图中重复这一帧；
+                否则由 image2 按帧循环读取，每一帧都重新解码图片
+            video_mode: 画面编码模式，决定画面的帧率
+        Returns:
+            视频流，画面在 duration 处结束，不依赖输出时长截断
+        """
+        encode_args = self._video_encode_args(video_mode)
+        if not still_source:
+            # 按输出帧率读取图片，避免读入多余的帧再丢弃
+            return ffmpeg.input(image_path, loop=1, t=duration, framerate=encode_args['r']).video
+        # 循环的画面没有结束时间，按帧数截断（按时间截断时浮点误差可能多出一帧）
+        return (ffmpeg.input(image_path).video
+                .filter('format', encode_args['pix_fmt'])
+                .filter('loop', loop=-1, size=1, start=0)
+                .filter('setpts', f"N/({encode_args['r']}*TB)")
+                .filter('trim', end_frame=frames))
+
+    def _encode_video_track(self, image_path, duration, output_file, threads='auto', still_source=False,
+                            video_mode='standard'):
+        """将图片编码为指定时长（向下取整到整帧）的 H.264 静态画面轨道文件"""
+        frame_rate = self._video_encode_args(video_mode)['r']
+        frames = video_frames(duration, frame_rate)
+        video = self._image_source(image_path, frames / frame_rate, frames, still_source, video_mode)
+        stream = ffmpeg.output(video, output_file, threads=threads, **self._video_encode_args(video_mode))
+        self._run_ffmpeg(stream, duration)
+
+    def _encode_shared_audio(self, audio_path, bg_music, duration, inline_volume=None):
+        """将一批视频共用的音频（含背景音乐混音）预先编码为 AAC
+        Returns:
+            str: 编码后的音频文件路径，失败时返回 None（各视频回退为单独编码）
+        """
+        shared_file = os.path.join(self.temp_dir, f"shared_audio_{uuid.uuid4().hex}.m4a")
+        try:
+            print("预先编码共用音频轨道")
+            self._encode_audio_track(audio_path, bg_music, duration, shared_file, inline_volume)
+            print(f"共用音频轨道编码完成: {shared_file}")
+            return shared_file
+        except ffmpeg.Error as e:
+            print(f"编码共用音频轨道失败，改为逐个编码: {e.stderr.decode() if e.stderr else str(e)}")
+            self._remove_temp_file(shared_file)
+            return None
+
+    def _encode_shared_video(self, image_path, duration, still_source=False, video_mode='standard'):
+        """将一批视频共用的图片预先编码为指定时长的 H.264 画面轨道
+        Returns:
+            str: 编码后的视频文件路径，失败时返回 None（各视频回退为单独编码）
+        """
+        shared_file = os.path.join(self.temp_dir, f"shared_video_{uuid.uuid4().hex}.mp4")
+        try:
+            print(f"预先编码共用画面轨道，时长: {duration}秒")
+            self._encode_video_track(image_path, duration, shared_file, still_source=still_source,
+                                     video_mode=video_mode)
+            print(f"共用画面轨道编码完成: {shared_file}")
+            return shared_file
+        except ffmpeg.Error as e:
+            print(f"编码共用画面轨道失败，改为逐个编码: {e.stderr.decode() if e.stderr else str(e)}")
+            self._remove_temp_file(shared_file)
+            return None
+
+    def _track_bucket(self, duration):
+        """返回不小于指定时长的缓存时长档位"""
+        for bucket in TRACK_BUCKETS:
+            if duration <= bucket:
+                return bucket
+        return int(-(-duration // 3600) * 3600)
+
+    def _cached_video_track(self, image_path, duration, threads='auto', still_source=False,
+                            video_mode='standard'):
+        """从缓存获取图片的静态画面轨道，未命中时按时长档位编码并写入缓存
+        Returns:
+            str: 时长不小于 duration 的画面轨道路径，失败时返回 None
+        """
         try:
-            # 打开图片
-            img = Image.open(image_path)
+            image_hash = file_hash(image_path)
+            bucket = self._track_bucket(duration)
+            # 已缓存的更长档位同样可以截取使用
+            buckets = [b for b in TRACK_BUCKETS if b >= bucket] or [bucket]
+            encode_args = self._video_encode_args(video_mode)
+            keys = [make_key('video', image_hash, 'source', encode_args, b) for b in buckets]
+            cached = self.media_cache.find(keys)
+            if cached:
+                print(f"画面轨道命中缓存: {os.path.basename(image_path)}")
+                return cached
             
-            # 计算新的尺寸，保持宽高比
-            target_width = 1920
-            target_height = 1080
+            print(f"编码画面轨道并写入缓存: {os.path.basename(image_path)}，时长档位 {bucket}秒")
+            temp_file = self.media_cache.temp_path('.mp4')
+            try:
+                self._encode_video_track(image_path, bucket, temp_file, threads, still_source, video_mode)
+            except Exception:
+                self._remove_temp_file(temp_file)
+                raise
+            return self.media_cache.put(keys[0], temp_file, {'image': image_path, 'duration': bucket})
+        except ffmpeg.Error as e:
+            print(f"编码画面轨道失败，改为直接编码: {e.stderr.decode() if e.stderr else str(e)}")
+            return None
+        except Exception as e:
+            print(f"读取画面轨道缓存失败，改为直接编码: {str(e)}")
+            return None
+
+    def _cached_audio_track(self, audio_path, duration, bg_music_path=None, bg_music_volume=0.3,
+                            inline_bg_music=False):
+        """从缓存获取音频（含背景音乐混音）的 AAC 轨道，未命中时编码并写入缓存
+        Returns:
+            str: 音频轨道路径，失败时返回 None
+        """
+        try:
+            has_bg_music = bool(bg_music_path and os.path.exists(bg_music_path))
+            bg_hash = file_hash(bg_music_path) if has_bg_music else None
+            audio_bitrate = MIXED_AUDIO_BITRATE if has_bg_music else AUDIO_BITRATE
+            key = make_key('audio', file_hash(audio_path), audio_bitrate,
+                           bg_hash, bg_music_volume if has_bg_music else None,
+                           'inline' if has_bg_music and inline_bg_music else None, round(duration, 3))
+            cached = self.media_cache.get(key)
+            if cached:
+                print(f"音频轨道命中缓存: {os.path.basename(audio_path)}")
+                return cached
             
-            # 计算缩放比例
-            width_ratio = target_width / img.width
-            height_ratio = target_height / img.height
-            ratio = min(width_ratio, height_ratio)
+            print(f"编码音频轨道并写入缓存: {os.path.basename(audio_path)}")
+            bg_music_temp = None
+            if has_bg_music:
+                bg_music_temp = self._background_music_source(bg_music_path, duration, bg_music_volume,
+                                                              inline_bg_music)
+                if not bg_music_temp:
+                    return None
+            temp_file = self.media_cache.temp_path('.m4a')
+            try:
+                self._encode_audio_track(audio_path, bg_music_temp, duration, temp_file,
+                                         bg_music_volume if inline_bg_music else None)
+            except Exception:
+                self._remove_temp_file(temp_file)
+                raise
+            return self.media_cache.put(key, temp_file, {'audio': audio_path, 'duration': duration})
+        except ffmpeg.Error as e:
+            print(f"编码音频轨道失败，改为直接编码: {e.stderr.decode() if e.stderr else str(e)}")
+            return None
+        except Exception as e:
+            print(f"读取音频轨道缓存失败，改为直接编码: {str(e)}")
+            return None
+
+    def _prepare_job_tracks(self, job, threads='auto'):
+        """按需从缓存获取任务的画面/音频轨道"""
+        if job.get('cache_video') and not job.get('video_track') and job.get('backend', 'ffmpeg') == 'ffmpeg':
+            job['video_track'] = self._cached_video_track(job['image_path'], job['duration'], threads,
+                                                          job.get('still_source', False),
+                                                          job.get('video_mode', 'standard'))
+        if job.get('cache_audio') and not job.get('audio_track'):
+            job['audio_track'] = self._cached_audio_track(job['audio_path'], job['duration'],
+                                                          job.get('bg_music_path'), job.get('bg_music_volume', 0.3),
+                                                          job.get('inline_bg_music', False))
+            # 缓存不可用时回退为直接混合背景音乐
+            if not job['audio_track'] and job.get('bg_music_path') and not job.get('bg_music'):
+                job['bg_music'] = self._background_music_source(job['bg_music_path'], job['duration'],
+                                                                job.get('bg_music_volume', 0.3),
+                                                                job.get('inline_bg_music', False))
+
+    def _chunked_video_track(self, job, threads='auto'):
+        """将长视频的画面分段并行编码，再用 concat 分离器流复制拼接为完整的画面轨道
+
+        每段单独编码，都从关键帧开始，可以直接拼接。画面是静态图片，相同时长的分段内容完全相同，
+        只需编码一次，在拼接列表中重复引用。
+        Returns:
+            str: 拼接好的画面轨道路径，失败时返回 None（改为直接编码）
+        """
+        video_mode = job.get('video_mode', 'standard')
+        frame_rate = self._video_encode_args(video_mode)['r']
+        # 分段时长取整到整帧，拼接后时间戳连续
+        chunk = max(1, round(job['chunk_seconds'] * frame_rate)) / frame_rate
+        count = int(job['duration'] // chunk)
+        segments = [chunk] * count
+        remainder = job['duration'] - count * chunk
+        if remainder * frame_rate >= 0.5:
+            segments.append(remainder)
+        
+        token = uuid.uuid4().hex
+        chunk_files = {duration: os.path.join(self.temp_dir, f"chunk_{token}_{index}.mp4")
+                       for index, duration in enumerate(sorted(set(segments)))}
+        list_file = os.path.join(self.temp_dir, f"chunk_{token}.txt")
+        output_file = os.path.join(self.temp_dir, f"chunked_video_{token}.mp4")
+        # 各分段进程平分当前任务可用的 CPU 核心
+        cores = (os.cpu_count() or 1) if threads == 'auto' else int(threads)
+        workers = max(1, min(len(chunk_files), cores))
+        try:
+            print(f"分段并行编码画面: {len(segments)} 段，每段 {chunk:.1f}秒，需编码 {len(chunk_files)} 段")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self._encode_video_track, job['image_path'], duration, chunk_file,
+                                           str(max(1, cores // workers)),
+                                           job.get('still_source', False), video_mode)
+                           for duration, chunk_file in chunk_files.items()]
+                for future in futures:
+                    future.result()
             
-            new_width = int(img.width * ratio)
-            new_height = int(img.height * ratio)
+            with open(list_file, 'w', encoding='utf-8') as f:
+                for duration in segments:
+                    path = os.path.abspath(chunk_files[duration]).replace("'", "'\\''")
+                    f.write(f"file '{path}'\n")
+            stream = ffmpeg.input(list_file, format='concat', safe=0)
+            stream = ffmpeg.output(stream.video, output_file, vcodec='copy')
+            self._run_ffmpeg(stream, job['duration'])
+            return output_file
+        except ffmpeg.Error as e:
+            print(f"分段编码画面失败，改为直接编码: {e.stderr.decode() if e.stderr else str(e)}")
+            self._remove_temp_file(output_file)
+            return None
+        except Exception as e:
+            print(f"分段编码画面失败，改为直接编码: {str(e)}")
+            self._remove_temp_file(output_file)
+            return None
+        finally:
+            for chunk_file in chunk_files.values():
+                self._remove_temp_file(chunk_file)
+            self._remove_temp_file(list_file)
+
+    def _run_ffmpeg(self, stream, duration=0):
+        """运行 FFmpeg 并等待完成（与 ffmpeg.run(stream, overwrite_output=True, quiet=True) 相同），
+        子进程登记到 self.control，可被暂停和取消
+        Args:
+            stream: FFmpeg 输出流
+            duration: 输出时长（秒），用于计算看门狗的时限（没有进度输出，只检查时限），0 为不限制
+        """
+        process = self.control.popen(ffmpeg.compile(stream, overwrite_output=True),
+                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        watched = self.control.watch(process, os.path.basename(stream.node.kwargs.get('filename', 'FFmpeg')),
+                                     timeout=self._job_timeout(duration) if duration else 0)
+        reader = PipeReader(process)
+        try:
+            returncode = reader.wait()
+        finally:
+            self.control.release(process)
+        stderr = reader.stderr
+        if returncode != 0:
+            if watched.reason:
+                stderr = f"{watched.reason}，已结束".encode()
+            raise ffmpeg.Error('ffmpeg', reader.stdout, stderr)
+        return reader.stdout, stderr
+
+    def _read_progress(self, process, progress, watched, on_progress=None):
+        """在后台线程读取 FFmpeg 的输出：stdout 的 -progress 进度块更新 progress 并报告给看门狗，
+        stderr 只保留最后几行
+        Args:
+            on_progress: 每个进度块调用一次（在读取线程中）
+        Returns:
+            PipeReader: 调用 wait 等待进程结束
+        """
+        def on_line(line):
+            if progress.feed_line(line):
+                watched.advance(progress.out_time)
+                if on_progress:
+                    on_progress()
+        return PipeReader(process, on_line)
+
+    def _job_timeout(self, duration):
+        """按音频时长计算的任务时限（秒），0 为不限制"""
+        if not self._timeout_factor:
+            return 0
+        return max(MIN_JOB_TIMEOUT, duration * self._timeout_factor)
+
+    def cancel(self):
+        """取消正在进行的批量生成：结束 FFmpeg 子进程，未完成视频的临时文件在批次结束时删除"""
+        return self.control.cancel()
+
+    def pause(self):
+        """暂停批量生成：挂起 FFmpeg 子进程，尚未开始的视频等待继续"""
+        return self.control.pause()
+
+    def resume(self):
+        """继续已暂停的批量生成"""
+        return self.control.resume()
+
+    def _remove_temp_file(self, file_path):
+        """删除临时文件，忽略不存在的文件"""
+        if file_path and os.path.exists(file_path):
+            try:
+                os.unlink(file_path)
+            except Exception as e:
+                print(f"删除临时文件失败: {str(e)}")
+
+    def _build_output(self, job, threads='auto', audio=None, video=None):
+        """构建单个任务的 FFmpeg 输出流
+        Args:
+            job: 任务
+            threads: 编码线程数
+            audio: 指定使用的 (音频流, 输出参数)，合并生成时多个输出共用同一路音频
+            video: 指定使用的 (视频流, 输出参数)，合并生成时多个输出共用同一路画面
+        """
+        output_args = {}
+        video_duration, frames = self._video_length(job)
+        if video:
+            video, video_args = video
+            output_args.update(video_args)
+        elif job.get('video_track'):
+            # 复制已编码的画面轨道，从首个关键帧开始按画面时长截取
+            video = ffmpeg.input(job['video_track'], t=video_duration).video
+            output_args.update(vcodec='copy')
+        else:
+            video_mode = job.get('video_mode', 'standard')
+            video = self._image_source(job['image_path'], video_duration, frames,
+                                       job.get('still_source', False), video_mode)
+            output_args.update(self._video_encode_args(video_mode), threads=threads)
+        
+        if audio:
+            audio, audio_args = audio
+            output_args.update(audio_args)
+        elif job.get('audio_track'):
+            # 复制已编码的音频轨道
+            audio = ffmpeg.input(job['audio_track']).audio
+            output_args.update(acodec='copy')
+        else:
+            inline_volume = job.get('bg_music_volume', 0.3) if job.get('inline_bg_music') else None
+            audio, audio_bitrate = self._mix_audio(job['audio_path'], job['bg_music'], inline_volume)
+            output_args.update(acodec='aac', audio_bitrate=audio_bitrate)
+        
+        # 画面已在各自的输入或滤镜中截取为整帧，不超出音频；音频按音频时长截取
+        # （不使用 -shortest：FFmpeg 6.0 下编码器缓冲画面帧时会提前截断音频）
+        output_args['t'] = job['duration']
+        return ffmpeg.output(
+            video,
+            audio,
+            job['output_path'],
+            movflags='+faststart',
+            **output_args
+        )
+
+    def _build_group_output(self, jobs, threads='auto'):
+        """构建一组任务的 FFmpeg 输出，一个进程写出多个视频
+
+        各任务共用同一音频或同一画面时只读取一次：已编码的轨道直接复制到各输出，
+        否则只解码一次，通过 asplit/split 分给各个输出；不同的音频和图片各自作为输入。
+        """
+        count = len(jobs)
+        first = jobs[0]
+        
+        audios = [None] * count
+        audio_track = first.get('audio_track')
+        if audio_track and all(job.get('audio_track') == audio_track for job in jobs):
+            source = ffmpeg.input(audio_track).audio
+            audios = [(source, {'acodec': 'copy'})] * count
+        elif all(not job.get('audio_track') and (job['audio_path'], job['bg_music']) ==
+                 (first['audio_path'], first['bg_music']) for job in jobs):
+            inline_volume = first.get('bg_music_volume', 0.3) if first.get('inline_bg_music') else None
+            mixed, audio_bitrate = self._mix_audio(first['audio_path'], first['bg_music'], inline_volume)
+            split = mixed.filter_multi_output('asplit', count)
+            audios = [(split.stream(i), {'acodec': 'aac', 'audio_bitrate': audio_bitrate})
+                      for i in range(count)]
+        
+        videos = [None] * count
+        video_track = first.get('video_track')
+        video_mode = first.get('video_mode', 'standard')
+        if video_track and all(job.get('video_track') == video_track for job in jobs):
+            # 流复制只能在输入处按各自的画面时长截取（时长相同的输入合并为一个）
+            videos = [(ffmpeg.input(video_track, t=self._video_length(job)[0]).video, {'vcodec': 'copy'})
+                      for job in jobs]
+        elif all(not job.get('video_track') and
+                 (job['image_path'], job.get('still_source', False), job.get('video_mode', 'standard')) ==
+                 (first['image_path'], first.get('still_source', False), video_mode) for job in jobs):
+            longest = max(jobs, key=lambda job: job['duration'])
+            source = self._image_source(first['image_path'], *self._video_length(longest),
+                                        first.get('still_source', False), video_mode)
+            split = source.filter_multi_output('split', count)
+            encode_args = dict(self._video_encode_args(video_mode), threads=threads)
+            videos = [(split.stream(i).filter('trim', end_frame=self._video_length(job)[1]), encode_args)
+                      for i, job in enumerate(jobs)]
+        
+        outputs = [self._build_output(job, threads, audio, video) for job, audio, video in zip(jobs, audios, videos)]
+        return ffmpeg.merge_outputs(*outputs)
+
+    def _render_template(self, spec):
+        """返回生成规格对应的命令行模板，每种规格只构建和编译一次 FFmpeg 滤镜图"""
+        with self._templates_lock:
+            template = self._templates.get(spec)
+            if template is None:
+                stream = self._with_progress(self._build_output(spec.placeholder_job(), spec.threads))
+                template = RenderTemplate(spec, stream.compile(),
+                                          self._video_encode_args(spec.video_mode)['r'])
+                self._templates[spec] = template
+            return template
+
+    def _with_progress(self, stream):
+        """通过 stdout 输出机器可读的进度，关闭 stderr 上的统计信息，结束时在 stderr 输出 CPU 时间"""
+        return stream.global_args('-progress', 'pipe:1', '-nostats', '-benchmark')
+
+    def _render_group(self, jobs, total, progress_callback=None, threads='auto'):
+        """用一个 FFmpeg 进程生成一组视频，失败时改为逐个生成
+        Returns:
+            dict: 任务序号 -> 是否成功
+        """
+        if len(jobs) == 1 or jobs[0].get('backend') == 'pyav':
+            return {job['index']: self._render_job(job, total, progress_callback, threads) for job in jobs}
+        
+        names = ', '.join(job['name'] for job in jobs)
+        watched = None
+        try:
+            print(f"合并生成 {len(jobs)} 个视频: {names}")
+            for job in jobs:
+                self._prepare_job_tracks(job, threads)
+            stream = self._with_progress(self._build_group_output(jobs, threads))
+            process = self.control.popen(stream.compile(), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            duration = max(job['duration'] for job in jobs)
+            watched = self.control.watch(process, names, self._stall_timeout, self._job_timeout(duration))
+            # 同组视频共用一份进度，以最长的视频为准
+            progress = FFmpegProgress(duration)
+            
+            def on_progress():
+                if progress_callback:
+                    for job in jobs:
+                        progress_callback(job['index'], total, progress.percent, progress.to_dict())
             
-            # 调整大小
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            reader = self._read_progress(process, progress, watched, on_progress)
+            try:
+                returncode = reader.wait()
+            finally:
+                self.control.release(process)
+            stderr = reader.stderr
+            if returncode != 0:
+                raise ffmpeg.Error('ffmpeg', reader.stdout, stderr)
+        except Exception as e:
+            if self.control.cancelled:
+                print(f"已取消: {names}")
+                return {job['index']: False for job in jobs}
+            if watched and watched.reason:
+                # 逐个生成时只有卡住的视频会再次被看门狗结束，同组的其他视频可以正常完成
+                message = f"{watched.reason}，已结束"
+            else:
+                message = e.stderr.decode() if isinstance(e, ffmpeg.Error) and e.stderr else str(e)
+            print(f"合并生成 {names} 失败，改为逐个生成: {message}")
+            for job in jobs:
+                self._remove_temp_file(job['output_path'])
+            return {job['index']: self._render_job(job, total, progress_callback, threads) for job in jobs}
+        
+        progress.finished = True
+        cpu_time = self._parse_cpu_time(stderr)
+        for job in jobs:
+            if cpu_time is not None:
+                job['cpu_time'] = cpu_time / len(jobs)
+            job['output_size'] = os.path.getsize(job['output_path'])
+            if progress_callback:
+                progress_callback(job['index'], total, 100, progress.to_dict())
+        speed = f"{progress.speed:.1f}x" if progress.speed else '未知'
+        if cpu_time is not None:
+            speed += f"，CPU 时间 {cpu_time:.1f}秒"
+        print(f"视频 {names} 生成完成，耗时 {time.time() - progress.start_time:.1f}秒，编码速度 {speed}")
+        return {job['index']: True for job in jobs}
+
+    def _render_job(self, job, total, progress_callback=None, threads='auto'):
+        """生成单个视频，失败时按重试策略重试，失败只影响当前任务
+        Returns:
+            bool: 是否成功
+        """
+        attempt = 1
+        while True:
+            job['attempts'] = attempt
+            if self._render_attempt(job, total, progress_callback, threads):
+                if attempt > 1:
+                    print(f"{job['name']}.mp4 第 {attempt} 次生成成功")
+                return True
+            delay = self._retry_delay(job, attempt)
+            if delay is None or not self.control.sleep(delay):
+                return False
+            if self._retry.fallback and not job.get('fallback'):
+                self._apply_fallback(job)
+            attempt += 1
+
+    def _retry_delay(self, job, attempt):
+        """第 attempt 次生成失败后是否重试，重试前删除临时文件
+        
+        每次的失败原因依次记录在 job['errors']，job['error'] 保持为第一次的原因
+        （重试改用稳妥设置后的失败，例如被看门狗结束，可能掩盖真正的原因）。
+        Returns:
+            float: 重试前等待的秒数，已取消、输入文件无法解码或达到最多次数时返回 None
+        """
+        errors = job.setdefault('errors', [])
+        errors.append(job.get('error') or '未知错误')
+        job['error'] = errors[0]
+        if self.control.cancelled:
+            return None
+        if not self._retry.should_retry(attempt, errors[-1]):
+            if self._retry.is_permanent(errors[-1]):
+                print(f"{job['name']}.mp4 的输入文件无法读取或解码，不再重试")
+            return None
+        delay = self._retry.delay(attempt)
+        print(f"{job['name']}.mp4 第 {attempt} 次生成失败，{delay:.0f}秒后重试"
+              f"（最多 {self._retry.max_attempts} 次）: {errors[-1].strip()[-500:]}")
+        self._remove_temp_file(job['output_path'])
+        return delay
+
+    def _apply_fallback(self, job):
+        """将任务改为更稳妥的设置：调整图片尺寸，不使用流复制的缓存/共用轨道和分段编码，
+        用 FFmpeg 后端从源文件完整编码画面和音频（图片仍只解码一次，逐帧读取图片遇到无法解码的文件会一直重试读取）
+        """
+        job['fallback'] = True
+        if job['image_path'] == job['source_image']:
+            job['image_path'] = self._normalize_image(job['source_image'], self._image_fill_mode)
+        if job.get('audio_track') and not job.get('bg_music') and job.get('bg_music_path'):
+            # 流复制的音频轨道中已混合背景音乐，改为完整编码时需要重新准备
+            job['bg_music'] = self._background_music_source(job['bg_music_path'], job['duration'],
+                                                            job.get('bg_music_volume', 0.3),
+                                                            job.get('inline_bg_music', False))
+        job.update(video_track=None, audio_track=None, cache_video=False, cache_audio=False, chunk_seconds=0,
+                   still_source=True, backend='ffmpeg')
+        print(f"{job['name']}.mp4 改用稳妥设置重试：调整图片尺寸、完整编码画面和音频")
+
+    def _render_attempt(self, job, total, progress_callback=None, threads='auto'):
+        """生成单个视频一次，失败原因记录在 job['error']
+        Returns:
+            bool: 是否成功
+        """
+        index = job['index']
+        name = job['name']
+        chunked_track = None
+        process = None
+        try:
+            # 暂停时在开始前等待，取消后不再开始
+            self.control.checkpoint()
+            print(f"正在处理第 {index + 1}/{total} 个视频: {name}")
+            print(f"使用图片: {job['image_path']}")
+            print(f"使用音频: {job['audio_path']}")
             
-            # 创建新的背景图片
-            background = Image.new('RGB', (target_width, target_height), (0, 0, 0))
+            self._prepare_job_tracks(job, threads)
+            if job.get('backend') == 'pyav':
+                return self._render_job_av(job, total, progress_callback)
+            # 长视频的画面分段并行编码，主进程只需复制画面并编码音频
+            if (job.get('chunk_seconds') and not job.get('video_track')
+                    and job['duration'] > job['chunk_seconds']):
+                chunked_track = self._chunked_video_track(job, threads)
+                job['video_track'] = chunked_track
+            if job.get('bg_music') and not job.get('audio_track'):
+                print(f"混合背景音乐: {job['bg_music']}")
+            template = self._render_template(RenderSpec.from_job(job, threads))
             
-            # 计算居中位置
-            x = (target_width - new_width) // 2
-            y = (target_height - new_height) // 2
+            print(f"开始生成视频: {name}.mp4")
+            process = self.control.popen(template.fill_job(job), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            watched = self.control.watch(process, name, self._stall_timeout, self._job_timeout(job['duration']))
             
-            # 将调整后的图片粘贴到背景上
-            background.paste(img, (x, y))
+            # 读取 FFmpeg 的进度输出，每个进度块回调一次，并报告给看门狗
+            progress = FFmpegProgress(job['duration'])
             
-            # 保存调整后的图片
-            output_path = os.path.join(self.temp_dir, os.path.basename(image_path))
-            if not output_path.lower().endswith('.jpg'):
-                output_path = os.path.splitext(output_path)[0] + '.jpg'
+            def on_progress():
+                if progress_callback:
+                    # 回调参数：当前视频索引，总视频数，当前视频处理进度，进度信息
+                    progress_callback(index, total, progress.percent, progress.to_dict())
             
-            background.save(output_path, 'JPEG', quality=95)
-            print(f"图片调整完成: {output_path}")
-            return output_path
+            # 等待结束，stderr 只保留最后几行用于错误报告和 CPU 时间统计
+            reader = self._read_progress(process, progress, watched, on_progress)
+            reader.wait()
+            stderr = reader.stderr
+            if process.returncode != 0:
+                if self.control.cancelled:
+                    job['error'] = '已取消'
+                    print(f"已取消: {name}")
+                elif watched.reason:
+                    job['error'] = watched.reason
+                    print(f"处理 {name} 时{watched.reason}，已结束，继续生成其他视频")
+                else:
+                    job['error'] = self._error_summary(stderr)
+                    print(f"处理 {name} 时发生错误: {stderr.decode(errors='ignore') if stderr else '未知错误'}")
+                return False
             
+            progress.finished = True
+            if progress_callback:
+                progress_callback(index, total, 100, progress.to_dict())
+            speed = f"{progress.speed:.1f}x" if progress.speed else '未知'
+            cpu_time = self._parse_cpu_time(stderr)
+            if cpu_time is not None:
+                job['cpu_time'] = cpu_time
+                speed += f"，CPU 时间 {cpu_time:.1f}秒"
+            job['output_size'] = os.path.getsize(job['output_path'])
+            speed += f"，文件大小 {job['output_size'] / (1024 * 1024):.1f}MB"
+            print(f"视频 {name}.mp4 生成完成，耗时 {time.time() - progress.start_time:.1f}秒，编码速度 {speed}")
+            job['error'] = None
+            return True
+            
+        except RenderCancelled:
+            job['error'] = '已取消'
+            print(f"已取消: {name}")
+            return False
+        except ffmpeg.Error as e:
+            if self.control.cancelled:
+                job['error'] = '已取消'
+                print(f"已取消: {name}")
+            else:
+                job['error'] = self._error_summary(e.stderr) if e.stderr else str(e)
+                print(f"处理 {name} 时发生FFmpeg错误: {e.stderr.decode(errors='ignore') if e.stderr else str(e)}")
+            return False
+        except Exception as e:
+            job['error'] = str(e)
+            print(f"处理 {name} 时发生错误: {str(e)}")
+            return False
+        finally:
+            if process:
+                self.control.release(process)
+            if chunked_track:
+                job['video_track'] = None
+                self._remove_temp_file(chunked_track)
+
+    def _render_job_av(self, job, total, progress_callback=None):
+        """使用 PyAV 后端在进程内生成单个视频，异常由调用方处理
+        Returns:
+            bool: 是否成功
+        """
+        index = job['index']
+        name = job['name']
+        audio_track = job.get('audio_track')
+        temp_audio = None
+        try:
+            if not audio_track and job.get('bg_music'):
+                # 背景音乐仍由 FFmpeg 混音并编码为 AAC，PyAV 直接复制
+                temp_audio = os.path.join(self.temp_dir, f"av_audio_{uuid.uuid4().hex}.m4a")
+                inline_volume = job.get('bg_music_volume', 0.3) if job.get('inline_bg_music') else None
+                self._encode_audio_track(job['audio_path'], job['bg_music'], job['duration'], temp_audio,
+                                         inline_volume)
+                audio_track = temp_audio
+            
+            progress = FFmpegProgress(job['duration'])
+            last_percent = [-1]
+            
+            def on_progress(seconds):
+                # 在编码线程中响应暂停和取消（取消时抛出 RenderCancelled，中止编码）
+                self.control.checkpoint()
+                # 每个音频数据包都会回调，只在百分比变化时通知
+                progress.out_time = seconds
+                if progress_callback and progress.percent != last_percent[0]:
+                    last_percent[0] = progress.percent
+                    progress_callback(index, total, progress.percent, progress.to_dict())
+            
+            print(f"开始生成视频（PyAV）: {name}.mp4")
+            renderer = AVStillRenderer(self._video_encode_args(job.get('video_mode', 'standard')))
+            cpu_time = renderer.render(job['image_path'], job['audio_path'], job['output_path'], job['duration'],
+                                       audio_track, AUDIO_BITRATE, on_progress)
+        finally:
+            self._remove_temp_file(temp_audio)
+        
+        progress.finished = True
+        if progress_callback:
+            progress_callback(index, total, 100, progress.to_dict())
+        job['cpu_time'] = cpu_time
+        job['output_size'] = os.path.getsize(job['output_path'])
+        elapsed = time.time() - progress.start_time
+        print(f"视频 {name}.mp4 生成完成，耗时 {elapsed:.1f}秒，编码速度 {job['duration'] / max(elapsed, 1e-6):.1f}x，"
+              f"CPU 时间 {cpu_time:.1f}秒，文件大小 {job['output_size'] / (1024 * 1024):.1f}MB")
+        return True
+
+    def _error_summary(self, stderr, max_lines=5):
+        """从 FFmpeg 的 stderr 中提取错误信息：去掉版本、输入输出流信息和 -benchmark 统计，保留最后几行"""
+        lines = []
+        for line in (stderr.decode('utf-8', errors='ignore') if stderr else '').splitlines():
+            if not line.strip() or line[0].isspace() or line.startswith(ERROR_SKIP_PREFIXES):
+                continue
+            lines.append(line.strip())
+        return '\n'.join(lines[-max_lines:]) or '未知错误'
+
+    def _parse_cpu_time(self, stderr):
+        """从 FFmpeg -benchmark 输出中解析 CPU 时间（用户态 + 内核态，秒），解析失败时返回 None"""
+        match = BENCH_PATTERN.search(stderr.decode('utf-8', errors='ignore') if stderr else '')
+        if not match:
+            return None
+        return float(match.group(1)) + float(match.group(2))
+
+    def _resize_image(self, image_path, output_path=None, fill_mode='letterbox'):
+        """调整图片大小
+        Args:
+            image_path: 图片文件路径
+            output_path: 输出路径，默认保存到临时目录
+            fill_mode: 'letterbox' 保持完整画面并补黑边，'cover' 铺满画面并居中裁剪
+        Returns:
+            str: 调整后的图片路径，失败时返回原图片路径
+        """
+        try:
+            if output_path is None:
+                output_path = os.path.join(self.temp_dir, os.path.splitext(os.path.basename(image_path))[0] + '.jpg')
+            return resize_image(image_path, output_path, fill_mode)
         except Exception as e:
             print(f"调整图片大小时发生错误: {str(e)}")
             return image_path
 
+    def _normalize_image(self, image_path, fill_mode='letterbox'):
+        """将图片调整为统一尺寸，结果按 (图片哈希, 目标尺寸, 填充方式) 缓存
+        Returns:
+            str: 调整后的图片路径，失败时返回原图片路径
+        """
+        return normalize_image_file(image_path, fill_mode, self.image_cache)
+
+    def _normalize_images(self, image_paths, fill_mode='letterbox', max_workers=1):
+        """使用线程池并行调整多张图片（PIL 缩放时会释放 GIL）
+        Returns:
+            dict: 原图片路径 -> 调整后的图片路径
+        """
+        unique_paths = list(dict.fromkeys(image_paths))
+        workers = max(1, min(max(max_workers, os.cpu_count() or 1), len(unique_paths)))
+        print(f"调整 {len(unique_paths)} 张图片为 {IMAGE_TARGET_SIZE[0]}x{IMAGE_TARGET_SIZE[1]}（{fill_mode}）")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            frames = list(executor.map(lambda path: self._normalize_image(path, fill_mode), unique_paths))
+        return dict(zip(unique_paths, frames))
+
+    @property
+    def temp_dir(self):
+        """本实例的临时目录（TEMP_ROOT 下的子目录），其他进程和 VideoCore 实例使用各自的目录"""
+        if self._temp_dir is None or not os.path.isdir(self._temp_dir):
+            os.makedirs(TEMP_ROOT, exist_ok=True)
+            self._temp_dir = tempfile.mkdtemp(prefix=f'run_{os.getpid()}_', dir=TEMP_ROOT)
+        return self._temp_dir
+
     def cleanup_temp(self):
-        """清理临时文件"""
+        """删除本实例的临时目录，不影响同时运行的其他生成任务"""
+        if self._temp_dir is None:
+            return
         try:
-            if os.path.exists(self.temp_dir):
-                for file in os.listdir(self.temp_dir):
-                    file_path = os.path.join(self.temp_dir, file)
-                    try:
-                        if os.path.isfile(file_path):
-                            os.unlink(file_path)
-                    except Exception as e:
-                        print(f"删除临时文件失败: {str(e)}")
+            shutil.rmtree(self._temp_dir)
+            self._temp_dir = None
+        except FileNotFoundError:
+            self._temp_dir = None
         except Exception as e:
             print(f"清理临时目录失败: {str(e)}") 
\ No newline at end of file
@@ -1,29 +1,74 @@
 import sys
 import os
+import multiprocessing
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                            QLabel, QPushButton, QFileDialog, QTextEdit, QHBoxLayout,
                            QInputDialog, QMessageBox, QListWidget, QListWidgetItem,
                            QTabWidget, QTableWidget, QTableWidgetItem, QHeaderView,
-                           QProgressBar, QGroupBox, QComboBox, QSlider)
+                           QProgressBar, QGroupBox, QComboBox, QSlider, QSpinBox, QCheckBox)
 from PyQt5.QtCore import Qt, QMimeData, QThread, pyqtSignal
 from PyQt5.QtGui import QDragEnterEvent, QDropEvent
 from core.project_manager import ProjectManager
-from core.video_core import VideoCore
+from core.video_core import VideoCore, MAX_GROUP_SIZE
+from core.job_queue import JobQueue, RenderWorker
+from core.ffmpeg_progress import format_eta
+from core.run_manifest import RunManifest
 from datetime import datetime
 
+# 生成控制区域中的开关选项：(项目设置名/生成参数名, 显示文字, 开启时的日志说明)
+RENDER_OPTION_CHECKS = [
+    ('share_tracks', '共用音频/画面只编码一次', '共用音频/画面只编码一次，各视频通过流复制生成'),
+    ('use_cache', '使用轨道缓存', '使用轨道缓存: 已编码过的图片画面和音频将直接复用'),
+    ('inline_bg_music', '背景音乐直接混入主编码', '背景音乐在主编码中循环并混合，不生成中间文件'),
+    ('normalize_images', '图片调整为1920x1080', '图片将先调整为1920x1080（结果会缓存）'),
+    ('still_source', '图片只解码一次', '图片只解码一次，在滤镜图中重复画面'),
+    ('pipeline', '按阶段流水线生成', '按阶段流水线生成: 后续视频的探测和图片处理与当前视频的编码同时进行，生成后校验输出'),
+    ('thumbnails', '生成缩略图', '流水线生成时为每个视频生成同名缩略图'),
+    ('use_asyncio', 'asyncio 调度', 'asyncio 调度: 在一个事件循环中运行探测、编码和校验进程并读取其输出'),
+    ('retry_fallback', '重试时改用稳妥设置', '失败重试时调整图片尺寸，不使用流复制的轨道，完整编码画面和音频'),
+]
+
+# 图片填充方式：(设置值, 显示名称)
+IMAGE_FILL_MODE_ITEMS = [
+    ('letterbox', '完整显示（补黑边）'),
+    ('cover', '铺满画面（裁剪）'),
+]
+
+# 画面编码模式：(设置值, 显示名称)
+VIDEO_MODE_ITEMS = [
+    ('standard', '标准（30fps）'),
+    ('static', '静态画面（1fps，体积小、速度快）'),
+]
+
+# 编码后端：(设置值, 显示名称)
+BACKEND_ITEMS = [
+    ('ffmpeg', 'FFmpeg'),
+    ('pyav', 'PyAV（进程内编码）'),
+]
+
+# 调度策略：(设置值, 显示名称)，fair 只在处理队列时区分项目，单个项目生成时按列表顺序
+SCHEDULE_ITEMS = [
+    ('fifo', '按列表顺序'),
+    ('lpt', '最长的优先（总用时最短）'),
+    ('spt', '最短的优先（尽早完成）'),
+    ('fair', '项目轮流（处理队列时）'),
+]
+
 class VideoGeneratorThread(QThread):
     """视频生成线程"""
-    progress = pyqtSignal(int, int, int)  # 当前图片索引，总图片数，当前进度
+    progress = pyqtSignal(int, int, int, dict)  # 当前视频索引，总视频数，当前进度，进度信息（速度、剩余时间等）
     finished = pyqtSignal(bool, str)
     log = pyqtSignal(str)  # 添加日志信号
     
-    def __init__(self, audio_paths, image_paths, output_dir, bg_music_path=None, bg_music_volume=0.3):
+    def __init__(self, audio_paths, image_paths, output_dir, bg_music_path=None, bg_music_volume=0.3,
+                 render_options=None):
         super().__init__()
         self.audio_paths = audio_paths if isinstance(audio_paths, list) else [audio_paths]
         self.image_paths = image_paths
         self.output_dir = output_dir
         self.bg_music_path = bg_music_path
         self.bg_music_volume = bg_music_volume
+        self.render_options = render_options or {}  # 传给 generate_video_from_images 的其他生成参数
         self.video_core = VideoCore()
         
         # 重定向 print 输出
@@ -41,11 +86,22 @@ class VideoGeneratorThread(QThread):
                 self.audio_paths,
                 self.image_paths,
                 self.output_dir,
-                progress_callback=lambda current, total, progress: self.progress.emit(current, total, progress),
+                progress_callback=lambda current, total, progress, info: self.progress.emit(current, total, progress, info),
                 bg_music_path=self.bg_music_path,
-                bg_music_volume=self.bg_music_volume
+                bg_music_volume=self.bg_music_volume,
+                **self.render_options
             )
-            self.finished.emit(success, self.output_dir)
+            result = self.video_core.last_result
+            if self.video_core.control.cancelled:
+                self.finished.emit(False, '生成已取消，可使用“继续生成”在原输出目录中完成剩余视频')
+            elif not success and result:
+                # 列出重试后仍失败的视频和原因
+                failures = [f"{job['name']}（尝试 {job['attempts']} 次）: {job['error'].strip()[-200:]}"
+                            for job in result['jobs'] if job['state'] == 'failed']
+                self.finished.emit(False, f"{len(failures)} 个视频生成失败，可使用“继续生成”重新生成：\n"
+                                          + '\n'.join(failures))
+            else:
+                self.finished.emit(success, self.output_dir)
         except Exception as e:
             self.finished.emit(False, str(e))
         finally:
@@ -53,12 +109,62 @@ class VideoGeneratorThread(QThread):
             import builtins
             builtins.print = self.old_print
 
+    def cancel(self):
+        """取消生成，结束正在运行的 FFmpeg 进程"""
+        return self.video_core.cancel()
+
+    def pause(self):
+        """暂停生成，挂起正在运行的 FFmpeg 进程"""
+        return self.video_core.pause()
+
+    def resume(self):
+        """继续已暂停的生成"""
+        return self.video_core.resume()
+
+class QueueWorkerThread(VideoGeneratorThread):
+    """处理任务队列的线程，复用 VideoGeneratorThread 的信号和日志重定向"""
+    job_started = pyqtSignal(int, str)  # 任务 ID，项目名称
+    
+    def __init__(self, queue, schedule='fifo'):
+        super().__init__([], [], None)
+        self.queue = queue
+        self.current_job_id = None
+        self.worker = RenderWorker(queue, self.video_core, progress_callback=self.on_job_progress,
+                                   schedule=schedule)
+
+    def on_job_progress(self, job, current, total, progress, info):
+        if job['id'] != self.current_job_id:
+            self.current_job_id = job['id']
+            self.job_started.emit(job['id'], job.get('project_name') or '')
+        self.progress.emit(current, total, progress, info)
+
+    def cancel(self):
+        """中止当前任务（放回队列）并停止处理队列"""
+        self.worker.cancel()
+        return True
+
+    def run(self):
+        try:
+            processed = self.worker.run()
+            counts = self.queue.counts()
+            self.finished.emit(counts['failed'] == 0,
+                               f"处理了 {processed} 个任务，完成 {counts['done']} 个，失败 {counts['failed']} 个")
+        except Exception as e:
+            self.finished.emit(False, str(e))
+        finally:
+            import builtins
+            builtins.print = self.old_print
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.project_manager = ProjectManager()
         self.video_core = VideoCore()
         self.generator_thread = None
+        self.queue_thread = None
+        self.active_thread = None  # 正在运行的生成或队列线程，暂停和取消作用于该线程
+        self.job_queue = JobQueue()
+        self.job_progress = {}  # 各视频的处理进度，用于并行模式下汇总总进度
         
         # 创建中央窗口部件
         central_widget = QWidget()
@@ -189,9 +295,157 @@ class MainWindow(QMainWindow):
         control_group = QGroupBox("生成控制")
         control_layout = QVBoxLayout()
         
+        # 并行任务数
+        workers_layout = QHBoxLayout()
+        workers_label = QLabel("并行任务数:")
+        workers_layout.addWidget(workers_label)
+        
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setMinimum(1)
+        self.workers_spin.setMaximum(max(1, os.cpu_count() or 1))
+        self.workers_spin.setValue(1)  # 默认逐个生成
+        self.workers_spin.valueChanged.connect(self.on_workers_changed)
+        workers_layout.addWidget(self.workers_spin)
+        
+        # 单音频多图片时每个 FFmpeg 进程同时输出的视频数
+        group_label = QLabel("每个进程输出视频数:")
+        workers_layout.addWidget(group_label)
+        
+        self.group_spin = QSpinBox()
+        self.group_spin.setMinimum(1)
+        self.group_spin.setMaximum(MAX_GROUP_SIZE)
+        self.group_spin.setValue(1)  # 默认每个视频单独一个进程
+        self.group_spin.valueChanged.connect(self.on_group_size_changed)
+        workers_layout.addWidget(self.group_spin)
+        
+        # 长视频分段并行编码的分段时长
+        chunk_label = QLabel("长视频分段编码(秒):")
+        workers_layout.addWidget(chunk_label)
+        
+        self.chunk_spin = QSpinBox()
+        self.chunk_spin.setMinimum(0)
+        self.chunk_spin.setMaximum(3600)
+        self.chunk_spin.setSingleStep(60)
+        self.chunk_spin.setSpecialValueText("关闭")  # 0 为不分段
+        self.chunk_spin.setValue(0)
+        self.chunk_spin.valueChanged.connect(self.on_chunk_seconds_changed)
+        workers_layout.addWidget(self.chunk_spin)
+        
+        # 短于该时长的视频合并为小批量生成
+        micro_batch_label = QLabel("短视频合并阈值(秒):")
+        workers_layout.addWidget(micro_batch_label)
+        
+        self.micro_batch_spin = QSpinBox()
+        self.micro_batch_spin.setMinimum(0)
+        self.micro_batch_spin.setMaximum(120)
+        self.micro_batch_spin.setSpecialValueText("关闭")  # 0 为不合并
+        self.micro_batch_spin.setValue(0)
+        self.micro_batch_spin.valueChanged.connect(self.on_micro_batch_changed)
+        workers_layout.addWidget(self.micro_batch_spin)
+        
+        # 看门狗：编码进度超过该秒数不前进时结束该视频，继续生成其他视频
+        stall_label = QLabel("卡住超时(秒):")
+        workers_layout.addWidget(stall_label)
+        
+        self.stall_spin = QSpinBox()
+        self.stall_spin.setMinimum(0)
+        self.stall_spin.setMaximum(3600)
+        self.stall_spin.setSingleStep(30)
+        self.stall_spin.setSpecialValueText("关闭")  # 0 为不检查
+        self.stall_spin.setValue(120)
+        self.stall_spin.valueChanged.connect(self.on_stall_timeout_changed)
+        workers_layout.addWidget(self.stall_spin)
+        
+        # 每个视频最多生成的次数，失败后等待一段时间再重试
+        attempts_label = QLabel("最多尝试次数:")
+        workers_layout.addWidget(attempts_label)
+        
+        self.attempts_spin = QSpinBox()
+        self.attempts_spin.setMinimum(1)
+        self.attempts_spin.setMaximum(10)
+        self.attempts_spin.setValue(2)
+        self.attempts_spin.valueChanged.connect(self.on_max_attempts_changed)
+        workers_layout.addWidget(self.attempts_spin)
+        workers_layout.addStretch()
+        
+        control_layout.addLayout(workers_layout)
+        
+        # 生成选项开关，状态保存在项目设置中
+        options_layout = QHBoxLayout()
+        self.option_checks = {}
+        for setting_name, text, _ in RENDER_OPTION_CHECKS:
+            check = QCheckBox(text)
+            check.stateChanged.connect(
+                lambda state, name=setting_name: self.project_manager.update_setting(name, state == Qt.Checked))
+            options_layout.addWidget(check)
+            self.option_checks[setting_name] = check
+        
+        options_layout.addWidget(QLabel("图片填充:"))
+        self.fill_mode_combo = QComboBox()
+        for _, text in IMAGE_FILL_MODE_ITEMS:
+            self.fill_mode_combo.addItem(text)
+        self.fill_mode_combo.currentIndexChanged.connect(self.on_fill_mode_changed)
+        options_layout.addWidget(self.fill_mode_combo)
+        
+        options_layout.addWidget(QLabel("画面编码:"))
+        self.video_mode_combo = QComboBox()
+        for _, text in VIDEO_MODE_ITEMS:
+            self.video_mode_combo.addItem(text)
+        self.video_mode_combo.currentIndexChanged.connect(self.on_video_mode_changed)
+        options_layout.addWidget(self.video_mode_combo)
+        
+        options_layout.addWidget(QLabel("编码后端:"))
+        self.backend_combo = QComboBox()
+        for _, text in BACKEND_ITEMS:
+            self.backend_combo.addItem(text)
+        self.backend_combo.currentIndexChanged.connect(self.on_backend_changed)
+        options_layout.addWidget(self.backend_combo)
+        
+        options_layout.addWidget(QLabel("调度:"))
+        self.schedule_combo = QComboBox()
+        for _, text in SCHEDULE_ITEMS:
+            self.schedule_combo.addItem(text)
+        self.schedule_combo.currentIndexChanged.connect(self.on_schedule_changed)
+        options_layout.addWidget(self.schedule_combo)
+        options_layout.addStretch()
+        
+        control_layout.addLayout(options_layout)
+        
+        buttons_layout = QHBoxLayout()
         self.generate_btn = QPushButton("生成视频")
-        self.generate_btn.clicked.connect(self.start_generation)
-        control_layout.addWidget(self.generate_btn)
+        self.generate_btn.clicked.connect(lambda: self.start_generation())
+        buttons_layout.addWidget(self.generate_btn)
+        
+        # 在之前中断或部分失败的输出目录中继续生成，跳过已完成的视频
+        self.resume_btn = QPushButton("继续生成")
+        self.resume_btn.clicked.connect(lambda: self.start_generation('resume'))
+        buttons_layout.addWidget(self.resume_btn)
+        
+        # 在项目的固定输出目录中只生成新增或素材、设置变化后过期的视频
+        self.update_btn = QPushButton("更新输出")
+        self.update_btn.clicked.connect(lambda: self.start_generation('update'))
+        buttons_layout.addWidget(self.update_btn)
+        
+        # 加入队列的项目可以关闭界面后由命令行工作进程处理，也可以在这里处理
+        self.enqueue_btn = QPushButton("加入队列")
+        self.enqueue_btn.clicked.connect(self.enqueue_project)
+        buttons_layout.addWidget(self.enqueue_btn)
+        
+        self.run_queue_btn = QPushButton("处理队列")
+        self.run_queue_btn.clicked.connect(self.start_queue)
+        buttons_layout.addWidget(self.run_queue_btn)
+        
+        # 生成过程中暂停（挂起 FFmpeg 进程，释放 CPU）、继续和取消
+        self.pause_btn = QPushButton("暂停")
+        self.pause_btn.setEnabled(False)
+        self.pause_btn.clicked.connect(self.toggle_pause)
+        buttons_layout.addWidget(self.pause_btn)
+        
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_generation)
+        buttons_layout.addWidget(self.cancel_btn)
+        control_layout.addLayout(buttons_layout)
         
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
@@ -221,6 +475,8 @@ class MainWindow(QMainWindow):
             self.project_manager.load_project(project_id)
             self.update_file_lists()
             self.update_volume_slider()
+            self.update_workers_spin()
+            self.update_option_checks()
 
     def update_file_lists(self):
         """更新文件列表"""
@@ -251,7 +507,7 @@ class MainWindow(QMainWindow):
     def update_volume_slider(self):
         """根据项目设置更新音量滑块"""
         if self.project_manager.current_project:
-            volume = self.project_manager.get_setting('bg_music_volume', 0.3)
+            volume = self.project_manager.get_setting('bg_music_volume')
             # 将0-1的音量值转换为0-100的滑块值
             slider_value = int(volume * 100)
             self.volume_slider.setValue(slider_value)
@@ -265,6 +521,80 @@ class MainWindow(QMainWindow):
         # 保存到项目设置
         self.project_manager.update_setting('bg_music_volume', volume)
 
+    def update_workers_spin(self):
+        """根据项目设置更新并行任务数"""
+        if self.project_manager.current_project:
+            max_workers = self.project_manager.get_setting('max_workers')
+            self.workers_spin.setValue(max_workers)
+            self.group_spin.setValue(self.project_manager.get_setting('group_size'))
+            self.chunk_spin.setValue(self.project_manager.get_setting('chunk_seconds'))
+            self.micro_batch_spin.setValue(self.project_manager.get_setting('micro_batch_seconds'))
+            self.stall_spin.setValue(self.project_manager.get_setting('stall_timeout'))
+            self.attempts_spin.setValue(self.project_manager.get_setting('max_attempts'))
+
+    def on_workers_changed(self, value):
+        """并行任务数改变的处理"""
+        self.project_manager.update_setting('max_workers', value)
+
+    def on_group_size_changed(self, value):
+        """每个进程输出视频数改变的处理"""
+        self.project_manager.update_setting('group_size', value)
+
+    def on_chunk_seconds_changed(self, value):
+        """分段编码时长改变的处理"""
+        self.project_manager.update_setting('chunk_seconds', value)
+
+    def on_micro_batch_changed(self, value):
+        """短视频合并阈值改变的处理"""
+        self.project_manager.update_setting('micro_batch_seconds', value)
+
+    def on_stall_timeout_changed(self, value):
+        """卡住超时改变的处理"""
+        self.project_manager.update_setting('stall_timeout', value)
+
+    def on_max_attempts_changed(self, value):
+        """最多尝试次数改变的处理"""
+        self.project_manager.update_setting('max_attempts', value)
+
+    def on_fill_mode_changed(self, index):
+        """图片填充方式改变的处理"""
+        if 0 <= index < len(IMAGE_FILL_MODE_ITEMS):
+            self.project_manager.update_setting('image_fill_mode', IMAGE_FILL_MODE_ITEMS[index][0])
+
+    def on_video_mode_changed(self, index):
+        """画面编码模式改变的处理"""
+        if 0 <= index < len(VIDEO_MODE_ITEMS):
+            self.project_manager.update_setting('video_mode', VIDEO_MODE_ITEMS[index][0])
+
+    def on_backend_changed(self, index):
+        """编码后端改变的处理"""
+        if 0 <= index < len(BACKEND_ITEMS):
+            self.project_manager.update_setting('backend', BACKEND_ITEMS[index][0])
+
+    def on_schedule_changed(self, index):
+        """调度策略改变的处理"""
+        if 0 <= index < len(SCHEDULE_ITEMS):
+            self.project_manager.update_setting('schedule', SCHEDULE_ITEMS[index][0])
+
+    def update_option_checks(self):
+        """根据项目设置更新生成选项开关"""
+        if self.project_manager.current_project:
+            for setting_name, _, _ in RENDER_OPTION_CHECKS:
+                self.option_checks[setting_name].setChecked(
+                    bool(self.project_manager.get_setting(setting_name)))
+            fill_mode = self.project_manager.get_setting('image_fill_mode')
+            modes = [mode for mode, _ in IMAGE_FILL_MODE_ITEMS]
+            self.fill_mode_combo.setCurrentIndex(modes.index(fill_mode) if fill_mode in modes else 0)
+            video_mode = self.project_manager.get_setting('video_mode')
+            modes = [mode for mode, _ in VIDEO_MODE_ITEMS]
+            self.video_mode_combo.setCurrentIndex(modes.index(video_mode) if video_mode in modes else 0)
+            backend = self.project_manager.get_setting('backend')
+            backends = [name for name, _ in BACKEND_ITEMS]
+            self.backend_combo.setCurrentIndex(backends.index(backend) if backend in backends else 0)
+            schedule = self.project_manager.get_setting('schedule')
+            schedules = [name for name, _ in SCHEDULE_ITEMS]
+            self.schedule_combo.setCurrentIndex(schedules.index(schedule) if schedule in schedules else 0)
+
     def handle_files(self, files, file_type):
         """处理文件"""
         if not self.project_manager.current_project:
@@ -342,6 +672,10 @@ class MainWindow(QMainWindow):
         self.update_file_lists()
         # 更新音量滑块
         self.update_volume_slider()
+        # 更新并行任务数
+        self.update_workers_spin()
+        # 更新生成选项开关
+        self.update_option_checks()
 
     def create_project(self):
         """创建新项目"""
@@ -414,8 +748,12 @@ class MainWindow(QMainWindow):
         scrollbar = self.log_text.verticalScrollBar()
         scrollbar.setValue(scrollbar.maximum())
 
-    def start_generation(self):
-        """开始生成视频"""
+    def start_generation(self, mode='new'):
+        """开始生成视频
+        Args:
+            mode: new 在新的输出目录中生成，resume 在之前的输出目录中继续生成，
+                update 在项目的输出目录中只生成新增或过期的视频
+        """
         if not self.project_manager.current_project:
             QMessageBox.warning(self, '警告', '请先选择或创建一个项目')
             return
@@ -435,17 +773,39 @@ class MainWindow(QMainWindow):
             return
 
         # 选择输出目录
-        output_dir = QFileDialog.getExistingDirectory(self, '选择输出目录', os.path.expanduser('~'))
-        if not output_dir:
-            return
+        resume_folder = None
+        manifest_path = None
+        if mode == 'update':
+            resume_folder = project.get('output_folder')
+            if not resume_folder or not os.path.isdir(resume_folder):
+                resume_folder = QFileDialog.getExistingDirectory(self, '选择项目的输出目录', os.path.expanduser('~'))
+                if not resume_folder:
+                    return
+                self.project_manager.set_output_folder(resume_folder)
+            manifest_path = self.project_manager.output_manifest_path(project)
+            output_dir = os.path.dirname(resume_folder)
+        elif mode == 'resume':
+            resume_folder = QFileDialog.getExistingDirectory(self, '选择之前的输出目录（output_时间）',
+                                                             os.path.expanduser('~'))
+            if not resume_folder:
+                return
+            if not RunManifest.exists(resume_folder):
+                QMessageBox.warning(self, '警告', '所选目录中没有生成清单，无法继续生成')
+                return
+            output_dir = os.path.dirname(resume_folder)
+        else:
+            output_dir = QFileDialog.getExistingDirectory(self, '选择输出目录', os.path.expanduser('~'))
+            if not output_dir:
+                return
 
         # 清空日志
         self.log_text.clear()
             
         # 更新UI状态
-        self.generate_btn.setEnabled(False)
+        self.set_generation_running(True)
         self.progress_bar.setValue(0)
         self.progress_bar.setVisible(True)
+        self.job_progress = {}
         
         # 添加日志
         self.add_log("开始生成视频...")
@@ -465,9 +825,70 @@ class MainWindow(QMainWindow):
             self.add_log(f"使用背景音乐: {os.path.basename(bg_music_path)}")
             
         # 获取背景音乐音量
-        bg_music_volume = self.project_manager.get_setting('bg_music_volume', 0.3)
+        bg_music_volume = self.project_manager.get_setting('bg_music_volume')
         self.add_log(f"背景音乐音量: {int(bg_music_volume * 100)}%")
         
+        # 获取并行任务数
+        max_workers = self.project_manager.get_setting('max_workers')
+        self.add_log(f"并行任务数: {max_workers}")
+        render_options = {'max_workers': max_workers}
+        if manifest_path:
+            render_options['resume_folder'] = resume_folder
+            render_options['manifest_path'] = manifest_path
+            self.add_log(f"更新输出: {resume_folder}，只生成新增或素材、设置变化的视频")
+        elif resume_folder:
+            render_options['resume_folder'] = resume_folder
+            self.add_log(f"继续生成: {resume_folder}，跳过已完成的视频")
+        
+        # 获取每个进程输出的视频数
+        group_size = self.project_manager.get_setting('group_size')
+        render_options['group_size'] = group_size
+        if group_size > 1:
+            self.add_log(f"合并生成: 每个 FFmpeg 进程最多输出 {group_size} 个视频")
+        
+        # 获取长视频分段编码时长
+        chunk_seconds = self.project_manager.get_setting('chunk_seconds')
+        render_options['chunk_seconds'] = chunk_seconds
+        if chunk_seconds:
+            self.add_log(f"长视频分段编码: 画面按 {chunk_seconds} 秒分段并行编码后拼接")
+        
+        # 获取短视频合并阈值
+        micro_batch_seconds = self.project_manager.get_setting('micro_batch_seconds')
+        render_options['micro_batch_seconds'] = micro_batch_seconds
+        if micro_batch_seconds:
+            self.add_log(f"短视频合并: 短于 {micro_batch_seconds} 秒的视频合并为小批量生成")
+        
+        # 获取看门狗设置
+        render_options['stall_timeout'] = self.project_manager.get_setting('stall_timeout')
+        render_options['timeout_factor'] = self.project_manager.get_setting('timeout_factor')
+        if render_options['stall_timeout']:
+            self.add_log(f"看门狗: 编码进度超过 {render_options['stall_timeout']} 秒不前进时结束该视频")
+        if render_options['timeout_factor']:
+            self.add_log(f"看门狗: 单个视频用时超过音频时长的 {render_options['timeout_factor']} 倍时结束该视频")
+        
+        # 获取重试设置
+        render_options['max_attempts'] = self.project_manager.get_setting('max_attempts')
+        render_options['retry_backoff'] = self.project_manager.get_setting('retry_backoff')
+        if render_options['max_attempts'] > 1:
+            self.add_log(f"失败重试: 每个视频最多尝试 {render_options['max_attempts']} 次，"
+                         f"首次重试前等待 {render_options['retry_backoff']} 秒")
+        
+        # 获取生成选项开关
+        for setting_name, _, log_text in RENDER_OPTION_CHECKS:
+            enabled = bool(self.project_manager.get_setting(setting_name))
+            render_options[setting_name] = enabled
+            if enabled:
+                self.add_log(log_text)
+        if render_options['normalize_images']:
+            render_options['image_fill_mode'] = self.project_manager.get_setting('image_fill_mode')
+            self.add_log(f"图片填充方式: {dict(IMAGE_FILL_MODE_ITEMS).get(render_options['image_fill_mode'])}")
+        render_options['video_mode'] = self.project_manager.get_setting('video_mode')
+        self.add_log(f"画面编码模式: {dict(VIDEO_MODE_ITEMS).get(render_options['video_mode'])}")
+        render_options['backend'] = self.project_manager.get_setting('backend')
+        self.add_log(f"编码后端: {dict(BACKEND_ITEMS).get(render_options['backend'])}")
+        render_options['schedule'] = self.project_manager.get_setting('schedule')
+        self.add_log(f"调度策略: {dict(SCHEDULE_ITEMS).get(render_options['schedule'])}")
+        
         # 检查图片和音频数量关系
         if len(image_files) == 1 and len(audio_files) > 1:
             self.add_log("检测到单图片多音频模式: 将为每个音频生成对应视频，视频名称为音频文件名")
@@ -484,24 +905,124 @@ class MainWindow(QMainWindow):
             image_files, 
             output_dir,
             bg_music_path,
-            bg_music_volume
+            bg_music_volume,
+            render_options
         )
+        self.active_thread = self.generator_thread
         self.generator_thread.progress.connect(self.update_generation_progress)
         self.generator_thread.finished.connect(self.on_generation_finished)
         self.generator_thread.log.connect(self.add_log)
         self.generator_thread.start()
 
-    def update_generation_progress(self, current_index, total_images, progress):
+    def enqueue_project(self):
+        """将当前项目加入任务队列"""
+        if not self.project_manager.current_project:
+            QMessageBox.warning(self, '警告', '请先选择或创建一个项目')
+            return
+        
+        project = self.project_manager.current_project
+        if not project['files'].get('audio') or not project['files'].get('images'):
+            QMessageBox.warning(self, '警告', '请先添加音频和图片文件')
+            return
+        
+        output_dir = QFileDialog.getExistingDirectory(self, '选择输出目录', os.path.expanduser('~'))
+        if not output_dir:
+            return
+        
+        job_id = self.job_queue.enqueue_project(project, output_dir)
+        counts = self.job_queue.counts()
+        self.add_log(f"项目 {project['name']} 已加入队列（任务 {job_id}），"
+                     f"等待中 {counts['pending']} 个，运行中 {counts['running']} 个")
+
+    def start_queue(self):
+        """在后台线程中处理队列中的全部任务"""
+        counts = self.job_queue.counts()
+        if not counts['pending']:
+            QMessageBox.information(self, '提示', '队列中没有等待处理的任务')
+            return
+        
+        self.log_text.clear()
+        self.add_log(f"开始处理队列，等待中的任务 {counts['pending']} 个")
+        self.set_generation_running(True)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.job_progress = {}
+        
+        schedule = self.project_manager.get_setting('schedule')
+        self.queue_thread = QueueWorkerThread(self.job_queue, schedule)
+        self.active_thread = self.queue_thread
+        self.queue_thread.job_started.connect(self.on_queue_job_started)
+        self.queue_thread.progress.connect(self.update_generation_progress)
+        self.queue_thread.finished.connect(self.on_queue_finished)
+        self.queue_thread.log.connect(self.add_log)
+        self.queue_thread.start()
+
+    def set_generation_running(self, running):
+        """生成或处理队列开始/结束时切换按钮状态"""
+        for button in (self.generate_btn, self.resume_btn, self.update_btn, self.run_queue_btn):
+            button.setEnabled(not running)
+        self.pause_btn.setEnabled(running)
+        self.pause_btn.setText("暂停")
+        self.cancel_btn.setEnabled(running)
+        if not running:
+            self.active_thread = None
+
+    def toggle_pause(self):
+        """暂停或继续生成"""
+        if not self.active_thread:
+            return
+        if self.pause_btn.text() == "暂停":
+            if self.active_thread.pause():
+                self.pause_btn.setText("继续")
+        elif self.active_thread.resume():
+            self.pause_btn.setText("暂停")
+
+    def cancel_generation(self):
+        """取消生成，结束 FFmpeg 进程并删除未完成的输出"""
+        if not self.active_thread:
+            return
+        reply = QMessageBox.question(self, '确认', '确定要取消生成吗？已完成的视频会保留。',
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes and self.active_thread:
+            self.cancel_btn.setEnabled(False)
+            self.pause_btn.setEnabled(False)
+            self.active_thread.cancel()
+            self.add_log("正在取消生成...")
+
+    def on_queue_job_started(self, job_id, project_name):
+        """队列开始处理新任务时重置进度"""
+        self.job_progress = {}
+        self.progress_bar.setValue(0)
+        self.add_log(f"处理队列任务 {job_id}: {project_name}")
+
+    def on_queue_finished(self, success, message):
+        """队列处理完成"""
+        self.set_generation_running(False)
+        self.progress_bar.setVisible(False)
+        self.add_log(message)
+        if success:
+            QMessageBox.information(self, '完成', f'队列处理完成！\n{message}')
+        else:
+            QMessageBox.warning(self, '完成', f'队列处理完成，部分任务失败。\n{message}')
+
+    def update_generation_progress(self, current_index, total_images, progress, info):
         """更新生成进度"""
-        # 计算总体进度
-        total_progress = int((current_index * 100 + progress) / total_images)
+        # 计算总体进度（并行时多个视频同时推进）
+        self.job_progress[current_index] = progress
+        total_progress = int(sum(self.job_progress.values()) / total_images)
         self.progress_bar.setValue(total_progress)
         # 更新进度条文字
-        self.progress_bar.setFormat(f'处理第 {current_index + 1}/{total_images} 个视频: {progress}%')
+        done = sum(1 for value in self.job_progress.values() if value >= 100)
+        if info.get('skipped'):
+            self.progress_bar.setFormat(f'已完成 {done}/{total_images} 个视频，跳过已生成的第 {current_index + 1} 个')
+            return
+        speed = f"{info['speed']:.1f}x" if info.get('speed') else '--'
+        self.progress_bar.setFormat(f'已完成 {done}/{total_images} 个视频，处理第 {current_index + 1} 个: {progress}% '
+                                    f'速度 {speed} 剩余 {format_eta(info.get("eta"))}')
 
     def on_generation_finished(self, success, message):
         """视频生成完成处理"""
-        self.generate_btn.setEnabled(True)
+        self.set_generation_running(False)
         self.progress_bar.setVisible(False)
         
         if success:
@@ -509,10 +1030,12 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.critical(self, '错误', f'生成视频时发生错误：{message}')
         
-        # 清理临时文件
-        self.video_core.cleanup_temp()
+        # 清理本次生成的临时文件（只删除生成线程自己的临时目录）
+        self.generator_thread.video_core.cleanup_temp()
 
 if __name__ == '__main__':
+    # 流水线的图片处理在子进程中执行，打包后的程序需要先处理子进程的启动
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
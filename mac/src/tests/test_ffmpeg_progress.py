@@ -0,0 +1,66 @@
+import unittest
+
+from core.ffmpeg_progress import FFmpegProgress, format_eta
+
+
+class FFmpegProgressTest(unittest.TestCase):
+    """FFmpeg -progress 输出的解析"""
+
+    def feed(self, progress, lines):
+        return [progress.feed_line(line) for line in lines]
+
+    def test_block(self):
+        progress = FFmpegProgress(10)
+        ends = self.feed(progress, ['frame=75', 'fps=25.00', 'out_time_us=2500000', 'speed=2.5x',
+                                    'progress=continue'])
+        self.assertEqual(ends, [False, False, False, False, True])
+        self.assertEqual(progress.frame, 75)
+        self.assertEqual(progress.fps, 25.0)
+        self.assertEqual(progress.out_time, 2.5)
+        self.assertEqual(progress.speed, 2.5)
+        self.assertEqual(progress.percent, 25)
+        self.assertAlmostEqual(progress.eta, 3.0)
+        self.assertFalse(progress.finished)
+
+    def test_bytes_and_out_time_ms(self):
+        # out_time_ms 的单位实际也是微秒
+        progress = FFmpegProgress(4)
+        self.feed(progress, [b'out_time_ms=1000000\n', b'progress=continue\n'])
+        self.assertEqual(progress.out_time, 1.0)
+        self.assertEqual(progress.percent, 25)
+
+    def test_unknown_values(self):
+        progress = FFmpegProgress(10)
+        self.feed(progress, ['out_time_us=N/A', 'speed=N/A', 'fps=N/A', 'frame=N/A', 'garbage', ''])
+        self.assertEqual(progress.out_time, 0.0)
+        self.assertIsNone(progress.speed)
+        self.assertIsNone(progress.fps)
+        self.assertEqual(progress.frame, 0)
+
+    def test_negative_out_time(self):
+        # 编码开始前 FFmpeg 可能输出负的时间
+        progress = FFmpegProgress(10)
+        progress.feed_line('out_time_us=-23220')
+        self.assertEqual(progress.out_time, 0.0)
+
+    def test_percent_capped_until_end(self):
+        progress = FFmpegProgress(10)
+        self.feed(progress, ['out_time_us=12000000', 'progress=continue'])
+        self.assertEqual(progress.percent, 99)
+        self.feed(progress, ['progress=end'])
+        self.assertTrue(progress.finished)
+        self.assertEqual(progress.percent, 100)
+        self.assertEqual(progress.eta, 0.0)
+
+    def test_no_duration(self):
+        progress = FFmpegProgress(0)
+        progress.feed_line('out_time_us=1000000')
+        self.assertEqual(progress.percent, 0)
+
+    def test_format_eta(self):
+        self.assertEqual(format_eta(None), '--:--:--')
+        self.assertEqual(format_eta(3725.9), '01:02:05')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from core.scheduling import compare_policies, order_items, simulate
+
+
+class OrderItemsTest(unittest.TestCase):
+    """调度策略的排列顺序"""
+
+    def test_fifo_and_unknown(self):
+        items = [3, 1, 2]
+        self.assertEqual(order_items(items), [3, 1, 2])
+        self.assertEqual(order_items(items, 'unknown', cost=lambda x: x), [3, 1, 2])
+        # 没有耗时估计时 lpt/spt 保持原有顺序
+        self.assertEqual(order_items(items, 'lpt'), [3, 1, 2])
+
+    def test_lpt_spt_stable(self):
+        items = [('a', 2), ('b', 5), ('c', 2), ('d', 1)]
+        cost = lambda item: item[1]
+        self.assertEqual([item[0] for item in order_items(items, 'lpt', cost)], ['b', 'a', 'c', 'd'])
+        self.assertEqual([item[0] for item in order_items(items, 'spt', cost)], ['d', 'a', 'c', 'b'])
+
+    def test_fair_round_robin(self):
+        items = ['A1', 'A2', 'A3', 'B1', 'B2', 'C1']
+        ordered = order_items(items, 'fair', group=lambda item: item[0])
+        self.assertEqual(ordered, ['A1', 'B1', 'C1', 'A2', 'B2', 'A3'])
+
+    def test_fair_served(self):
+        # 从未处理过的项目优先，其次是最久没有处理过的项目
+        items = ['A1', 'A2', 'B1', 'C1', 'C2']
+        ordered = order_items(items, 'fair', group=lambda item: item[0], served={'A': 20.0, 'B': 10.0})
+        self.assertEqual(ordered, ['C1', 'B1', 'A1', 'C2', 'A2'])
+
+    def test_fair_single_group(self):
+        items = ['A1', 'A2', 'A3']
+        self.assertEqual(order_items(items, 'fair', group=lambda item: item[0]), items)
+
+
+class SimulateTest(unittest.TestCase):
+    """调度模拟的用时统计"""
+
+    def test_single_worker(self):
+        result = simulate([3, 1, 2], workers=1, policy='spt')
+        self.assertEqual(result['order'], [1, 2, 0])
+        self.assertEqual(result['makespan'], 6)
+        # 完成时间 1、3、6
+        self.assertAlmostEqual(result['mean_completion'], 10 / 3)
+        self.assertAlmostEqual(result['utilization'], 1.0)
+
+    def test_lpt_shortens_makespan(self):
+        costs = [1, 1, 1, 1, 4]
+        fifo = simulate(costs, workers=2, policy='fifo')
+        lpt = simulate(costs, workers=2, policy='lpt')
+        self.assertEqual(fifo['makespan'], 6)
+        self.assertEqual(lpt['makespan'], 4)
+        self.assertAlmostEqual(lpt['utilization'], 1.0)
+
+    def test_fair_order_matches_order_items(self):
+        groups = ['A', 'A', 'A', 'B', 'B', None]
+        result = simulate([1] * 6, policy='fair', groups=groups)
+        self.assertEqual(result['order'], [0, 3, 5, 1, 4, 2])
+
+    def test_more_workers_than_jobs(self):
+        result = simulate([2, 3], workers=8)
+        self.assertEqual(result['makespan'], 3)
+        self.assertEqual(result['workers'], 8)
+
+    def test_empty(self):
+        result = simulate([], workers=2)
+        self.assertEqual((result['makespan'], result['mean_completion'], result['utilization']), (0.0, 0.0, 0.0))
+
+    def test_compare_policies(self):
+        policies = [result['policy'] for result in compare_policies([1, 2])]
+        self.assertEqual(policies, ['fifo', 'lpt', 'spt'])
+        policies = [result['policy'] for result in compare_policies([1, 2], groups=['A', 'B'])]
+        self.assertEqual(policies, ['fifo', 'lpt', 'spt', 'fair'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import threading
+import time
+import unittest
+
+from core.stage_dag import StageDAG
+
+
+class StageDAGTest(unittest.TestCase):
+    """阶段 DAG 的依赖顺序、结果传递和缓存"""
+
+    def setUp(self):
+        self.log = []
+        self.lock = threading.Lock()
+
+    def stage(self, name, value=None, delay=0):
+        """返回记录开始和结束顺序的节点函数，结果为 value 加上各依赖的结果"""
+        def run(*deps):
+            with self.lock:
+                self.log.append(('start', name))
+            time.sleep(delay)
+            with self.lock:
+                self.log.append(('end', name))
+            return (value if value is not None else name,) + deps
+        return run
+
+    def position(self, event, name):
+        return self.log.index((event, name))
+
+    def test_dependency_order_and_results(self):
+        with StageDAG(io_workers=4) as dag:
+            dag.add('probe', self.stage('probe', delay=0.05))
+            dag.add('image', self.stage('image', delay=0.02))
+            dag.add('encode', self.stage('encode'), deps=('probe', 'image'))
+            dag.add('verify', self.stage('verify'), deps=('encode',))
+            results = dag.run()
+        self.assertLess(self.position('end', 'probe'), self.position('start', 'encode'))
+        self.assertLess(self.position('end', 'image'), self.position('start', 'encode'))
+        self.assertLess(self.position('end', 'encode'), self.position('start', 'verify'))
+        # 依赖的结果按 deps 顺序追加在固定参数之后
+        self.assertEqual(results['encode'], ('encode', ('probe',), ('image',)))
+        self.assertEqual(results['verify'][1], results['encode'])
+
+    def test_fixed_args(self):
+        with StageDAG() as dag:
+            dag.add('size', lambda a, b: a * b, 3, 4)
+            dag.add('double', lambda factor, size: factor * size, 2, deps=('size',))
+            self.assertEqual(dag.run(), {'size': 12, 'double': 24})
+
+    def test_pool_limits_concurrency(self):
+        running = []
+        peak = [0]
+
+        def encode():
+            with self.lock:
+                running.append(1)
+                peak[0] = max(peak[0], len(running))
+            time.sleep(0.02)
+            with self.lock:
+                running.pop()
+
+        with StageDAG(io_workers=8) as dag:
+            dag.add_pool('encode', 1)
+            for index in range(4):
+                dag.add(f'encode:{index}', encode, pool='encode')
+            dag.run()
+        self.assertEqual(peak[0], 1)
+
+    def test_failure_skips_dependents(self):
+        def fail():
+            raise RuntimeError('ffmpeg 失败')
+
+        with StageDAG() as dag:
+            dag.add('encode', fail)
+            dag.add('verify', self.stage('verify'), deps=('encode',))
+            dag.add('commit', self.stage('commit'), deps=('verify',))
+            dag.add('other', self.stage('other'))
+            results = dag.run()
+        self.assertEqual(str(dag.nodes['encode'].error), 'ffmpeg 失败')
+        self.assertIsNotNone(dag.nodes['verify'].error)
+        self.assertIsNotNone(dag.nodes['commit'].error)
+        self.assertIsNone(results['commit'])
+        self.assertEqual(results['other'], ('other',))
+        self.assertNotIn(('start', 'verify'), self.log)
+
+    def test_memo_reused_across_runs(self):
+        calls = []
+
+        def probe(path):
+            calls.append(path)
+            return len(path)
+
+        memo = {}
+        for _ in range(2):
+            with StageDAG(memo=memo) as dag:
+                dag.add('probe:a', probe, 'a.mp3', key=('probe', 'a.mp3'))
+                dag.add('probe:b', probe, 'bb.mp3', key=('probe', 'bb.mp3'))
+                dag.add('uncached', probe, 'c.mp3')
+                results = dag.run()
+            self.assertEqual(results, {'probe:a': 5, 'probe:b': 6, 'uncached': 5})
+        self.assertEqual(sorted(calls), ['a.mp3', 'bb.mp3', 'c.mp3', 'c.mp3'])
+        self.assertTrue(dag.nodes['probe:a'].cached)
+        self.assertFalse(dag.nodes['uncached'].cached)
+
+    def test_failed_node_not_memoized(self):
+        memo = {}
+        with StageDAG(memo=memo) as dag:
+            dag.add('probe', lambda: 1 / 0, key='probe')
+            dag.run()
+        self.assertNotIn('probe', memo)
+
+    def test_invalid_graph(self):
+        with StageDAG() as dag:
+            dag.add('a', self.stage('a'))
+            with self.assertRaises(ValueError):
+                dag.add('a', self.stage('a'))
+            with self.assertRaises(ValueError):
+                dag.add('b', self.stage('b'), deps=('missing',))
+
+
+if __name__ == '__main__':
+    unittest.main()
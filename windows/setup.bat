@@ -15,6 +15,8 @@ echo 正在安装必要的Python包...
 pip install PyQt5
 pip install ffmpeg-python
 pip install Pillow
+:: 可选：PyAV 进程内编码后端
+pip install av
 pip install pyinstaller
 
 :: 创建源代码目录
@@ -0,0 +1,214 @@
+import time
+import threading
+from fractions import Fraction
+from PIL import Image
+from .render_spec import video_frames
+
+try:
+    import av
+except ImportError:  # PyAV 为可选依赖，未安装时只能使用 FFmpeg 后端
+    av = None
+
+# 编码参数中直接作为 libx264 私有选项传入的字段
+X264_OPTION_KEYS = ('preset', 'tune', 'crf', 'g', 'bf')
+
+# 未指定 GOP 长度时使用 x264 的默认值
+DEFAULT_GOP = 250
+
+
+def is_available():
+    """是否已安装 PyAV"""
+    return av is not None
+
+
+class CPUTimeShare:
+    """进程内编码任务的 CPU 时间
+
+    libx264 在自己的线程中编码，只统计调用线程的 CPU 时间会少算，因此统计整个进程的 CPU 时间
+    （用户态 + 内核态，与 FFmpeg -benchmark 的统计口径相同）。同时运行多个任务时，
+    每段时间内进程消耗的 CPU 时间由这段时间内运行中的任务平分，各任务之和等于进程的总量。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}  # 运行中的任务 -> 已分到的 CPU 时间
+        self._mark = time.process_time()
+
+    def _advance(self):
+        now = time.process_time()
+        if self._active:
+            share = (now - self._mark) / len(self._active)
+            for token in self._active:
+                self._active[token] += share
+        self._mark = now
+
+    def start(self):
+        """开始统计一个任务，返回其标识"""
+        token = object()
+        with self._lock:
+            self._advance()
+            self._active[token] = 0.0
+        return token
+
+    def stop(self, token):
+        """结束统计，返回任务分到的 CPU 时间（秒）"""
+        with self._lock:
+            self._advance()
+            return self._active.pop(token)
+
+
+# 本进程中所有 PyAV 编码任务共用的 CPU 时间统计
+cpu_time_share = CPUTimeShare()
+
+
+def parse_bitrate(value):
+    """将 '2000k'、'1M' 形式的码率转换为比特每秒"""
+    value = str(value).strip().lower()
+    units = {'k': 1000, 'm': 1000000}
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(float(value))
+
+
+class AVStillRenderer:
+    """基于 PyAV 的进程内静态画面视频编码
+
+    画面是同一张图片，只编码两个 GOP（以 IDR 帧开始、不含 B 帧的封闭 GOP）：
+    第一个用于开头，码率控制稳定后的第二个在之后的整条时间线上重复复用，只改写时间戳。
+    GOP 的前若干个数据包同样可以独立解码，用于结尾不足一个 GOP 的部分。
+    音频在进程内解码、重采样并编码为 AAC，或直接复制已编码好的音频轨道。
+    """
+
+    def __init__(self, encode_args):
+        """
+        Args:
+            encode_args: 与 FFmpeg 后端相同格式的画面编码参数（vcodec、r、pix_fmt、preset 等）
+        """
+        self.encode_args = encode_args
+        self.frame_rate = int(encode_args['r'])
+        self.gop = int(encode_args.get('g', DEFAULT_GOP))
+
+    def _add_video_stream(self, container, size):
+        """添加画面编码流"""
+        stream = container.add_stream(self.encode_args.get('vcodec', 'libx264'), rate=self.frame_rate)
+        stream.width, stream.height = size
+        stream.pix_fmt = self.encode_args.get('pix_fmt', 'yuv420p')
+        stream.time_base = Fraction(1, self.frame_rate)
+        options = {key: str(self.encode_args[key]) for key in X264_OPTION_KEYS if key in self.encode_args}
+        # 固定 GOP 长度且不插入场景切换关键帧，保证每个 GOP 都以 IDR 帧开始
+        options.update(g=str(self.gop), keyint_min=str(self.gop), sc_threshold='0', bf='0')
+        stream.options = options
+        if 'video_bitrate' in self.encode_args:
+            stream.bit_rate = parse_bitrate(self.encode_args['video_bitrate'])
+        return stream
+
+    def _encode_gops(self, stream, image_path, total_frames):
+        """将图片编码为开头的 GOP 和之后重复使用的 GOP
+        Returns:
+            tuple: (开头的 GOP, 重复使用的 GOP)，均为 (数据, 是否关键帧) 列表，第一个为关键帧
+        """
+        img = Image.open(image_path).convert('RGB')
+        # yuv420p 要求宽高为偶数
+        if img.width % 2 or img.height % 2:
+            img = img.crop((0, 0, img.width - img.width % 2, img.height - img.height % 2))
+        frame = av.VideoFrame.from_image(img).reformat(format=stream.pix_fmt)
+        frame.time_base = stream.time_base
+
+        packets = []
+        for index in range(min(total_frames, self.gop * 2)):
+            frame.pts = index
+            packets.extend(stream.encode(frame))
+        packets.extend(stream.encode(None))
+        gops = [packets[i:i + self.gop] for i in range(0, len(packets), self.gop)]
+        if any(not gop[0].is_keyframe for gop in gops):
+            raise RuntimeError('GOP 未以关键帧开始，无法复用')
+        gops = [[(bytes(packet), packet.is_keyframe) for packet in gop] for gop in gops]
+        return gops[0], gops[-1]
+
+    def render(self, image_path, audio_path, output_path, duration, audio_track=None,
+               audio_bitrate='128k', progress_callback=None):
+        """生成视频
+        Args:
+            image_path: 图片文件路径（应为已调整好尺寸的图片）
+            audio_path: 音频文件路径，audio_track 为 None 时在进程内编码为 AAC
+            output_path: 输出视频路径
+            duration: 视频时长（秒）
+            audio_track: 已编码好的 AAC 音频轨道，直接复制
+            audio_bitrate: 进程内编码音频时的码率
+            progress_callback: 进度回调函数，参数为已写入的媒体时长（秒）
+        Returns:
+            float: 本次编码消耗的 CPU 时间（秒，含 libx264 的编码线程，见 CPUTimeShare）
+        """
+        total_frames = video_frames(duration, self.frame_rate)
+        with Image.open(image_path) as img:
+            size = (img.width - img.width % 2, img.height - img.height % 2)
+
+        output = av.open(output_path, 'w', options={'movflags': '+faststart'})
+        cpu_token = cpu_time_share.start()
+        source = None
+        try:
+            video_stream = self._add_video_stream(output, size)
+            source = av.open(audio_track or audio_path)
+            source_audio = source.streams.audio[0]
+            if audio_track:
+                audio_stream = output.add_stream_from_template(source_audio)
+            else:
+                audio_stream = output.add_stream('aac', rate=source_audio.rate or 44100)
+                audio_stream.bit_rate = parse_bitrate(audio_bitrate)
+                resampler = av.AudioResampler(format=audio_stream.format.name, layout=audio_stream.layout.name,
+                                              rate=audio_stream.rate)
+
+            frame_time_base = Fraction(1, self.frame_rate)
+            first_gop, gop = self._encode_gops(video_stream, image_path, total_frames)
+            written = 0
+
+            def mux_video_until(seconds):
+                """写入画面数据包直到指定时间，与音频交错"""
+                nonlocal written
+                limit = min(total_frames, int(seconds * self.frame_rate) + 1)
+                while written < limit:
+                    if written < len(first_gop):
+                        data, keyframe = first_gop[written]
+                    else:
+                        data, keyframe = gop[(written - len(first_gop)) % len(gop)]
+                    packet = av.Packet(data)
+                    packet.pts = packet.dts = written
+                    packet.duration = 1
+                    packet.time_base = frame_time_base
+                    packet.is_keyframe = keyframe
+                    packet.stream = video_stream
+                    output.mux(packet)
+                    written += 1
+
+            def mux_audio(packets):
+                for packet in packets:
+                    if packet.pts is not None and packet.time_base:
+                        seconds = float(packet.pts * packet.time_base)
+                        if seconds >= duration:
+                            continue
+                        mux_video_until(seconds)
+                        if progress_callback:
+                            progress_callback(seconds)
+                    output.mux(packet)
+
+            if audio_track:
+                for packet in source.demux(source_audio):
+                    if packet.dts is None:
+                        continue
+                    packet.stream = audio_stream
+                    mux_audio([packet])
+            else:
+                for frame in source.decode(source_audio):
+                    for resampled in resampler.resample(frame):
+                        mux_audio(audio_stream.encode(resampled))
+                for resampled in resampler.resample(None):
+                    mux_audio(audio_stream.encode(resampled))
+                mux_audio(audio_stream.encode(None))
+
+            mux_video_until(duration)
+        finally:
+            if source is not None:
+                source.close()
+            output.close()
+            cpu_time = cpu_time_share.stop(cpu_token)
+        return cpu_time
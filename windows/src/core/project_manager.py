@@ -2,6 +2,36 @@ import os
 import json
 from datetime import datetime
 
+# 项目设置的默认值，新建项目时使用，加载缺少某项设置的旧项目时补齐；
+# 这些设置都作为生成参数传给 VideoCore.generate_video_from_images（见 render_options）
+DEFAULT_SETTINGS = {
+    'bg_music_volume': 0.3,  # 背景音乐默认音量(0.0-1.0)
+    'max_workers': 1,  # 同时运行的视频生成任务数
+    'group_size': 1,  # 单音频多图片时每个 FFmpeg 进程输出的视频数
+    'chunk_seconds': 0,  # 长视频画面分段并行编码的分段时长（秒），0 为不分段
+    'micro_batch_seconds': 0,  # 短于该时长的视频合并为小批量生成（秒），0 为不合并
+    'share_tracks': False,  # 共用的音频/画面轨道是否只编码一次
+    'use_cache': False,  # 是否跨次运行复用已编码的轨道
+    'inline_bg_music': False,  # 背景音乐是否直接在主编码中循环并混合
+    'normalize_images': True,  # 是否先将图片调整为 1920x1080
+    'image_fill_mode': 'letterbox',  # 图片填充方式：letterbox 补黑边，cover 铺满裁剪
+    'still_source': True,  # 图片只解码一次，在滤镜图中重复画面
+    'video_mode': 'standard',  # 画面编码模式：standard 为 30fps，static 为 1fps 静态编码
+    'backend': 'ffmpeg',  # 编码后端：ffmpeg 或 pyav（进程内编码，需安装 PyAV）
+    'schedule': 'fifo',  # 调度策略：fifo、lpt（最长优先）、spt（最短优先）、fair（处理队列时项目轮流）
+    'pipeline': False,  # 是否按阶段流水线生成（探测、图片处理与编码重叠，生成后校验）
+    'thumbnails': False,  # 流水线生成时是否为每个视频生成缩略图
+    'stall_timeout': 120,  # 编码进度超过该秒数不前进时结束该视频，0 为不检查
+    'timeout_factor': 10,  # 单个视频用时超过音频时长的该倍数时结束，0 为不限制
+    'use_asyncio': False,  # 是否用 asyncio 事件循环调度 FFmpeg 子进程
+    'max_attempts': 2,  # 每个视频最多生成的次数（含第一次），1 为失败后不重试
+    'retry_backoff': 5,  # 第一次重试前等待的秒数，之后每次翻倍
+    'retry_fallback': True  # 重试时是否改用更稳妥的设置（调整图片尺寸、完整编码）
+}
+
+# 项目“更新输出”的生成清单，保存在项目目录中，记录每个视频的输入文件指纹和生成设置
+OUTPUTS_MANIFEST_NAME = 'outputs.json'
+
 class ProjectManager:
     def __init__(self):
         self.projects_dir = 'projects'
@@ -25,9 +55,7 @@ class ProjectManager:
                 'images': [],
                 'background_music': []
             },
-            'settings': {
-                'bg_music_volume': 0.3  # 背景音乐默认音量(0.0-1.0)
-            }
+            'settings': dict(DEFAULT_SETTINGS)
         }
 
         # 创建项目目录
@@ -74,8 +102,8 @@ class ProjectManager:
                 # 确保项目包含设置
                 if 'settings' not in project:
                     project['settings'] = {}
-                if 'bg_music_volume' not in project['settings']:
-                    project['settings']['bg_music_volume'] = 0.3
+                for setting_name, default in DEFAULT_SETTINGS.items():
+                    project['settings'].setdefault(setting_name, default)
                 
                 self.current_project = project
                 return project
@@ -143,12 +171,35 @@ class ProjectManager:
         return True
         
     def get_setting(self, setting_name, default=None):
-        """获取项目设置"""
+        """获取项目设置，未设置时返回 default（为 None 时返回 DEFAULT_SETTINGS 中的默认值）"""
+        if default is None:
+            default = DEFAULT_SETTINGS.get(setting_name)
         if not self.current_project or 'settings' not in self.current_project:
             return default
             
         return self.current_project['settings'].get(setting_name, default)
 
+    @staticmethod
+    def render_options(project):
+        """返回项目的生成参数（包含背景音乐），可直接传给 generate_video_from_images"""
+        settings = project.get('settings', {})
+        options = {name: settings.get(name, default) for name, default in DEFAULT_SETTINGS.items()}
+        bg_music_files = project.get('files', {}).get('background_music', [])
+        options['bg_music_path'] = bg_music_files[0] if bg_music_files else None
+        return options
+
+    def output_manifest_path(self, project):
+        """项目“更新输出”使用的生成清单文件路径"""
+        return os.path.join(self.projects_dir, project['id'], OUTPUTS_MANIFEST_NAME)
+
+    def set_output_folder(self, output_folder):
+        """设置当前项目“更新输出”的输出目录"""
+        if not self.current_project:
+            return False
+        self.current_project['output_folder'] = output_folder
+        self._save_project()
+        return True
+
     def _save_project(self):
         """保存当前项目"""
         if not self.current_project:
@@ -0,0 +1,172 @@
+import re
+import json
+import shlex
+from .media_cache import make_key
+
+# 命令行模板中的占位符，例如 @@image@@
+PLACEHOLDER_PATTERN = re.compile(r'@@(\w+)@@')
+
+# 每个任务各不相同、在填充模板时提供的字段
+JOB_FIELDS = ('image', 'video_track', 'audio', 'audio_track', 'bg_music', 'duration', 'video_duration',
+              'video_frames', 'output')
+
+
+def placeholder(name):
+    """返回字段在命令行模板中的占位符"""
+    return f'@@{name}@@'
+
+
+def video_frames(duration, frame_rate):
+    """画面的帧数：音频时长按帧率向下取整（至少 1 帧），画面不会超出音频
+
+    最后一帧显示一整帧的时间，向上取整时低帧率（静态模式 1fps）的视频会比音频长将近一秒。
+    """
+    return max(1, int(duration * frame_rate + 1e-6))
+
+
+class RenderSpec:
+    """声明式的单个视频生成规格
+
+    只描述一批任务共同的部分：画面来源、音频来源与混音方式、编码配置和线程数，
+    图片、音频、输出路径和时长等每个任务不同的字段在填充命令行模板时提供。
+    规格按字段值哈希和比较（创建后不应修改），可以序列化为 JSON，同一规格的命令行模板只需编译一次。
+    """
+
+    FIELDS = ('video', 'still_source', 'video_mode', 'audio', 'inline_bg_music', 'bg_music_volume', 'threads')
+
+    def __init__(self, video='image', still_source=False, video_mode='standard', audio='source',
+                 inline_bg_music=False, bg_music_volume=None, threads='auto'):
+        """
+        Args:
+            video: 画面来源，'image' 从图片编码，'track' 复制已编码的画面轨道
+            still_source: 图片是否只解码一次
+            video_mode: 画面编码模式（standard / static）
+            audio: 音频来源，'source' 直接编码音频，'mix' 混合背景音乐后编码，'track' 复制已编码的音频轨道
+            inline_bg_music: 背景音乐是否在滤镜图中循环并调整音量
+            bg_music_volume: 在滤镜图中调整背景音乐时使用的音量
+            threads: 编码线程数
+        """
+        self.video = video
+        self.still_source = bool(still_source)
+        self.video_mode = video_mode
+        self.audio = audio
+        self.inline_bg_music = bool(inline_bg_music)
+        # 音量只在滤镜图中调整背景音乐时影响命令行
+        self.bg_music_volume = bg_music_volume if audio == 'mix' and inline_bg_music else None
+        self.threads = str(threads)
+
+    def _values(self):
+        return tuple(getattr(self, name) for name in RenderSpec.FIELDS)
+
+    def __eq__(self, other):
+        return isinstance(other, RenderSpec) and self._values() == other._values()
+
+    def __hash__(self):
+        return hash(self._values())
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={value!r}' for name, value in self.to_dict().items())
+        return f'RenderSpec({fields})'
+
+    def to_dict(self):
+        """转换为可 JSON 序列化的字典"""
+        return dict(zip(RenderSpec.FIELDS, self._values()))
+
+    @classmethod
+    def from_dict(cls, data):
+        """从 to_dict 的结果恢复规格"""
+        return cls(**{name: data[name] for name in cls.FIELDS if name in data})
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), sort_keys=True, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    @property
+    def key(self):
+        """稳定的规格标识，可用作缓存键"""
+        return make_key('render_spec', self.to_dict())
+
+    @classmethod
+    def from_job(cls, job, threads='auto'):
+        """根据 VideoCore 的任务字典生成规格"""
+        if job.get('audio_track'):
+            audio = 'track'
+        elif job.get('bg_music'):
+            audio = 'mix'
+        else:
+            audio = 'source'
+        return cls(video='track' if job.get('video_track') else 'image',
+                   still_source=job.get('still_source', False),
+                   video_mode=job.get('video_mode', 'standard'),
+                   audio=audio,
+                   inline_bg_music=job.get('inline_bg_music', False),
+                   bg_music_volume=job.get('bg_music_volume', 0.3),
+                   threads=threads)
+
+    def placeholder_job(self):
+        """返回各字段为占位符的任务字典，用于编译命令行模板"""
+        return {
+            'image_path': placeholder('image'),
+            'video_track': placeholder('video_track') if self.video == 'track' else None,
+            'audio_path': placeholder('audio'),
+            'audio_track': placeholder('audio_track') if self.audio == 'track' else None,
+            'bg_music': placeholder('bg_music') if self.audio == 'mix' else None,
+            'bg_music_volume': self.bg_music_volume,
+            'inline_bg_music': self.inline_bg_music,
+            'still_source': self.still_source,
+            'video_mode': self.video_mode,
+            'duration': placeholder('duration'),
+            'video_duration': placeholder('video_duration'),
+            'video_frames': placeholder('video_frames'),
+            'output_path': placeholder('output')
+        }
+
+
+class RenderTemplate:
+    """编译好的 FFmpeg 命令行模板，按任务填充占位符即可得到完整的命令行"""
+
+    def __init__(self, spec, argv, frame_rate):
+        """
+        Args:
+            spec: 生成规格
+            argv: 用 spec.placeholder_job() 编译的命令行
+            frame_rate: 画面帧率，用于按音频时长计算画面的时长和帧数
+        """
+        self.spec = spec
+        self.argv = list(argv)
+        self.frame_rate = frame_rate
+        # 预先记录含占位符的参数位置，填充时只处理这些参数
+        self._slots = [index for index, arg in enumerate(self.argv) if PLACEHOLDER_PATTERN.search(arg)]
+
+    def fill(self, values):
+        """填充占位符
+        Args:
+            values: 字段名 -> 值，字段见 JOB_FIELDS
+        Returns:
+            list: FFmpeg 命令行参数
+        """
+        argv = list(self.argv)
+        for index in self._slots:
+            argv[index] = PLACEHOLDER_PATTERN.sub(lambda match: str(values[match.group(1)]), argv[index])
+        return argv
+
+    def fill_job(self, job):
+        """使用 VideoCore 任务字典填充占位符"""
+        frames = video_frames(job['duration'], self.frame_rate)
+        return self.fill({
+            'image': job.get('image_path'),
+            'video_track': job.get('video_track'),
+            'audio': job.get('audio_path'),
+            'audio_track': job.get('audio_track'),
+            'bg_music': job.get('bg_music'),
+            'duration': job['duration'],
+            'video_duration': frames / self.frame_rate,
+            'video_frames': frames,
+            'output': job['output_path']
+        })
+
+    def __repr__(self):
+        return f'RenderTemplate({self.spec!r}: {shlex.join(self.argv)})'
@@ -0,0 +1,172 @@
+import pickle
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+class StageNode:
+    """DAG 中的一个阶段节点"""
+
+    def __init__(self, name, func, args=(), deps=(), pool='io', key=None):
+        """
+        Args:
+            name: 节点名，在同一个 DAG 中唯一
+            func: 节点函数，参数为 args 加上各依赖节点的结果（按 deps 顺序）
+            args: 固定参数
+            deps: 依赖的节点名
+            pool: 执行池名称，'io' 为线程池，'cpu' 为进程池（func 和参数需可 pickle）
+            key: 缓存键，为 None 时不缓存
+        """
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.deps = tuple(deps)
+        self.pool = pool
+        self.key = key
+        self.result = None
+        self.error = None
+        self.cached = False
+
+
+class StageDAG:
+    """按依赖关系并发执行阶段节点的小型 DAG 执行器
+
+    节点的依赖全部完成后立即提交到各自的执行池，不同任务的阶段互不等待，
+    例如后一个任务的探测和图片处理与前一个任务的编码同时进行。
+    'io' 池为线程池，'cpu' 池为进程池（无法使用进程时改在线程池中执行），
+    还可以通过 add_pool 注册其他线程池来单独限制某类阶段的并发数。
+    设置了 key 的节点结果保存在 memo 中，再次运行相同 key 的节点时直接复用；
+    依赖失败的节点不会执行，错误记录在 node.error 中。
+    """
+
+    def __init__(self, io_workers=None, cpu_workers=None, memo=None):
+        """
+        Args:
+            io_workers: 线程池大小，None 为默认值
+            cpu_workers: 进程池大小，None 为 CPU 核心数
+            memo: 缓存键 -> 节点结果，可在多次运行之间共用
+        """
+        self.memo = memo if memo is not None else {}
+        self.nodes = {}
+        self._pools = {'io': ThreadPoolExecutor(max_workers=io_workers)}
+        self._cpu_workers = cpu_workers
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._waiting = {}
+        self._dependents = {}
+        self._remaining = 0
+
+    def add_pool(self, name, max_workers):
+        """注册一个线程池，例如限制同时运行的编码任务数"""
+        self._pools[name] = ThreadPoolExecutor(max_workers=max(1, int(max_workers)))
+
+    def add(self, name, func, *args, deps=(), pool='io', key=None):
+        """添加节点
+        Returns:
+            str: 节点名，可作为其他节点的依赖
+        """
+        if name in self.nodes:
+            raise ValueError(f"节点已存在: {name}")
+        for dep in deps:
+            if dep not in self.nodes:
+                raise ValueError(f"节点 {name} 依赖的 {dep} 不存在，需先添加")
+        self.nodes[name] = StageNode(name, func, args, deps, pool, key)
+        return name
+
+    def _pool(self, name):
+        if name == 'cpu' and 'cpu' not in self._pools:
+            # 使用 spawn 启动子进程：fork 会继承其他线程正在启动的 ffprobe/ffmpeg 的管道，
+            # 使这些进程结束后管道仍不关闭，读取输出的线程一直等待
+            self._pools['cpu'] = ProcessPoolExecutor(max_workers=self._cpu_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+        return self._pools[name]
+
+    def run(self):
+        """执行所有节点，阻塞到全部完成
+        Returns:
+            dict: 节点名 -> 结果（失败或被跳过的节点为 None）
+        """
+        with self._lock:
+            self._waiting = {name: set(node.deps) for name, node in self.nodes.items()}
+            self._dependents = {name: [] for name in self.nodes}
+            for name, node in self.nodes.items():
+                for dep in node.deps:
+                    self._dependents[dep].append(name)
+            self._remaining = len(self.nodes)
+        for name in [name for name, deps in self._waiting.items() if not deps]:
+            self._submit(name)
+        with self._finished:
+            while self._remaining:
+                self._finished.wait()
+        return {name: node.result for name, node in self.nodes.items()}
+
+    def _submit(self, name):
+        """提交依赖已全部完成的节点"""
+        node = self.nodes[name]
+        failed = [dep for dep in node.deps if self.nodes[dep].error is not None]
+        if failed:
+            self._complete(name, error=RuntimeError(f"依赖的阶段 {failed[0]} 失败"))
+            return
+        if node.key is not None and node.key in self.memo:
+            node.cached = True
+            self._complete(name, result=self.memo[node.key])
+            return
+        args = node.args + tuple(self.nodes[dep].result for dep in node.deps)
+        try:
+            future = self._pool(node.pool).submit(node.func, *args)
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            if node.pool != 'cpu':
+                self._complete(name, error=e)
+                return
+            print(f"进程池不可用，阶段 {name} 改在线程中执行: {str(e)}")
+            node.pool = 'io'
+            future = self._pools['io'].submit(node.func, *args)
+        future.add_done_callback(lambda done: self._on_done(name, done, args))
+
+    def _on_done(self, name, future, args):
+        node = self.nodes[name]
+        try:
+            result = future.result()
+        except Exception as e:
+            # 进程池崩溃或函数无法 pickle 时改在线程中重新执行
+            if node.pool == 'cpu' and (isinstance(e, (BrokenProcessPool, pickle.PicklingError)) or
+                                       'pickle' in str(e)):
+                print(f"阶段 {name} 无法在进程中执行，改在线程中执行: {str(e)}")
+                node.pool = 'io'
+                retry = self._pools['io'].submit(node.func, *args)
+                retry.add_done_callback(lambda done: self._on_done(name, done, args))
+                return
+            self._complete(name, error=e)
+            return
+        if node.key is not None:
+            self.memo[node.key] = result
+        self._complete(name, result=result)
+
+    def _complete(self, name, result=None, error=None):
+        """记录节点结果，并提交依赖已全部完成的后续节点"""
+        node = self.nodes[name]
+        node.result = result
+        node.error = error
+        ready = []
+        with self._finished:
+            for dependent in self._dependents[name]:
+                self._waiting[dependent].discard(name)
+                if not self._waiting[dependent]:
+                    ready.append(dependent)
+            self._remaining -= 1
+            self._finished.notify_all()
+        for dependent in ready:
+            self._submit(dependent)
+
+    def close(self):
+        """关闭所有执行池"""
+        for pool in self._pools.values():
+            pool.shutdown(wait=True)
+        self._pools = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
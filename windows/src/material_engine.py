@@ -5,11 +5,13 @@ import pandas as pd
 from PIL import Image
 from datetime import datetime
 from .logger import Logger
+from .core.probe_cache import get_probe_cache
 
 class MaterialEngine:
     def __init__(self):
         self.logger = Logger()
         self.temp_dir = os.path.join(os.getcwd(), 'temp')
+        self.probe_cache = get_probe_cache()  # 与 VideoCore 共用的探测缓存
         self.init_temp_dir()
 
     def init_temp_dir(self):
@@ -21,7 +23,7 @@ class MaterialEngine:
     def process_audio(self, audio_path):
         """处理音频文件，获取音频信息"""
         try:
-            probe = ffmpeg.probe(audio_path)
+            probe = self.probe_cache.probe(audio_path)
             audio_info = next(s for s in probe['streams'] if s['codec_type'] == 'audio')
             
             info = {
@@ -68,7 +70,7 @@ class MaterialEngine:
     def process_video(self, video_path):
         """处理视频文件，获取视频信息"""
         try:
-            probe = ffmpeg.probe(video_path)
+            probe = self.probe_cache.probe(video_path)
             video_info = next(s for s in probe['streams'] if s['codec_type'] == 'video')
             audio_info = next(s for s in probe['streams'] if s['codec_type'] == 'audio')
             
@@ -145,7 +147,7 @@ class MaterialEngine:
     def get_frame_count(self, video_path):
         """获取视频帧数"""
         try:
-            probe = ffmpeg.probe(video_path)
+            probe = self.probe_cache.probe(video_path)
             video_info = next(s for s in probe['streams'] if s['codec_type'] == 'video')
             duration = float(probe['format']['duration'])
             fps = eval(video_info['r_frame_rate'])
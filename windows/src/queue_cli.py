@@ -0,0 +1,179 @@
+import sys
+import time
+import argparse
+import multiprocessing
+from datetime import datetime
+from core.project_manager import ProjectManager
+from core.job_queue import JobQueue, RenderWorker, JOB_STATUSES, DEFAULT_DB_PATH, job_group
+from core.probe_cache import get_probe_cache
+from core.scheduling import SCHEDULE_POLICIES, compare_policies
+
+# 模拟结果中调度策略的显示名称
+SCHEDULE_NAMES = {
+    'fifo': '按加入顺序',
+    'lpt': '最长的优先',
+    'spt': '最短的优先',
+    'fair': '项目轮流'
+}
+
+
+def find_project(project_manager, key):
+    """按项目 ID 或名称查找项目"""
+    for project in project_manager.list_projects():
+        if key in (project['id'], project['name']):
+            return project_manager.load_project(project['id'])
+    return None
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%m-%d %H:%M:%S') if timestamp else '-'
+
+
+def command_add(args):
+    project_manager = ProjectManager()
+    queue = JobQueue(args.db)
+    for key in args.projects:
+        project = find_project(project_manager, key)
+        if project is None:
+            print(f"错误：找不到项目 {key}")
+            return 1
+        if not project['files']['audio'] or not project['files']['images']:
+            print(f"错误：项目 {project['name']} 缺少音频或图片文件")
+            return 1
+        job_id = queue.enqueue_project(project, args.output, args.priority, args.attempts)
+        print(f"已加入队列: 任务 {job_id}（{project['name']}）")
+    return 0
+
+
+def run_worker(db_path, wait, schedule='fifo'):
+    """工作进程入口"""
+    return RenderWorker(JobQueue(db_path), schedule=schedule).run(wait=wait)
+
+
+def command_work(args):
+    if args.workers == 1:
+        processed = run_worker(args.db, args.wait, args.schedule)
+        print(f"共处理 {processed} 个任务")
+        return 0
+    # 多个工作进程同时处理队列，每个进程一次处理一个任务
+    processes = [multiprocessing.Process(target=run_worker, args=(args.db, args.wait, args.schedule))
+                 for _ in range(args.workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return 0
+
+
+def command_list(args):
+    queue = JobQueue(args.db)
+    jobs = queue.list_jobs(status=args.status)
+    for job in jobs:
+        elapsed = '-'
+        if job['started_at'] and job['finished_at']:
+            elapsed = f"{job['finished_at'] - job['started_at']:.0f}秒"
+        elif job['started_at'] and job['status'] == 'running':
+            elapsed = f"{time.time() - job['started_at']:.0f}秒"
+        print(f"{job['id']:>5}  {job['status']:<9}  {job['project_name'] or '-':<16}  "
+              f"尝试 {job['attempts']}/{job['max_attempts']}  加入 {format_time(job['created_at'])}  "
+              f"耗时 {elapsed:<6}  {job['output_path'] or job['output_dir']}")
+        if job['error']:
+            print(f"       错误: {job['error']}")
+    counts = queue.counts()
+    print('，'.join(f"{status} {counts[status]}" for status in JOB_STATUSES))
+    return 0
+
+
+def command_simulate(args):
+    served = None
+    if args.project:
+        # 模拟项目中各视频在 VideoCore 并行任务上的执行
+        project = find_project(ProjectManager(), args.project)
+        if project is None:
+            print(f"错误：找不到项目 {args.project}")
+            return 1
+        durations = get_probe_cache().durations(project['files']['audio'])
+        if len(durations) == 1:
+            durations = durations * max(1, len(project['files']['images']))
+        costs, groups = durations, None
+        print(f"项目 {project['name']}: {len(costs)} 个视频，总时长 {sum(costs):.0f}秒")
+    else:
+        # 模拟队列中等待的任务在多个工作进程上的执行（fair 与领取任务时一样考虑各项目最近的处理时间）
+        queue = JobQueue(args.db)
+        jobs = queue.list_jobs(status='pending')
+        costs = [job['estimate'] or 0.0 for job in jobs]
+        groups = [job_group(job) for job in jobs]
+        served = queue.last_served()
+        unknown = sum(1 for job in jobs if job['estimate'] is None)
+        print(f"队列中等待的任务 {len(jobs)} 个，总时长 {sum(costs):.0f}秒"
+              + (f"（{unknown} 个任务无法估计，按 0 计算）" if unknown else ''))
+    if not costs:
+        return 0
+    
+    # 按编码速度（实时倍率）将视频时长换算为预计耗时
+    costs = [cost / args.speed for cost in costs]
+    for workers in args.workers:
+        for result in compare_policies(costs, workers, groups, served=served):
+            print(f"{workers:>3} 个并行  {SCHEDULE_NAMES[result['policy']]:<6}  "
+                  f"总用时 {result['makespan']:>8.1f}秒  平均完成 {result['mean_completion']:>8.1f}秒  "
+                  f"利用率 {result['utilization'] * 100:.0f}%")
+    return 0
+
+
+def command_cancel(args):
+    queue = JobQueue(args.db)
+    for job_id in args.ids:
+        print(f"任务 {job_id}: {'已取消' if queue.cancel(job_id) else '只能取消等待中的任务'}")
+    return 0
+
+
+def command_retry(args):
+    queue = JobQueue(args.db)
+    for job_id in args.ids:
+        print(f"任务 {job_id}: {'已重新排队' if queue.retry(job_id) else '只能重试失败或已取消的任务'}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='视频生成任务队列')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='队列数据库文件')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = subparsers.add_parser('add', help='将项目加入队列')
+    add_parser.add_argument('projects', nargs='+', help='项目 ID 或名称')
+    add_parser.add_argument('-o', '--output', required=True, help='输出目录')
+    add_parser.add_argument('--priority', type=int, default=0, help='优先级，数值大的先处理')
+    add_parser.add_argument('--attempts', type=int, default=1, help='失败时最多尝试的次数')
+    add_parser.set_defaults(func=command_add)
+
+    work_parser = subparsers.add_parser('work', help='处理队列中的任务')
+    work_parser.add_argument('-n', '--workers', type=int, default=1, help='同时处理任务的进程数')
+    work_parser.add_argument('--wait', action='store_true', help='队列为空时继续等待新任务')
+    work_parser.add_argument('--schedule', choices=SCHEDULE_POLICIES, default='fifo', help='领取任务的调度策略')
+    work_parser.set_defaults(func=command_work)
+
+    list_parser = subparsers.add_parser('list', help='列出任务')
+    list_parser.add_argument('--status', choices=JOB_STATUSES, help='只列出指定状态的任务')
+    list_parser.set_defaults(func=command_list)
+
+    simulate_parser = subparsers.add_parser('simulate', help='模拟各调度策略的预计总用时')
+    simulate_parser.add_argument('--project', help='模拟项目内的视频，默认模拟队列中等待的任务')
+    simulate_parser.add_argument('-n', '--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='并行数')
+    simulate_parser.add_argument('--speed', type=float, default=1.0, help='编码速度（实时倍率），用于换算耗时')
+    simulate_parser.set_defaults(func=command_simulate)
+
+    cancel_parser = subparsers.add_parser('cancel', help='取消等待中的任务')
+    cancel_parser.add_argument('ids', nargs='+', type=int)
+    cancel_parser.set_defaults(func=command_cancel)
+
+    retry_parser = subparsers.add_parser('retry', help='重新排队失败或已取消的任务')
+    retry_parser.add_argument('ids', nargs='+', type=int)
+    retry_parser.set_defaults(func=command_retry)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from core.job_queue import JobQueue, claim_order
+
+
+class JobQueueTest(unittest.TestCase):
+    """SQLite 任务队列的领取、重试和失效任务回收"""
+
+    def setUp(self):
+        self._temp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._temp.name, 'jobs.db')
+        self.queue = JobQueue(self.db_path)
+
+    def tearDown(self):
+        self._temp.cleanup()
+
+    def enqueue(self, project_id=None, priority=0, estimate=10.0, max_attempts=1):
+        return self.queue.enqueue(['a.mp3'], ['a.jpg'], 'out', {'max_workers': 1}, project_id=project_id,
+                                  priority=priority, max_attempts=max_attempts, estimate=estimate)
+
+    def claim_all(self, schedule='fifo'):
+        ids = []
+        while True:
+            job = self.queue.claim('test', schedule)
+            if job is None:
+                return ids
+            ids.append(job['id'])
+            # fair 按最近一次领取的时间排列，避免两次领取的时间相同
+            time.sleep(0.002)
+
+    def set_heartbeat(self, job_id, heartbeat_at):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('UPDATE jobs SET heartbeat_at = ? WHERE id = ?', (heartbeat_at, job_id))
+
+    def test_claim(self):
+        job_id = self.enqueue()
+        job = self.queue.claim('worker-1')
+        self.assertEqual(job['id'], job_id)
+        self.assertEqual((job['status'], job['worker'], job['attempts']), ('running', 'worker-1', 1))
+        self.assertEqual(job['options'], {'max_workers': 1})
+        self.assertEqual(job['audio_paths'], ['a.mp3'])
+        self.assertIsNone(self.queue.claim('worker-2'))
+
+    def test_priority_then_fifo(self):
+        low = self.enqueue()
+        high = self.enqueue(priority=5)
+        low2 = self.enqueue()
+        self.assertEqual(self.claim_all(), [high, low, low2])
+
+    def test_lpt_and_spt(self):
+        short = self.enqueue(estimate=5)
+        unknown = self.enqueue(estimate=None)
+        long = self.enqueue(estimate=50)
+        self.assertEqual(self.claim_all('lpt'), [long, short, unknown])
+        # 无法估计耗时的任务在 lpt 和 spt 中都排在最后
+        pending = [dict(job, status='pending') for job in self.queue.list_jobs()]
+        self.assertEqual([job['id'] for job in claim_order(pending, 'spt')], [short, long, unknown])
+
+    def test_fair_round_robin(self):
+        # 同一项目的任务不会连续被领取，不属于项目的任务各自一组
+        a1, a2, a3 = self.enqueue('A'), self.enqueue('A'), self.enqueue('A')
+        b1, b2 = self.enqueue('B'), self.enqueue('B')
+        single = self.enqueue()
+        self.assertEqual(self.claim_all('fair'), [a1, b1, single, a2, b2, a3])
+
+    def test_concurrent_claims_unique(self):
+        job_ids = [self.enqueue() for _ in range(20)]
+        claimed = []
+        lock = threading.Lock()
+
+        def work():
+            queue = JobQueue(self.db_path)
+            while True:
+                job = queue.claim(threading.current_thread().name)
+                if job is None:
+                    return
+                with lock:
+                    claimed.append(job['id'])
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(claimed), job_ids)
+
+    def test_fail_until_max_attempts(self):
+        job_id = self.enqueue(max_attempts=2)
+        self.queue.claim('test')
+        self.assertEqual(self.queue.fail(job_id, '第一次失败'), 'pending')
+        job = self.queue.claim('test')
+        self.assertEqual(job['attempts'], 2)
+        self.assertIsNone(job['error'])
+        self.assertEqual(self.queue.fail(job_id, '第二次失败'), 'failed')
+        job = self.queue.get(job_id)
+        self.assertEqual((job['status'], job['error']), ('failed', '第二次失败'))
+        self.assertIsNone(self.queue.claim('test'))
+        # 手动重试时重新计算尝试次数
+        self.assertTrue(self.queue.retry(job_id))
+        self.assertEqual(self.queue.claim('test')['attempts'], 1)
+
+    def test_release_does_not_count_attempt(self):
+        job_id = self.enqueue()
+        self.queue.claim('test')
+        self.assertTrue(self.queue.release(job_id, 'out/output_1'))
+        job = self.queue.get(job_id)
+        self.assertEqual((job['status'], job['attempts'], job['output_path']), ('pending', 0, 'out/output_1'))
+        self.assertEqual(self.queue.claim('test')['attempts'], 1)
+
+    def test_requeue_stale(self):
+        stale = self.enqueue()
+        alive = self.enqueue()
+        self.queue.claim('crashed')
+        self.queue.claim('alive')
+        self.set_heartbeat(stale, time.time() - 600)
+        self.queue.heartbeat(alive, 'out/output_2')
+        self.assertEqual(self.queue.requeue_stale(stale_seconds=120), 1)
+        job = self.queue.get(stale)
+        self.assertEqual((job['status'], job['worker']), ('pending', None))
+        job = self.queue.get(alive)
+        self.assertEqual((job['status'], job['output_path']), ('running', 'out/output_2'))
+        # 重新领取时计入尝试次数
+        self.assertEqual(self.queue.claim('test')['attempts'], 2)
+
+    def test_cancel_only_pending(self):
+        running = self.enqueue()
+        pending = self.enqueue()
+        self.queue.claim('test')
+        self.assertFalse(self.queue.cancel(running))
+        self.assertTrue(self.queue.cancel(pending))
+        self.assertEqual(self.queue.counts()['cancelled'], 1)
+        self.assertEqual(self.queue.counts()['running'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
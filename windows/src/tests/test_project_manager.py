@@ -0,0 +1,52 @@
+import json
+import os
+import tempfile
+import unittest
+
+from core.project_manager import DEFAULT_SETTINGS, ProjectManager
+
+
+class ProjectSettingsTest(unittest.TestCase):
+    """项目设置的默认值和生成参数"""
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._temp = tempfile.TemporaryDirectory()
+        os.chdir(self._temp.name)
+        self.manager = ProjectManager()
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._temp.cleanup()
+
+    def test_create_uses_defaults(self):
+        project = self.manager.create_project('新项目')
+        self.assertEqual(project['settings'], DEFAULT_SETTINGS)
+        project['settings']['max_workers'] = 4
+        self.assertEqual(DEFAULT_SETTINGS['max_workers'], 1)
+
+    def test_load_backfills_missing_settings(self):
+        project = self.manager.create_project('旧项目')
+        project_file = os.path.join('projects', project['id'], 'project.json')
+        with open(project_file, 'w', encoding='utf-8') as f:
+            json.dump(dict(project, settings={'max_workers': 3}), f)
+        loaded = self.manager.load_project(project['id'])
+        self.assertEqual(loaded['settings'], dict(DEFAULT_SETTINGS, max_workers=3))
+
+    def test_get_setting_default(self):
+        self.assertEqual(self.manager.get_setting('stall_timeout'), DEFAULT_SETTINGS['stall_timeout'])
+        self.manager.create_project('项目')
+        self.manager.update_setting('video_mode', 'static')
+        self.assertEqual(self.manager.get_setting('video_mode'), 'static')
+        self.assertEqual(self.manager.get_setting('unknown', 'x'), 'x')
+
+    def test_render_options(self):
+        project = {'settings': {'group_size': 4, 'name_only_setting': 1},
+                   'files': {'background_music': ['bg.mp3', 'bg2.mp3']}}
+        options = ProjectManager.render_options(project)
+        self.assertEqual(options, dict(DEFAULT_SETTINGS, group_size=4, bg_music_path='bg.mp3'))
+        self.assertIsNone(ProjectManager.render_options({})['bg_music_path'])
+
+
+if __name__ == '__main__':
+    unittest.main()
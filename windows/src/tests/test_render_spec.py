@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+
+from core.render_spec import RenderSpec, RenderTemplate, placeholder, video_frames
+from core.video_core import VideoCore
+
+
+def make_job(**fields):
+    job = {
+        'image_path': '/素材/图片 1.jpg',
+        'audio_path': '/素材/音频 1.mp3',
+        'bg_music': None,
+        'duration': 12.068571,
+        'output_path': '/输出/视频 1.partial.mp4',
+        'video_mode': 'standard',
+        'still_source': False
+    }
+    job.update(fields)
+    return job
+
+
+# 覆盖各种画面来源、音频来源和编码模式的任务
+JOBS = [
+    make_job(),
+    make_job(still_source=True),
+    make_job(video_mode='static', still_source=True, duration=7.5),
+    make_job(video_track='/cache/track.mp4', audio_track='/cache/audio.m4a'),
+    make_job(bg_music='/cache/bgm.m4a'),
+    make_job(bg_music='/素材/背景.mp3', inline_bg_music=True, bg_music_volume=0.25, video_mode='static'),
+]
+
+
+class RenderSpecTest(unittest.TestCase):
+    """生成规格的比较和序列化"""
+
+    def test_from_job(self):
+        self.assertEqual(RenderSpec.from_job(JOBS[0]), RenderSpec())
+        spec = RenderSpec.from_job(JOBS[3], threads=2)
+        self.assertEqual((spec.video, spec.audio, spec.threads), ('track', 'track', '2'))
+        self.assertEqual(RenderSpec.from_job(JOBS[4]).audio, 'mix')
+
+    def test_volume_only_matters_inline(self):
+        # 背景音乐预先处理好时，音量不影响命令行，规格相同
+        self.assertEqual(RenderSpec(audio='mix', bg_music_volume=0.1), RenderSpec(audio='mix', bg_music_volume=0.5))
+        self.assertNotEqual(RenderSpec(audio='mix', inline_bg_music=True, bg_music_volume=0.1),
+                            RenderSpec(audio='mix', inline_bg_music=True, bg_music_volume=0.5))
+
+    def test_hash_and_json(self):
+        spec = RenderSpec.from_job(JOBS[5], threads=4)
+        self.assertEqual(RenderSpec.from_json(spec.to_json()), spec)
+        self.assertEqual(len({spec, RenderSpec.from_dict(spec.to_dict())}), 1)
+        self.assertEqual(RenderSpec.from_json(spec.to_json()).key, spec.key)
+
+    def test_video_frames(self):
+        # 画面向下取整到整帧，不超出音频
+        self.assertEqual(video_frames(12.04, 1), 12)
+        self.assertEqual(video_frames(12.0, 1), 12)
+        self.assertEqual(video_frames(12.068571, 30), 362)
+        self.assertEqual(video_frames(0.2, 1), 1)
+
+
+class RenderTemplateTest(unittest.TestCase):
+    """命令行模板的填充"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._cwd = os.getcwd()
+        cls._temp = tempfile.TemporaryDirectory()
+        os.chdir(cls._temp.name)
+        cls.core = VideoCore()
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls._cwd)
+        cls._temp.cleanup()
+
+    def test_fill(self):
+        template = RenderTemplate(RenderSpec(), ['-i', placeholder('image'), '-t', placeholder('duration'),
+                                                 f"{placeholder('output')}.tmp", '-y'], 1)
+        argv = template.fill({'image': 'a.jpg', 'duration': 3.5, 'output': 'out'})
+        self.assertEqual(argv, ['-i', 'a.jpg', '-t', '3.5', 'out.tmp', '-y'])
+        # 模板本身不变，可以重复填充
+        self.assertEqual(template.argv[1], placeholder('image'))
+
+    def test_matches_per_job_graph(self):
+        # 填充模板得到的命令行与按任务单独构建滤镜图的结果完全相同
+        for job in JOBS:
+            with self.subTest(job=job):
+                spec = RenderSpec.from_job(job, threads=2)
+                template = self.core._render_template(spec)
+                expected = self.core._with_progress(self.core._build_output(job, spec.threads)).compile()
+                self.assertEqual(template.fill_job(job), expected)
+
+    def test_template_compiled_once(self):
+        spec = RenderSpec.from_job(JOBS[1])
+        self.assertIs(self.core._render_template(spec), self.core._render_template(RenderSpec.from_job(JOBS[1])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+
+from core.retry_policy import MAX_RETRY_DELAY, RetryPolicy
+from core.video_core import VideoCore
+
+
+class RetryPolicyTest(unittest.TestCase):
+    """失败后的重试判断和等待时间"""
+
+    def test_max_attempts(self):
+        policy = RetryPolicy(max_attempts=3)
+        self.assertTrue(policy.should_retry(1, 'Conversion failed!'))
+        self.assertTrue(policy.should_retry(2, 'Conversion failed!'))
+        self.assertFalse(policy.should_retry(3, 'Conversion failed!'))
+
+    def test_no_retry(self):
+        self.assertFalse(RetryPolicy(max_attempts=1).should_retry(1))
+        # 0 或 None 视为只生成一次
+        self.assertEqual(RetryPolicy(max_attempts=0).max_attempts, 1)
+        self.assertEqual(RetryPolicy(max_attempts=None).max_attempts, 1)
+
+    def test_permanent_errors(self):
+        # 输入文件不存在或无法解码时重试也不会成功，立即失败
+        policy = RetryPolicy(max_attempts=5)
+        for error in ['/素材/a.jpg: No such file or directory',
+                      '[image2 @ 0x1] Could not find codec parameters for stream 0',
+                      'a.mp3: Invalid data found when processing input',
+                      '[mjpeg @ 0x1] No JPEG data found in image']:
+            with self.subTest(error=error):
+                self.assertTrue(policy.is_permanent(error))
+                self.assertFalse(policy.should_retry(1, error))
+        self.assertFalse(policy.is_permanent(None))
+        self.assertFalse(policy.is_permanent('看门狗: 超过 120 秒没有进度'))
+
+    def test_delay(self):
+        policy = RetryPolicy(max_attempts=10, backoff=5)
+        self.assertEqual([policy.delay(attempt) for attempt in (1, 2, 3)], [5, 10, 20])
+        self.assertEqual(policy.delay(9), MAX_RETRY_DELAY)
+        self.assertEqual(RetryPolicy(backoff=0).delay(3), 0)
+        self.assertEqual(RetryPolicy(backoff=-1).delay(1), 0)
+
+
+class RetryDelayTest(unittest.TestCase):
+    """VideoCore 按重试策略记录失败原因"""
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._temp = tempfile.TemporaryDirectory()
+        os.chdir(self._temp.name)
+        self.core = VideoCore()
+        self.core._retry = RetryPolicy(max_attempts=3, backoff=1)
+        self.job = {'name': 'a', 'output_path': os.path.join(self._temp.name, 'a.partial.mp4')}
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._temp.cleanup()
+
+    def fail(self, attempt, error):
+        self.job['error'] = error
+        return self.core._retry_delay(self.job, attempt)
+
+    def test_keeps_first_error(self):
+        # 改用稳妥设置后的失败（例如被看门狗结束）不覆盖第一次的原因
+        self.assertEqual(self.fail(1, 'Error while filtering'), 1)
+        self.assertEqual(self.fail(2, '超过 120 秒没有进度'), 2)
+        self.assertIsNone(self.fail(3, '超过 120 秒没有进度'))
+        self.assertEqual(self.job['error'], 'Error while filtering')
+        self.assertEqual(len(self.job['errors']), 3)
+
+    def test_permanent_error_fails_immediately(self):
+        self.assertIsNone(self.fail(1, 'a.jpg: Invalid data found when processing input'))
+        self.assertEqual(self.job['errors'], ['a.jpg: Invalid data found when processing input'])
+
+    def test_cancelled(self):
+        self.core.control.cancel()
+        self.assertIsNone(self.fail(1, 'Conversion failed!'))
+
+    def test_removes_partial_output(self):
+        with open(self.job['output_path'], 'wb') as f:
+            f.write(b'partial')
+        self.fail(1, 'Conversion failed!')
+        self.assertFalse(os.path.exists(self.job['output_path']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,333 @@
+import os
+import json
+import time
+import asyncio
+import functools
+import subprocess
+import threading
+from collections import deque
+from .ffmpeg_progress import FFmpegProgress
+from .pipe_reader import LineSplitter, READ_SIZE, TAIL_LINES
+from .process_control import RenderCancelled
+from .render_spec import RenderSpec
+
+# 同时运行的 ffprobe 探测进程数（探测很快，主要等待磁盘）
+PROBE_CONCURRENCY = 32
+
+# 同时运行的输出校验进程数
+VERIFY_CONCURRENCY = 8
+
+# 重试前等待时检查是否已取消的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.5
+
+# 校验输出视频时只需要的字段
+VERIFY_ENTRIES = 'format=duration:stream=codec_type'
+
+
+class AsyncProcess:
+    """asyncio 子进程的同步句柄
+
+    提供与 subprocess.Popen 相同的 pid、poll、terminate、kill 和 wait(timeout)，
+    可以登记到 ProcessControl，由 GUI 线程暂停、取消或由看门狗结束。
+    结束进程的操作转交给事件循环线程执行。
+    """
+
+    def __init__(self, process, loop):
+        self._process = process
+        self._loop = loop
+        self._finished = threading.Event()
+        self.pid = process.pid
+
+    @property
+    def returncode(self):
+        return self._process.returncode
+
+    def poll(self):
+        return self._process.returncode
+
+    def terminate(self):
+        self._loop.call_soon_threadsafe(self._signal, self._process.terminate)
+
+    def kill(self):
+        self._loop.call_soon_threadsafe(self._signal, self._process.kill)
+
+    def _signal(self, method):
+        try:
+            method()
+        except ProcessLookupError:
+            pass  # 进程已退出
+
+    def wait(self, timeout=None):
+        """在其他线程中等待进程结束，超时抛出 subprocess.TimeoutExpired"""
+        if not self._finished.wait(timeout):
+            raise subprocess.TimeoutExpired(str(self.pid), timeout)
+        return self._process.returncode
+
+    async def finished(self):
+        """在事件循环中等待进程结束"""
+        returncode = await self._process.wait()
+        self._finished.set()
+        return returncode
+
+
+class AsyncBatchRunner:
+    """用一个 asyncio 事件循环调度一批视频的探测、图片处理、编码、校验和提交
+
+    FFmpeg/ffprobe 子进程由 asyncio.create_subprocess_exec 启动，进度和错误输出在事件循环中按块读取，
+    不需要为每个子进程的每个管道各开一个线程；同时运行的编码、探测和校验进程数由信号量限制。
+    图片处理、轨道缓存和背景音乐等同步操作交给默认线程池执行。
+    子进程同样登记到 VideoCore.control，暂停、取消和看门狗与线程模式相同。
+
+    不支持分段编码（chunk_seconds）、PyAV 后端和缩略图，这些任务请使用流水线或普通模式。
+    """
+
+    def __init__(self, video_core, max_workers=1, progress_callback=None, bg_music_path=None,
+                 bg_music_volume=0.3, inline_bg_music=False, use_cache=False, normalize_images=True,
+                 image_fill_mode='letterbox'):
+        """
+        Args:
+            video_core: VideoCore 实例，提供命令行模板、输出校验、提交和进程控制
+            max_workers: 同时运行的 FFmpeg 编码进程数
+            其余参数与 VideoCore.generate_video_from_images 相同
+        """
+        self.core = video_core
+        self.control = video_core.control
+        self.max_workers = max(1, int(max_workers or 1))
+        self.progress_callback = progress_callback
+        self.bg_music_path = bg_music_path
+        self.bg_music_volume = bg_music_volume
+        self.inline_bg_music = inline_bg_music
+        self.use_cache = use_cache
+        self.normalize_images = normalize_images
+        self.image_fill_mode = image_fill_mode
+        # 并行时平分 CPU 核心
+        self.threads = 'auto' if self.max_workers == 1 else str(max(1, (os.cpu_count() or 1) // self.max_workers))
+
+    def run(self, jobs, total):
+        """同步入口：在当前线程（例如 GUI 的生成线程）运行事件循环，直到这批任务结束
+        Args:
+            jobs: 需要生成的任务（VideoCore._stage_jobs 生成，已按清单筛选）
+            total: 本批视频总数，用于进度回调
+        Returns:
+            dict: 任务序号 -> 是否成功（已校验并提交）
+        """
+        return asyncio.run(self.run_async(jobs, total))
+
+    async def run_async(self, jobs, total):
+        """协程入口，参数和返回值与 run 相同"""
+        self._loop = asyncio.get_running_loop()
+        self._encode_slots = asyncio.Semaphore(self.max_workers)
+        self._probe_slots = asyncio.Semaphore(PROBE_CONCURRENCY)
+        self._verify_slots = asyncio.Semaphore(VERIFY_CONCURRENCY)
+        self._total = total
+        # 每个音频只探测一次，每张图片只处理一次
+        self._probes = {audio: asyncio.ensure_future(self._probe(audio))
+                        for audio in dict.fromkeys(job['audio_path'] for job in jobs)}
+        self._images = {}
+        if self.normalize_images:
+            self._images = {image: asyncio.ensure_future(self._in_thread(self.core._normalize_image, image,
+                                                                         self.image_fill_mode))
+                            for image in dict.fromkeys(job['image_path'] for job in jobs)}
+        # 背景音乐按最长的音频准备一次（使用缓存时在编码前按需准备）
+        self._bgm = None
+        if self.bg_music_path and not self.use_cache and jobs:
+            print(f"检测到背景音乐: {self.bg_music_path}")
+            self._bgm = asyncio.ensure_future(self._background_music())
+
+        print(f"asyncio 调度生成 {len(jobs)} 个视频，同时编码 {self.max_workers} 个")
+        outcomes = await asyncio.gather(*(self._run_job(job) for job in jobs))
+        # 批量探测时不逐个写入，最后统一保存探测缓存
+        try:
+            self.core.probe_cache.flush()
+        except Exception as e:
+            print(f"保存探测缓存失败: {str(e)}")
+        return {job['index']: ok for job, ok in zip(jobs, outcomes)}
+
+    async def _in_thread(self, func, *args):
+        """在默认线程池中执行同步函数"""
+        return await self._loop.run_in_executor(None, functools.partial(func, *args))
+
+    async def _checkpoint(self):
+        """暂停期间在线程池中等待继续，已取消时抛出 RenderCancelled"""
+        if self.control.paused:
+            await self._in_thread(self.control.checkpoint)
+        elif self.control.cancelled:
+            raise RenderCancelled('生成已取消')
+
+    async def _probe(self, audio_path):
+        async with self._probe_slots:
+            probe = await self.core.probe_cache.probe_async(audio_path, save=False)
+        return float(probe['format']['duration'])
+
+    async def _background_music(self):
+        durations = await asyncio.gather(*self._probes.values(), return_exceptions=True)
+        durations = [duration for duration in durations if not isinstance(duration, BaseException)]
+        if not durations:
+            return None
+        return await self._in_thread(self.core._background_music_source, self.bg_music_path, max(durations),
+                                     self.bg_music_volume, self.inline_bg_music)
+
+    async def _run_job(self, job):
+        """一个视频的全部阶段：等待探测和图片处理 → 编码 → 校验 → 提交，
+        编码或校验失败时按 VideoCore 的重试策略重试
+        Returns:
+            bool: 是否成功，失败只影响当前视频
+        """
+        name = job['name']
+        try:
+            job['duration'] = await self._probes[job['audio_path']]
+            if job['image_path'] in self._images:
+                job['image_path'] = await self._images[job['image_path']]
+            if self._bgm:
+                job['bg_music'] = await self._bgm
+        except Exception as e:
+            job['error'] = str(e)
+            print(f"处理 {name} 时发生错误: {str(e)}")
+            return False
+        attempt = 1
+        while True:
+            job['attempts'] = attempt
+            if await self._attempt(job):
+                break
+            delay = self.core._retry_delay(job, attempt)
+            if delay is None or not await self._sleep(delay):
+                return False
+            if self.core._retry.fallback and not job.get('fallback'):
+                await self._in_thread(self.core._apply_fallback, job)
+            attempt += 1
+        if attempt > 1:
+            print(f"{name}.mp4 第 {attempt} 次生成成功")
+        return await self._in_thread(self.core._commit_output, job)
+
+    async def _attempt(self, job):
+        """编码并校验一次，失败原因记录在 job['error']
+        Returns:
+            bool: 是否成功
+        """
+        name = job['name']
+        try:
+            async with self._encode_slots:
+                await self._checkpoint()
+                if not await self._encode(job):
+                    return False
+            async with self._verify_slots:
+                await self._verify(job)
+            job['error'] = None
+            return True
+        except RenderCancelled:
+            job['error'] = '已取消'
+            print(f"已取消: {name}")
+            return False
+        except Exception as e:
+            if self.control.cancelled:
+                job['error'] = '已取消'
+                print(f"已取消: {name}")
+            else:
+                job['error'] = str(e)
+                print(f"处理 {name} 时发生错误: {str(e)}")
+            return False
+
+    async def _sleep(self, seconds):
+        """重试前等待，取消时提前结束
+        Returns:
+            bool: 是否等待完成（未被取消）
+        """
+        deadline = time.monotonic() + seconds
+        while not self.control.cancelled:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            await asyncio.sleep(min(remaining, CANCEL_POLL_INTERVAL))
+        return False
+
+    async def _encode(self, job):
+        """用 asyncio 子进程生成单个视频
+        Returns:
+            bool: 是否成功
+        """
+        index, name = job['index'], job['name']
+        print(f"正在处理第 {index + 1}/{self._total} 个视频: {name}")
+        if self.use_cache:
+            await self._in_thread(self.core._prepare_job_tracks, job, self.threads)
+        if job.get('bg_music') and not job.get('audio_track'):
+            print(f"混合背景音乐: {job['bg_music']}")
+        template = self.core._render_template(RenderSpec.from_job(job, self.threads))
+
+        print(f"开始生成视频: {name}.mp4")
+        process = await asyncio.create_subprocess_exec(*template.fill_job(job), stdin=subprocess.DEVNULL,
+                                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        handle = self.control.register(AsyncProcess(process, self._loop))
+        try:
+            watched = self.control.watch(handle, name, self.core._stall_timeout,
+                                         self.core._job_timeout(job['duration']))
+            progress = FFmpegProgress(job['duration'])
+            stderr_tail = deque(maxlen=TAIL_LINES)
+
+            def on_progress_line(line):
+                if progress.feed_line(line):
+                    watched.advance(progress.out_time)
+                    if self.progress_callback:
+                        self.progress_callback(index, self._total, progress.percent, progress.to_dict())
+
+            await asyncio.gather(self._read_lines(process.stdout, on_progress_line),
+                                 self._read_lines(process.stderr, stderr_tail.append))
+            returncode = await handle.finished()
+        finally:
+            if process.returncode is None:
+                # 读取输出时出错，结束进程后再取消登记
+                handle._signal(process.kill)
+                await handle.finished()
+            self.control.release(handle)
+
+        stderr = b'\n'.join(stderr_tail)
+        if returncode != 0:
+            if self.control.cancelled:
+                job['error'] = '已取消'
+                print(f"已取消: {name}")
+            elif watched.reason:
+                job['error'] = watched.reason
+                print(f"处理 {name} 时{watched.reason}，已结束，继续生成其他视频")
+            else:
+                job['error'] = self.core._error_summary(stderr)
+                print(f"处理 {name} 时发生错误: {stderr.decode(errors='ignore') if stderr else '未知错误'}")
+            return False
+
+        progress.finished = True
+        if self.progress_callback:
+            self.progress_callback(index, self._total, 100, progress.to_dict())
+        speed = f"{progress.speed:.1f}x" if progress.speed else '未知'
+        cpu_time = self.core._parse_cpu_time(stderr)
+        if cpu_time is not None:
+            job['cpu_time'] = cpu_time
+            speed += f"，CPU 时间 {cpu_time:.1f}秒"
+        job['output_size'] = os.path.getsize(job['output_path'])
+        speed += f"，文件大小 {job['output_size'] / (1024 * 1024):.1f}MB"
+        print(f"视频 {name}.mp4 生成完成，耗时 {time.time() - progress.start_time:.1f}秒，编码速度 {speed}")
+        return True
+
+    async def _read_lines(self, stream, on_line):
+        """按块读取子进程的输出直到管道关闭，按行回调（回调中的异常只记录，读取继续）"""
+        splitter = LineSplitter()
+        failed = False
+        while True:
+            chunk = await stream.read(READ_SIZE)
+            lines = splitter.feed(chunk) if chunk else splitter.flush()
+            for line in lines:
+                if failed:
+                    continue
+                try:
+                    on_line(line)
+                except Exception as e:
+                    failed = True
+                    print(f"处理 FFmpeg 输出时发生错误: {str(e)}")
+            if not chunk:
+                return
+
+    async def _verify(self, job):
+        """用 asyncio 子进程探测输出视频并校验，校验失败时抛出异常"""
+        args = ['ffprobe', '-v', 'error', '-show_entries', VERIFY_ENTRIES, '-of', 'json', job['output_path']]
+        process = await asyncio.create_subprocess_exec(*args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = await process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"校验 {job['name']}.mp4 失败: {err.decode(errors='ignore').strip()}")
+        self.core._check_output(job, json.loads(out.decode('utf-8')), job['output_path'])
@@ -0,0 +1,231 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+
+# 缓存默认大小上限（字节）
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024 * 1024
+
+# 命中时只在内存中更新最后使用时间，距上次写入索引超过该秒数时才写入（批次结束时调用 flush 写入）
+INDEX_FLUSH_SECONDS = 5.0
+
+# 文件内容哈希的进程内缓存，按 (路径, 大小, 修改时间) 区分
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def file_hash(file_path):
+    """计算文件内容的 SHA-256，同一文件未修改时只计算一次"""
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        if memo_key in _hash_memo:
+            return _hash_memo[memo_key]
+
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    with _hash_lock:
+        _hash_memo[memo_key] = digest
+    return digest
+
+
+@contextmanager
+def file_lock(path):
+    """跨进程的文件锁（锁文件为 path.lock），多个进程读取、合并并写入同一索引文件时使用"""
+    lock_dir = os.path.dirname(path)
+    if lock_dir:
+        os.makedirs(lock_dir, exist_ok=True)
+    with open(f"{path}.lock", 'a+b') as lock_file:
+        if sys.platform == 'win32':
+            import msvcrt
+            lock_file.seek(0)
+            while True:
+                try:
+                    # LK_LOCK 重试 10 秒后仍拿不到锁会抛出 OSError，继续等待
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def make_key(*parts):
+    """将任意可 JSON 序列化的参数组合成缓存键"""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class MediaCache:
+    """按内容寻址的磁盘缓存，超过大小上限时按最近最少使用淘汰
+
+    缓存文件保存在 cache_dir 下，索引保存在 cache_dir/index.json，
+    记录每个条目的文件名、大小、最后使用时间和附加信息。
+    命中只更新内存中的最后使用时间，新增和淘汰条目时立即写入索引，其余在 flush 时写入。
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._dirty = False  # 内存中有尚未写入索引的最后使用时间
+        self._saved_at = time.monotonic()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        """读取索引，并丢弃文件已不存在的条目"""
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except Exception as e:
+            print(f"读取缓存索引失败，将重建缓存索引: {str(e)}")
+            return {}
+        return {key: entry for key, entry in index.items()
+                if os.path.exists(os.path.join(self.cache_dir, entry['file']))}
+
+    def _save_index(self):
+        """写入索引（先写临时文件再替换，避免写到一半损坏）
+
+        在文件锁内合并其他进程新增的条目和更新的最后使用时间后再写入，多个进程共用同一缓存目录时不会互相覆盖。
+        """
+        with file_lock(self.index_file):
+            for key, entry in self._load_index().items():
+                current = self._index.setdefault(key, entry)
+                current['last_used'] = max(current['last_used'], entry['last_used'])
+            temp_file = f"{self.index_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f, ensure_ascii=False)
+            os.replace(temp_file, self.index_file)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def flush(self):
+        """写入命中时更新的最后使用时间（批次结束时调用）"""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def get(self, key):
+        """查找缓存
+        Returns:
+            str: 缓存文件路径，未命中时返回 None
+        """
+        return self.find([key])
+
+    def find(self, keys):
+        """按顺序查找多个候选键，返回第一个命中的缓存文件（只计一次命中或未命中）
+        Returns:
+            str: 缓存文件路径，全部未命中时返回 None
+        """
+        with self._lock:
+            for key in keys:
+                entry = self._index.get(key)
+                if not entry:
+                    continue
+                path = os.path.join(self.cache_dir, entry['file'])
+                if os.path.exists(path):
+                    entry['last_used'] = time.time()
+                    self.hits += 1
+                    self._dirty = True
+                    if time.monotonic() - self._saved_at > INDEX_FLUSH_SECONDS:
+                        self._save_index()
+                    return path
+                del self._index[key]
+            self.misses += 1
+            return None
+
+    def temp_path(self, suffix):
+        """返回缓存目录内的临时文件路径，生成完成后通过 put 放入缓存"""
+        return os.path.join(self.cache_dir, f"tmp_{os.getpid()}_{threading.get_ident()}_{time.time_ns()}{suffix}")
+
+    def put(self, key, file_path, meta=None):
+        """将生成好的文件移入缓存
+        Args:
+            key: 缓存键
+            file_path: 已生成的文件，会被移动到缓存目录
+            meta: 附加信息（如时长），随索引保存
+        Returns:
+            str: 缓存文件路径
+        """
+        suffix = os.path.splitext(file_path)[1]
+        file_name = f"{key}{suffix}"
+        path = os.path.join(self.cache_dir, file_name)
+        os.replace(file_path, path)
+
+        with self._lock:
+            self._index[key] = {
+                'file': file_name,
+                'size': os.path.getsize(path),
+                'last_used': time.time(),
+                'meta': meta or {}
+            }
+            self._evict(keep=key)
+            self._save_index()
+        return path
+
+    def _evict(self, keep=None):
+        """淘汰最久未使用的条目，直到总大小不超过上限"""
+        total = sum(entry['size'] for entry in self._index.values())
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.unlink(os.path.join(self.cache_dir, entry['file']))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # 文件正在使用（例如 Windows 上其他进程正在读取）时保留条目，下次再淘汰
+                print(f"淘汰缓存文件 {entry['file']} 失败，稍后重试: {str(e)}")
+                continue
+            total -= entry['size']
+            del self._index[key]
+
+    def reset_stats(self):
+        """重置命中统计"""
+        self.hits = 0
+        self.misses = 0
+
+    def report(self, label='缓存'):
+        """在日志中输出命中统计"""
+        total = sum(entry['size'] for entry in self._index.values())
+        print(f"{label}命中 {self.hits} 次，未命中 {self.misses} 次，"
+              f"当前占用 {total / (1024 * 1024):.1f}MB / {self.max_bytes / (1024 * 1024):.0f}MB")
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            for key, entry in list(self._index.items()):
+                try:
+                    os.unlink(os.path.join(self.cache_dir, entry['file']))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"删除缓存文件 {entry['file']} 失败: {str(e)}")
+                    continue
+                del self._index[key]
+            self._save_index()
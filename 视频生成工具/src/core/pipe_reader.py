@@ -0,0 +1,111 @@
+import re
+import threading
+from collections import deque
+
+# 每个管道保留的最后几行输出，用于错误报告和解析结束时的统计信息
+TAIL_LINES = 50
+
+# 单行最多保留的字节数，超出部分丢弃（FFmpeg 的统计信息以 \r 分隔时可能不换行）
+MAX_LINE_BYTES = 4096
+
+# 每次从管道读取的字节数
+READ_SIZE = 65536
+
+LINE_BREAK = re.compile(rb'[\r\n]')
+
+
+class LineSplitter:
+    """将按块读到的输出拆分为行（\\n 或 \\r 分隔），每行最多保留 MAX_LINE_BYTES 字节"""
+
+    def __init__(self):
+        self._pending = b''
+
+    def feed(self, chunk):
+        """加入读到的数据
+        Returns:
+            list: 已完整的行（不含分隔符，忽略空行）
+        """
+        parts = LINE_BREAK.split(self._pending + chunk)
+        self._pending = parts.pop()[-MAX_LINE_BYTES:]
+        return [line[-MAX_LINE_BYTES:] for line in parts if line]
+
+    def flush(self):
+        """管道关闭后返回最后一行（没有分隔符结尾时）"""
+        lines = [self._pending] if self._pending else []
+        self._pending = b''
+        return lines
+
+
+class PipeReader:
+    """同时读取子进程的 stdout 和 stderr
+
+    每个管道由一个后台线程持续读取，避免输出填满系统管道缓冲区导致 FFmpeg 阻塞；
+    按行（\\n 或 \\r 分隔）回调，并只保留最后 tail_lines 行，长时间编码也不会占用越来越多的内存。
+    """
+
+    def __init__(self, process, on_stdout_line=None, on_stderr_line=None, tail_lines=TAIL_LINES):
+        """
+        Args:
+            process: 以 stdout=PIPE / stderr=PIPE 启动的子进程
+            on_stdout_line: stdout 每读到一行时的回调（在读取线程中调用），例如解析 -progress 输出
+            on_stderr_line: stderr 每读到一行时的回调
+            tail_lines: 每个管道保留的行数
+        """
+        self.process = process
+        self.stdout_tail = deque(maxlen=tail_lines)
+        self.stderr_tail = deque(maxlen=tail_lines)
+        self.error = None  # 回调中发生的异常，读取继续进行
+        self._threads = []
+        for pipe, tail, callback in ((process.stdout, self.stdout_tail, on_stdout_line),
+                                     (process.stderr, self.stderr_tail, on_stderr_line)):
+            if pipe is not None:
+                thread = threading.Thread(target=self._drain, args=(pipe, tail, callback), daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _drain(self, pipe, tail, callback):
+        splitter = LineSplitter()
+        try:
+            while True:
+                chunk = pipe.read1(READ_SIZE) if hasattr(pipe, 'read1') else pipe.read(READ_SIZE)
+                if not chunk:
+                    break
+                for line in splitter.feed(chunk):
+                    self._emit(line, tail, callback)
+            for line in splitter.flush():
+                self._emit(line, tail, callback)
+        except (OSError, ValueError):
+            pass  # 进程被结束时管道可能已关闭
+        finally:
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def _emit(self, line, tail, callback):
+        tail.append(line)
+        if callback and self.error is None:
+            try:
+                callback(line)
+            except Exception as e:
+                self.error = e
+
+    def wait(self):
+        """等待进程结束并读完全部输出
+        Returns:
+            int: 进程的返回码
+        """
+        returncode = self.process.wait()
+        for thread in self._threads:
+            thread.join()
+        return returncode
+
+    @property
+    def stdout(self):
+        """stdout 的最后几行"""
+        return b'\n'.join(self.stdout_tail)
+
+    @property
+    def stderr(self):
+        """stderr 的最后几行"""
+        return b'\n'.join(self.stderr_tail)
@@ -0,0 +1,209 @@
+import os
+import json
+import asyncio
+import subprocess
+import threading
+import ffmpeg
+from concurrent.futures import ThreadPoolExecutor
+from .media_cache import file_hash, file_lock
+
+# 只向 ffprobe 请求实际用到的字段
+PROBE_ENTRIES = ('format=duration,bit_rate:'
+                 'stream=codec_type,codec_name,sample_rate,channels,width,height,r_frame_rate')
+
+
+class ProbeCache:
+    """持久化的 ffprobe 元数据缓存
+
+    按 (绝对路径, 文件大小, 修改时间) 判断缓存是否有效；开启 use_content_hash 时
+    还会按文件内容哈希匹配，文件被复制、移动或只修改了时间时也能命中。
+    多个进程共用同一缓存文件，写入时在文件锁内合并其他进程写入的条目。
+    """
+
+    def __init__(self, cache_file=os.path.join('cache', 'probe.json'), use_content_hash=False):
+        self.cache_file = cache_file
+        self.use_content_hash = use_content_hash
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}  # 绝对路径 -> {'size', 'mtime', 'hash', 'probe'}
+        self._by_hash = {}  # 内容哈希 -> 探测结果
+        # 上次写入后失效的路径和内容哈希，合并其他进程的条目时不再加回；_cleared 为已清空全部缓存
+        self._removed_paths = set()
+        self._removed_hashes = set()
+        self._cleared = False
+        self._entries, self._by_hash = self._load()
+
+    def _load(self):
+        """读取缓存文件
+        Returns:
+            tuple: (路径条目, 内容哈希条目)
+        """
+        if not os.path.exists(self.cache_file):
+            return {}, {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data.get('entries', {}), data.get('by_hash', {})
+        except Exception as e:
+            print(f"读取探测缓存失败，将重建缓存: {str(e)}")
+            return {}, {}
+
+    def _save(self):
+        """写入缓存文件（调用方持有锁）
+
+        在文件锁内重新读取缓存文件，合并其他进程写入的条目（同一路径以本进程的结果为准），
+        再先写临时文件后替换，多个进程同时探测时不会互相覆盖。
+        """
+        with file_lock(self.cache_file):
+            if not self._cleared:
+                entries, by_hash = self._load()
+                for path, entry in entries.items():
+                    if path not in self._removed_paths:
+                        self._entries.setdefault(path, entry)
+                for content_hash, result in by_hash.items():
+                    if content_hash not in self._removed_hashes:
+                        self._by_hash.setdefault(content_hash, result)
+            temp_file = f"{self.cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'entries': self._entries, 'by_hash': self._by_hash}, f, ensure_ascii=False)
+            os.replace(temp_file, self.cache_file)
+        self._removed_paths.clear()
+        self._removed_hashes.clear()
+        self._cleared = False
+
+    def _ffprobe_args(self, file_path):
+        return ['ffprobe', '-v', 'error', '-show_entries', PROBE_ENTRIES, '-of', 'json', file_path]
+
+    def _run_ffprobe(self, file_path):
+        """调用 ffprobe 获取所需字段，失败时抛出 ffmpeg.Error"""
+        process = subprocess.Popen(self._ffprobe_args(file_path), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = process.communicate()
+        if process.returncode != 0:
+            raise ffmpeg.Error('ffprobe', out, err)
+        return json.loads(out.decode('utf-8'))
+
+    async def _run_ffprobe_async(self, file_path):
+        """在事件循环中调用 ffprobe，失败时抛出 ffmpeg.Error"""
+        process = await asyncio.create_subprocess_exec(*self._ffprobe_args(file_path), stdout=subprocess.PIPE,
+                                                       stderr=subprocess.PIPE)
+        out, err = await process.communicate()
+        if process.returncode != 0:
+            raise ffmpeg.Error('ffprobe', out, err)
+        return json.loads(out.decode('utf-8'))
+
+    def probe(self, file_path, save=True):
+        """获取文件的探测结果，格式与 ffmpeg.probe 相同（只包含常用字段）
+        Args:
+            file_path: 媒体文件路径
+            save: 是否立即写入缓存文件，批量探测时最后统一写入
+        """
+        path, stat, content_hash, result = self._lookup(file_path)
+        if stat is None:
+            return result
+        if result is None:
+            result = self._run_ffprobe(path)
+        return self._store(path, stat, content_hash, result, save)
+
+    async def probe_async(self, file_path, save=True):
+        """probe 的协程版本，缓存未命中时用 asyncio 子进程调用 ffprobe，不占用线程"""
+        path, stat, content_hash, result = self._lookup(file_path)
+        if stat is None:
+            return result
+        if result is None:
+            result = await self._run_ffprobe_async(path)
+        return self._store(path, stat, content_hash, result, save)
+
+    def _lookup(self, file_path):
+        """查找缓存
+        Returns:
+            tuple: (绝对路径, 文件状态, 内容哈希, 探测结果)；按路径命中时文件状态为 None，
+                不需要更新缓存；未命中时探测结果为 None
+        """
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+                self.hits += 1
+                return path, None, None, entry['probe']
+
+        content_hash = file_hash(path) if self.use_content_hash else None
+        with self._lock:
+            if content_hash and content_hash in self._by_hash:
+                result = self._by_hash[content_hash]
+                self.hits += 1
+            else:
+                result = None
+                self.misses += 1
+        return path, stat, content_hash, result
+
+    def _store(self, path, stat, content_hash, result, save=True):
+        """保存探测结果到缓存"""
+        with self._lock:
+            self._entries[path] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'hash': content_hash,
+                'probe': result
+            }
+            if content_hash:
+                self._by_hash[content_hash] = result
+            if save:
+                self._save()
+        return result
+
+    def flush(self):
+        """写入缓存文件（批量探测时 save=False，结束后统一写入）"""
+        with self._lock:
+            self._save()
+
+    def duration(self, file_path):
+        """获取媒体时长（秒）"""
+        return float(self.probe(file_path)['format']['duration'])
+
+    def durations(self, file_paths, max_workers=None):
+        """批量获取媒体时长，未缓存的文件并行探测，缓存文件只写入一次
+        Returns:
+            list: 与 file_paths 顺序对应的时长（秒）
+        """
+        misses_before = self.misses
+        max_workers = max_workers or min(16, (os.cpu_count() or 1) * 2)
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(file_paths) or 1))) as executor:
+            results = list(executor.map(lambda path: self.probe(path, save=False), file_paths))
+        if self.misses != misses_before:
+            with self._lock:
+                self._save()
+        return [float(result['format']['duration']) for result in results]
+
+    def invalidate(self, file_path=None):
+        """使缓存失效
+        Args:
+            file_path: 要失效的文件，为 None 时清空全部缓存
+        """
+        with self._lock:
+            if file_path is None:
+                self._entries = {}
+                self._by_hash = {}
+                self._cleared = True
+            else:
+                path = os.path.abspath(file_path)
+                entry = self._entries.pop(path, None)
+                self._removed_paths.add(path)
+                if entry and entry.get('hash'):
+                    self._by_hash.pop(entry['hash'], None)
+                    self._removed_hashes.add(entry['hash'])
+            self._save()
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_probe_cache():
+    """返回进程内共用的探测缓存，VideoCore 和 MaterialEngine 共用同一份"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ProbeCache()
+        return _shared_cache
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+# 每次生成的清单文件，保存在输出目录中
+MANIFEST_NAME = 'manifest.json'
+
+# 生成中的视频先写入该后缀的临时文件，成功后再重命名为正式文件名
+PARTIAL_SUFFIX = '.partial.mp4'
+
+# 清单的更新日志（与清单同名），每次状态变化追加一行，批次结束时合并到清单文件
+JOURNAL_SUFFIX = '.log'
+
+# 快速校验和读取文件开头和结尾各该字节数
+QUICK_HASH_BYTES = 1024 * 1024
+
+
+def file_fingerprint(file_path):
+    """文件指纹：(绝对路径, 大小, 修改时间)，文件不存在时返回 None"""
+    if not file_path:
+        return None
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return [os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns]
+
+
+def quick_hash(file_path):
+    """文件的快速校验和：文件大小和开头、结尾各 1MB 内容的 SHA-256（MP4 的 moov 在开头或结尾），
+    用于继续生成时确认输出文件仍是之前生成的文件
+    """
+    size = os.path.getsize(file_path)
+    sha = hashlib.sha256(str(size).encode())
+    with open(file_path, 'rb') as f:
+        sha.update(f.read(QUICK_HASH_BYTES))
+        if size > QUICK_HASH_BYTES:
+            f.seek(max(QUICK_HASH_BYTES, size - QUICK_HASH_BYTES))
+            sha.update(f.read(QUICK_HASH_BYTES))
+    return sha.hexdigest()
+
+
+def partial_path(output_path):
+    """正式输出文件对应的临时文件路径"""
+    return os.path.splitext(output_path)[0] + PARTIAL_SUFFIX
+
+
+class RunManifest:
+    """一次批量生成的清单
+
+    记录每个视频的规格哈希（输入文件指纹和生成设置）、状态（running / done / failed）、
+    输出文件大小和内容校验和。中断后在同一输出目录继续生成时，规格未变、输出文件完好的视频直接跳过。
+    每次状态变化立即追加到更新日志（只写一行，不重写整个清单），进程中途退出也不会丢失已完成的记录；
+    读取时在清单上重放日志，compact 将日志合并到清单文件（先写临时文件再替换）。
+    """
+
+    def __init__(self, output_folder, path=None):
+        """
+        Args:
+            output_folder: 输出目录
+            path: 清单文件路径，默认为输出目录中的 manifest.json；保存在其他位置（如项目目录）时，
+                清单记录的输出目录与 output_folder 不同则视为新的清单
+        """
+        self.output_folder = output_folder
+        self.path = path or os.path.join(output_folder, MANIFEST_NAME)
+        self.journal_path = os.path.splitext(self.path)[0] + JOURNAL_SUFFIX
+        self._lock = threading.Lock()
+        self.data = self._empty()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if path and data.get('output_folder') != os.path.abspath(output_folder):
+                    print(f"生成清单记录的输出目录为 {data.get('output_folder')}，将重新生成全部视频")
+                else:
+                    self.data = data
+                    self.data.setdefault('inputs', {})
+                    self.data.setdefault('jobs', {})
+                    self._replay()
+            except Exception as e:
+                print(f"读取生成清单失败，将重新生成全部视频: {str(e)}")
+        elif not path:
+            # 尚未写入清单文件时，输出目录中的更新日志同样属于这个输出目录
+            self._replay()
+
+    def _replay(self):
+        """在清单上重放更新日志（进程退出时最后一行可能不完整，忽略无法解析的行）"""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(record, dict) or 'name' not in record:
+                    continue
+                self.data['jobs'].setdefault(record.pop('name'), {}).update(record)
+
+    def _empty(self):
+        return {'output_folder': os.path.abspath(self.output_folder), 'created_at': time.time(),
+                'updated_at': None, 'inputs': {}, 'jobs': {}}
+
+    @staticmethod
+    def exists(output_folder):
+        """输出目录中是否有生成清单"""
+        return os.path.exists(os.path.join(output_folder, MANIFEST_NAME))
+
+    def save(self):
+        """写入完整的清单文件并清空更新日志（调用方持有锁）"""
+        self.data['updated_at'] = time.time()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_file = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, self.path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def compact(self):
+        """将更新日志合并到清单文件（批次结束时调用）"""
+        with self._lock:
+            self.save()
+
+    def set_inputs(self, inputs):
+        """记录本次生成的输入文件和设置"""
+        with self._lock:
+            self.data['inputs'] = inputs
+            self.save()
+
+    def get(self, name):
+        """返回视频的清单记录，没有时返回 None"""
+        with self._lock:
+            entry = self.data['jobs'].get(name)
+            return dict(entry) if entry else None
+
+    def is_complete(self, name, spec_hash, output_path):
+        """视频是否已按相同规格生成完成，且输出文件仍然存在、大小和快速校验和一致
+        （没有快速校验和的旧记录校验完整的内容校验和）
+        """
+        entry = self.get(name)
+        if not entry or entry.get('state') != 'done' or entry.get('spec_hash') != spec_hash:
+            return False
+        try:
+            if os.path.getsize(output_path) != entry.get('size'):
+                return False
+            if entry.get('quick_hash'):
+                return quick_hash(output_path) == entry['quick_hash']
+            if entry.get('checksum'):
+                from .media_cache import file_hash
+                return file_hash(output_path) == entry['checksum']
+            return False
+        except OSError:
+            return False
+
+    def update(self, name, **fields):
+        """更新视频的清单记录，立即追加到更新日志"""
+        with self._lock:
+            fields['updated_at'] = time.time()
+            self.data['jobs'].setdefault(name, {}).update(fields)
+            os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(dict(fields, name=name), ensure_ascii=False) + '\n')
+
+    def names(self):
+        """清单中记录的全部视频名"""
+        with self._lock:
+            return list(self.data['jobs'])
+
+    def counts(self):
+        """各状态的视频数"""
+        with self._lock:
+            counts = {}
+            for entry in self.data['jobs'].values():
+                counts[entry.get('state')] = counts.get(entry.get('state'), 0) + 1
+            return counts
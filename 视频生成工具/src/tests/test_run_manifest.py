@@ -0,0 +1,186 @@
+import json
+import os
+import tempfile
+import unittest
+
+from core.media_cache import file_hash
+from core.run_manifest import (MANIFEST_NAME, QUICK_HASH_BYTES, RunManifest, partial_path, quick_hash)
+from core.video_core import VideoCore
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def flip_byte(path, offset):
+    """原地修改一个字节，文件大小不变"""
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        value = f.read(1)
+        f.seek(offset)
+        f.write(bytes([value[0] ^ 0xff]))
+
+
+class RunManifestTest(unittest.TestCase):
+    """生成清单的跳过判断和更新日志"""
+
+    def setUp(self):
+        self._temp = tempfile.TemporaryDirectory()
+        self.folder = self._temp.name
+        self.output = os.path.join(self.folder, 'a.mp4')
+        write(self.output, os.urandom(3 * QUICK_HASH_BYTES))
+
+    def tearDown(self):
+        self._temp.cleanup()
+
+    def record_done(self, manifest, **fields):
+        fields.setdefault('size', os.path.getsize(self.output))
+        fields.setdefault('quick_hash', quick_hash(self.output))
+        manifest.update('a', state='done', spec_hash='spec', **fields)
+
+    def test_complete(self):
+        manifest = RunManifest(self.folder)
+        self.record_done(manifest)
+        self.assertTrue(manifest.is_complete('a', 'spec', self.output))
+        self.assertFalse(manifest.is_complete('a', 'other-spec', self.output))
+        self.assertFalse(manifest.is_complete('b', 'spec', self.output))
+
+    def test_not_done(self):
+        manifest = RunManifest(self.folder)
+        self.record_done(manifest)
+        manifest.update('a', state='running')
+        self.assertFalse(manifest.is_complete('a', 'spec', self.output))
+
+    def test_missing_or_resized_output(self):
+        manifest = RunManifest(self.folder)
+        self.record_done(manifest)
+        with open(self.output, 'ab') as f:
+            f.write(b'x')
+        self.assertFalse(manifest.is_complete('a', 'spec', self.output))
+        os.remove(self.output)
+        self.assertFalse(manifest.is_complete('a', 'spec', self.output))
+
+    def test_same_size_corruption(self):
+        # 大小不变但开头或结尾（moov 所在位置）损坏的文件需要重新生成
+        manifest = RunManifest(self.folder)
+        self.record_done(manifest)
+        flip_byte(self.output, os.path.getsize(self.output) - 10)
+        self.assertFalse(manifest.is_complete('a', 'spec', self.output))
+
+    def test_legacy_checksum(self):
+        # 没有快速校验和的旧记录校验完整的内容校验和
+        manifest = RunManifest(self.folder)
+        self.record_done(manifest, quick_hash=None, checksum=file_hash(self.output))
+        self.assertTrue(manifest.is_complete('a', 'spec', self.output))
+        flip_byte(self.output, QUICK_HASH_BYTES + 10)
+        self.assertFalse(manifest.is_complete('a', 'spec', self.output))
+        self.record_done(manifest, quick_hash=None, checksum=None)
+        self.assertFalse(manifest.is_complete('a', 'spec', self.output))
+
+    def test_quick_hash_small_file(self):
+        small = os.path.join(self.folder, 'small.mp4')
+        write(small, b'0123456789')
+        digest = quick_hash(small)
+        flip_byte(small, 9)
+        self.assertNotEqual(quick_hash(small), digest)
+
+    def test_journal_replay_and_compact(self):
+        manifest = RunManifest(self.folder)
+        manifest.set_inputs({'audio_paths': ['a.mp3']})
+        with open(manifest.path, 'r', encoding='utf-8') as f:
+            snapshot = f.read()
+        manifest.update('a', state='running', spec_hash='spec')
+        self.record_done(manifest)
+        manifest.update('b', state='failed', error='出错')
+        # 状态变化只追加到更新日志，不重写清单
+        with open(manifest.path, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), snapshot)
+        with open(manifest.journal_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+        # 进程中途退出：最后一行只写了一半
+        with open(manifest.journal_path, 'a', encoding='utf-8') as f:
+            f.write('{"state": "do')
+        reloaded = RunManifest(self.folder)
+        self.assertEqual(reloaded.counts(), {'done': 1, 'failed': 1})
+        self.assertEqual(reloaded.get('b')['error'], '出错')
+        self.assertTrue(reloaded.is_complete('a', 'spec', self.output))
+
+        reloaded.compact()
+        self.assertFalse(os.path.exists(reloaded.journal_path))
+        with open(reloaded.path, 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['jobs']['a']['state'], 'done')
+        self.assertEqual(RunManifest(self.folder).counts(), {'done': 1, 'failed': 1})
+
+    def test_other_output_folder(self):
+        # 保存在输出目录以外的清单，输出目录变化时视为新的清单
+        path = os.path.join(self.folder, 'project', 'manifest.json')
+        manifest = RunManifest(self.folder, path)
+        manifest.set_inputs({})
+        self.record_done(manifest)
+        manifest.compact()
+        self.assertEqual(RunManifest(self.folder, path).counts(), {'done': 1})
+        self.assertEqual(RunManifest(os.path.join(self.folder, 'other'), path).counts(), {})
+
+
+class PendingJobsTest(unittest.TestCase):
+    """继续生成时按清单跳过已完成的视频"""
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._temp = tempfile.TemporaryDirectory()
+        os.chdir(self._temp.name)
+        self.folder = os.path.join(self._temp.name, 'output')
+        os.makedirs(self.folder)
+        write('a.mp3', b'audio')
+        write('a.jpg', b'image')
+        self.core = VideoCore()
+        self.core._batch_spec = 'spec'
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._temp.cleanup()
+
+    def jobs(self):
+        jobs = []
+        for index, name in enumerate(['v1', 'v2']):
+            final_path = os.path.join(self.folder, f'{name}.mp4')
+            jobs.append({'index': index, 'name': name, 'source_image': 'a.jpg', 'audio_path': 'a.mp3',
+                         'final_path': final_path, 'output_path': partial_path(final_path)})
+        return jobs
+
+    def test_skip_completed(self):
+        self.core._manifest = RunManifest(self.folder)
+        first = self.jobs()
+        self.core._pending_jobs(first, {})
+        # v1 生成完成，v2 中断时留下了临时文件
+        write(first[0]['output_path'], b'video-1')
+        self.assertTrue(self.core._commit_output(first[0]))
+        write(first[1]['output_path'], b'partial')
+
+        self.core._manifest = RunManifest(self.folder)
+        jobs, results, progress = self.jobs(), {}, []
+        pending = self.core._pending_jobs(jobs, results, lambda *args: progress.append(args))
+        self.assertEqual([job['name'] for job in pending], ['v2'])
+        self.assertTrue(jobs[0]['skipped'])
+        self.assertEqual(results, {0: True})
+        # 跳过的视频报告为 100%，界面的总进度计入这些视频
+        self.assertEqual(progress, [(0, 2, 100, {'skipped': True})])
+        self.assertFalse(os.path.exists(jobs[1]['output_path']))
+        self.assertEqual(self.core._manifest.get('v2')['state'], 'running')
+
+    def test_changed_input_renders_again(self):
+        self.core._manifest = RunManifest(self.folder)
+        job = self.jobs()[0]
+        self.core._pending_jobs([job], {})
+        write(job['output_path'], b'video-1')
+        self.core._commit_output(job)
+        write('a.mp3', b'new audio')
+
+        self.core._manifest = RunManifest(self.folder)
+        self.assertEqual(len(self.core._pending_jobs(self.jobs(), {})), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()